@@ -2,9 +2,19 @@
 """
 PPH SelfCheckGPT Anchor Rotation
 Tests every run as anchor to check result stability.
+
+Each claim's mean support against the other runs is saved under its
+claim_id (see claims.claim_refs).
+
+With --workers N, anchors are split into ranges (several per group when
+there are fewer groups than workers) and scored in parallel (see
+shard_pool). Every anchor is scored by the same computation wherever it
+runs, so the output does not depend on the worker count.
 """
 
+import argparse
 import json
+import math
 import sys
 import numpy as np
 from pathlib import Path
@@ -13,89 +23,149 @@ SCRIPT_DIR = Path(__file__).resolve().parent
 REPO_DIR = SCRIPT_DIR.parent
 sys.path.insert(0, str(SCRIPT_DIR))
 
-from selfcheckgpt_test import load_stochastic_runs, extract_claims
-from sentence_transformers import SentenceTransformer, util
+from claims import DEFAULT_MODE, MODES, claim_refs, without_text
+from selfcheckgpt_test import STOCH_FIELDS, load_stochastic_runs
+from shard_pool import local_store, shard_map, worker_store
+from similarity import segment_max, stack_segments
 
 DATA_DIR = str(REPO_DIR / "data" / "phase2a") + "/"
 OUTPUT = str(REPO_DIR / "data" / "phase2a" / "selfcheckgpt_anchor_rotation.json")
 THRESHOLD = 0.65
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
-groups = load_stochastic_runs(DATA_DIR)
-
-results = {}
-
-for group_key, runs in sorted(groups.items()):
-    n_runs = len(runs)
-    if n_runs < 2:
-        continue
-
-    print(f"\n{'='*60}")
-    print(f"Anchor rotation: {group_key} ({n_runs} runs)")
-    print(f"{'='*60}")
-
-    anchor_pass_rates = []
-
-    for anchor_idx in range(n_runs):
-        target = runs[anchor_idx]
-        references = [r["response"] for r in runs if r["run_id"] != target["run_id"]]
-
-        claims = extract_claims(target["response"])
+def score_anchors(task: tuple) -> list[tuple]:
+    """
+    Pass rate and claim supports for anchors [lo, hi) of one group (a
+    shard_map task). task: (runs as plain dicts, lo, hi, segmenter mode).
+    Returns one (pass_rate, n_factual, n_claims, claim_support) tuple per
+    anchor.
+    """
+    runs, lo, hi, segmenter = task
+    store = worker_store()
+
+    # Embed every response's claims once; they double as reference sentences
+    run_refs = [claim_refs(r["run_id"], r["response"], segmenter) for r in runs]
+    run_claims = [[ref["text"] for ref in refs] for refs in run_refs]
+    flat = [c for claims in run_claims for c in claims]
+    flat_embeddings = store.encode(flat)
+
+    present = [j for j, claims in enumerate(run_claims) if claims]
+    blocks = []
+    pos = 0
+    for j in present:
+        blocks.append(flat_embeddings[pos:pos + len(run_claims[j])])
+        pos += len(run_claims[j])
+
+    matrix, offsets = stack_segments(blocks)
+    block_of = {j: b for b, j in enumerate(present)}
+
+    scored = []
+    for anchor_idx in range(lo, hi):
+        claims = run_claims[anchor_idx]
         if not claims:
-            anchor_pass_rates.append(0.0)
+            scored.append((0.0, 0, 0, []))
             continue
 
-        claim_embeddings = model.encode(claims, convert_to_tensor=True)
+        # support[s, b] = max similarity of anchor sentence s against response
+        # block b, every reference column except the anchor's own block
+        b = block_of[anchor_idx]
+        rows = segment_max(matrix[offsets[b]:offsets[b] + len(claims)] @ matrix.T, offsets)
+        rows = np.delete(rows, b, axis=1)
 
         n_factual = 0
-        for i, claim in enumerate(claims):
-            support_scores = []
-            for other_resp in references:
-                other_sentences = extract_claims(other_resp)
-                if not other_sentences:
-                    continue
-                other_emb = model.encode(other_sentences, convert_to_tensor=True)
-                cosine = util.cos_sim(claim_embeddings[i:i+1], other_emb)
-                support_scores.append(float(cosine.max()))
-
+        claim_support = []
+        for ref, row in zip(run_refs[anchor_idx], rows):
+            support_scores = [float(s) for s in row]
             avg = sum(support_scores) / len(support_scores) if support_scores else 0
             if avg > THRESHOLD:
                 n_factual += 1
-
-        pass_rate = n_factual / len(claims)
-        anchor_pass_rates.append(pass_rate)
-        print(f"  Anchor {anchor_idx+1:>2}: {n_factual}/{len(claims)} claims = {pass_rate:.0%}")
-
-    arr = np.array(anchor_pass_rates)
-    results[group_key] = {
-        "model": runs[0]["model"],
-        "scenario": runs[0]["scenario"],
-        "n_anchors": n_runs,
-        "threshold": THRESHOLD,
-        "per_anchor_pass_rates": [round(x, 3) for x in anchor_pass_rates],
-        "mean": round(float(arr.mean()), 3),
-        "std": round(float(arr.std()), 3),
-        "min": round(float(arr.min()), 3),
-        "max": round(float(arr.max()), 3),
-        "range": round(float(arr.max() - arr.min()), 3),
-    }
-
-with open(OUTPUT, "w") as f:
-    json.dump(results, f, indent=2)
-
-# Print summary
-print(f"\n{'='*70}")
-print("ANCHOR ROTATION SUMMARY (threshold=0.65, all 20 anchors)")
-print(f"{'='*70}")
-print(f"{'Group':<35} {'Mean':>6} {'Std':>6} {'Min':>6} {'Max':>6} {'Range':>6}")
-print("-" * 70)
-
-for gk, res in sorted(results.items()):
-    print(f"{gk:<35} {res['mean']:>5.0%} {res['std']:>6.3f} {res['min']:>5.0%} {res['max']:>5.0%} {res['range']:>6.3f}")
-
-# Overall
-all_means = [r["mean"] for r in results.values()]
-print(f"\n{'Overall mean of means:':<35} {np.mean(all_means):.0%}")
-print(f"{'Overall std of means:':<35} {np.std(all_means):.3f}")
-
-print(f"\nSaved: {OUTPUT}")
+            claim_support.append({**without_text(ref), "mean_support": round(avg, 6)})
+
+        scored.append((n_factual / len(claims), n_factual, len(claims), claim_support))
+    return scored
+
+
+def rotate(groups: dict, workers: int = 1, segmenter: str = None) -> dict:
+    """Anchor rotation results per group, anchors sharded over workers."""
+    keys = [k for k in sorted(groups) if len(groups[k]) >= 2]
+    shards_per_group = max(1, math.ceil(workers / max(len(keys), 1)))
+    tasks, owners = [], []
+    for group_key in keys:
+        runs = [{f: r[f] for f in STOCH_FIELDS} for r in groups[group_key]]
+        step = math.ceil(len(runs) / shards_per_group)
+        for lo in range(0, len(runs), step):
+            tasks.append((runs, lo, min(lo + step, len(runs)), segmenter))
+            owners.append(group_key)
+
+    per_group = {k: [] for k in keys}
+    for group_key, scored in zip(owners, shard_map(score_anchors, tasks, workers)):
+        per_group[group_key].extend(scored)
+
+    results = {}
+    for group_key in keys:
+        runs = groups[group_key]
+        n_runs = len(runs)
+
+        print(f"\n{'='*60}")
+        print(f"Anchor rotation: {group_key} ({n_runs} runs)")
+        print(f"{'='*60}")
+
+        anchor_pass_rates = []
+        claim_support = []
+        for anchor_idx, (pass_rate, n_factual, n_claims, supports) in enumerate(per_group[group_key]):
+            anchor_pass_rates.append(pass_rate)
+            claim_support.extend(supports)
+            if n_claims:
+                print(f"  Anchor {anchor_idx+1:>2}: {n_factual}/{n_claims} claims = {pass_rate:.0%}")
+
+        arr = np.array(anchor_pass_rates)
+        results[group_key] = {
+            "model": runs[0]["model"],
+            "scenario": runs[0]["scenario"],
+            "n_anchors": n_runs,
+            "threshold": THRESHOLD,
+            "per_anchor_pass_rates": [round(x, 3) for x in anchor_pass_rates],
+            "mean": round(float(arr.mean()), 3),
+            "std": round(float(arr.std()), 3),
+            "min": round(float(arr.min()), 3),
+            "max": round(float(arr.max()), 3),
+            "range": round(float(arr.max() - arr.min()), 3),
+            "segmenter": segmenter or DEFAULT_MODE,
+            "claims": claim_support,
+        }
+    return results
+
+
+def main(workers: int = 1, segmenter: str = None):
+    store = local_store()
+    results = rotate(load_stochastic_runs(DATA_DIR), workers, segmenter)
+
+    with open(OUTPUT, "w") as f:
+        json.dump(results, f, indent=2)
+
+    # Print summary
+    print(f"\n{'='*70}")
+    print("ANCHOR ROTATION SUMMARY (threshold=0.65, all 20 anchors)")
+    print(f"{'='*70}")
+    print(f"{'Group':<35} {'Mean':>6} {'Std':>6} {'Min':>6} {'Max':>6} {'Range':>6}")
+    print("-" * 70)
+
+    for gk, res in sorted(results.items()):
+        print(f"{gk:<35} {res['mean']:>5.0%} {res['std']:>6.3f} {res['min']:>5.0%} {res['max']:>5.0%} {res['range']:>6.3f}")
+
+    # Overall
+    all_means = [r["mean"] for r in results.values()]
+    print(f"\n{'Overall mean of means:':<35} {np.mean(all_means):.0%}")
+    print(f"{'Overall std of means:':<35} {np.std(all_means):.3f}")
+
+    print(f"\nSaved: {OUTPUT}")
+    print(f"Embedding cache: {store.stats()}" + (" (this process)" if workers > 1 else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PPH SelfCheckGPT anchor rotation")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Score anchor ranges in this many processes (default: 1, in-process)")
+    parser.add_argument("--segmenter", choices=MODES, default=None,
+                        help="Claim segmenter (default: $PPH_SEGMENTER or legacy)")
+    args = parser.parse_args()
+    main(args.workers, args.segmenter)
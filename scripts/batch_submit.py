@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+PPH Batch Submission
+Provider-side batch mode for large matrix phases (e.g. 1000+ sample sweeps).
+
+    python batch_submit.py phase2a --out ~/pph/raw-phase2a
+    python batch_submit.py phase2a --resume            # re-poll after a crash
+    python batch_submit.py phase2a --base-url http://127.0.0.1:8765   # mock_server.py
+
+Runs from experiment_matrix.expand() are grouped per provider and packed
+into submission files of up to --batch-size requests (one JSONL line per
+run, custom_id = run_id). Each file is submitted to the provider's batch
+endpoint. Pending batches are then polled until they end, and the
+results are fanned back out into one JSON per run_id, in the same record
+layout that run_matrix.py writes.
+
+Provider batch endpoints are billed at about half the synchronous price
+and do not count against per-minute request limits. One submission
+replaces hundreds of chat-completion round trips.
+
+    Anthropic Message Batches            CLAUDE
+    OpenAI-compatible files + batches    GEMINI (Gemini API OpenAI endpoint)
+
+Models without a batch endpoint (DeepSeek via OpenRouter) fall back to
+run_matrix's synchronous dispatch in the same invocation.
+
+Every submission is recorded in a batch ledger (JSONL, fsynced) before
+polling starts. An interrupted invocation rerun with --resume picks up
+the outstanding batches instead of submitting them again.
+"""
+
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from experiment_matrix import MODELS, PHASES, RAW_ROOT, count, expand, new_result
+from openrouter_client import READ_TIMEOUT, configure, request
+from run_journal import RunJournal, is_completed, load_run
+from run_matrix import MAX_TOKENS, MODEL_CONCURRENCY, dispatch, load_api_key, save_run, write_summary
+
+BATCH_SIZE = 1000       # requests per submission file
+POLL_SECONDS = 30
+
+PROVIDERS = {
+    "anthropic": {
+        "protocol": "anthropic",
+        "base_url": "https://api.anthropic.com/v1",
+        "key_env": "ANTHROPIC_API_KEY",
+    },
+    "google": {
+        "protocol": "openai",
+        "base_url": "https://generativelanguage.googleapis.com/v1beta/openai",
+        "key_env": "GEMINI_API_KEY",
+    },
+}
+
+# Model key -> (provider, provider model string). Missing = no batch endpoint.
+BATCH_MODELS = {
+    "CLAUDE": ("anthropic", "claude-opus-4-6"),
+    "GEMINI": ("google", "gemini-3-pro-preview"),
+}
+
+
+# -------------------------------------------------------------------
+# Anthropic Message Batches
+# -------------------------------------------------------------------
+def anthropic_headers(api_key):
+    return {"x-api-key": api_key, "anthropic-version": "2023-06-01",
+            "content-type": "application/json"}
+
+
+def anthropic_line(run, model_string):
+    return {"custom_id": run.run_id, "params": {
+        "model": model_string,
+        "max_tokens": MAX_TOKENS,
+        "temperature": run.temperature,
+        "messages": [{"role": "user", "content": run.prompt_text}],
+    }}
+
+
+def anthropic_submit(base_url, api_key, path):
+    requests = [json.loads(line) for line in open(path)]
+    data, _, _ = request("POST", f"{base_url}/messages/batches",
+                         json.dumps({"requests": requests}).encode(), anthropic_headers(api_key))
+    return json.loads(data)["id"]
+
+
+def anthropic_poll(base_url, api_key, batch_id):
+    """Returns the results URL once the batch has ended, else None."""
+    data, _, _ = request("GET", f"{base_url}/messages/batches/{batch_id}",
+                         headers=anthropic_headers(api_key))
+    status = json.loads(data)
+    return status["results_url"] if status["processing_status"] == "ended" else None
+
+
+def anthropic_results(base_url, api_key, results_url):
+    """Yield (custom_id, response_text, reasoning, metadata) or (custom_id, None, error, None)."""
+    data, _, _ = request("GET", results_url, headers=anthropic_headers(api_key))
+    for line in data.decode().splitlines():
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        result = row["result"]
+        if result["type"] != "succeeded":
+            error = result.get("error", {}).get("message") or result["type"]
+            yield row["custom_id"], None, f"batch {result['type']}: {error}", None
+            continue
+        message = result["message"]
+        text = "".join(b.get("text", "") for b in message["content"] if b.get("type") == "text")
+        thinking = "".join(b.get("thinking", "") for b in message["content"] if b.get("type") == "thinking")
+        usage = message.get("usage", {})
+        yield row["custom_id"], text, thinking or None, {
+            "input_tokens": usage.get("input_tokens", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+            "total_tokens": usage.get("input_tokens", 0) + usage.get("output_tokens", 0),
+            "finish_reason": message.get("stop_reason"),
+            "model_returned": message.get("model"),
+            "provider_message_id": message.get("id"),
+        }
+
+
+# -------------------------------------------------------------------
+# OpenAI-compatible files + batches
+# -------------------------------------------------------------------
+def openai_line(run, model_string):
+    body = {
+        "model": model_string,
+        "max_tokens": MAX_TOKENS,
+        "temperature": run.temperature,
+        "messages": [{"role": "user", "content": run.prompt_text}],
+    }
+    if MODELS[run.model]["reasoning"]:
+        body["reasoning_effort"] = "medium"
+    return {"custom_id": run.run_id, "method": "POST", "url": "/v1/chat/completions", "body": body}
+
+
+def openai_submit(base_url, api_key, path):
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"purpose\"\r\n\r\nbatch\r\n"
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{Path(path).name}\"\r\n"
+            f"Content-Type: application/jsonl\r\n\r\n").encode() + Path(path).read_bytes() + \
+        f"\r\n--{boundary}--\r\n".encode()
+    data, _, _ = request("POST", f"{base_url}/files", body, {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": f"multipart/form-data; boundary={boundary}"})
+    file_id = json.loads(data)["id"]
+
+    data, _, _ = request("POST", f"{base_url}/batches", json.dumps({
+        "input_file_id": file_id, "endpoint": "/v1/chat/completions", "completion_window": "24h",
+    }).encode(), {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"})
+    return json.loads(data)["id"]
+
+
+def openai_poll(base_url, api_key, batch_id):
+    """Returns the output file id once the batch has completed, else None."""
+    data, _, _ = request("GET", f"{base_url}/batches/{batch_id}",
+                         headers={"Authorization": f"Bearer {api_key}"})
+    status = json.loads(data)
+    if status["status"] in ("failed", "expired", "cancelled"):
+        raise RuntimeError(f"batch {batch_id} {status['status']}")
+    return status.get("output_file_id") if status["status"] == "completed" else None
+
+
+def openai_results(base_url, api_key, file_id):
+    """Yield (custom_id, response_text, reasoning, metadata) or (custom_id, None, error, None)."""
+    data, _, _ = request("GET", f"{base_url}/files/{file_id}/content",
+                         headers={"Authorization": f"Bearer {api_key}"})
+    for line in data.decode().splitlines():
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        response = row.get("response") or {}
+        body = response.get("body") or {}
+        if row.get("error") or response.get("status_code") != 200:
+            error = row.get("error") or body.get("error") or f"status {response.get('status_code')}"
+            yield row["custom_id"], None, f"batch error: {error}", None
+            continue
+        choice = body["choices"][0]
+        message = choice["message"]
+        usage = body.get("usage", {})
+        yield row["custom_id"], message.get("content", ""), message.get("reasoning_content"), {
+            "input_tokens": usage.get("prompt_tokens", 0),
+            "output_tokens": usage.get("completion_tokens", 0),
+            "reasoning_tokens": (usage.get("completion_tokens_details") or {}).get("reasoning_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0),
+            "finish_reason": choice.get("finish_reason"),
+            "model_returned": body.get("model"),
+            "provider_message_id": body.get("id"),
+        }
+
+
+PROTOCOLS = {
+    "anthropic": {"line": anthropic_line, "submit": anthropic_submit,
+                  "poll": anthropic_poll, "results": anthropic_results},
+    "openai": {"line": openai_line, "submit": openai_submit,
+               "poll": openai_poll, "results": openai_results},
+}
+
+
+# -------------------------------------------------------------------
+# Submission, polling and fan-out
+# -------------------------------------------------------------------
+def submit_chunk(provider, runs, batch_dir, base_url, api_key, ledger):
+    """Pack runs into a submission file, submit it, and record it in the ledger."""
+    protocol = PROTOCOLS[PROVIDERS[provider]["protocol"]]
+    model_string = BATCH_MODELS[runs[0].model][1]
+    path = batch_dir / f"{provider}-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}.jsonl"
+    with open(path, "w") as f:
+        for run in runs:
+            f.write(json.dumps(protocol["line"](run, BATCH_MODELS[run.model][1]), ensure_ascii=False) + "\n")
+
+    batch_id = protocol["submit"](base_url, api_key, path)
+    row = {"batch_id": batch_id, "provider": provider, "model_string": model_string,
+           "file": path.name, "run_ids": [run.run_id for run in runs],
+           "submitted": datetime.now(timezone.utc).isoformat(), "status": "submitted"}
+    ledger.append(row)
+    print(f"  submitted {batch_id} ({provider}, {len(runs)} requests, {path.name})")
+    return row
+
+
+def collect(batch, ref, phase, base_url, api_key, out_dir, journal):
+    """Fan one finished batch out into per-run JSONs. Returns (ok, error) counts."""
+    provider = batch["provider"]
+    protocol = PROTOCOLS[PROVIDERS[provider]["protocol"]]
+    wanted = set(batch["run_ids"])
+    runs = {run.run_id: run for run in expand(phase) if run.run_id in wanted}
+    ok = err = 0
+    timestamp = datetime.now(timezone.utc).isoformat()
+
+    for custom_id, text, reasoning, meta in protocol["results"](base_url, api_key, ref):
+        run = runs.get(custom_id)
+        if run is None:
+            continue
+        wanted.discard(custom_id)
+        result = new_result(run, timestamp)
+        result["model_api_string"] = BATCH_MODELS[run.model][1]
+        result["model_route"] = f"{provider}-batch"
+        result["temperature"] = run.temperature
+        result["metadata"]["batch_id"] = batch["batch_id"]
+        if text is None:
+            result["full_response"] = f"ERROR after all retries: {reasoning}"
+            status = "ERROR"
+        else:
+            result["full_response"] = text
+            result["reasoning_trace"] = reasoning
+            result["metadata"]["response_length_chars"] = len(text)
+            result["metadata"]["response_length_words"] = len(text.split())
+            result["metadata"].update(meta)
+            status = "OK"
+        save_run(result, status, out_dir, journal)
+        ok, err = ok + (status == "OK"), err + (status == "ERROR")
+
+    for run_id in wanted:  # requests the provider dropped from the results
+        result = new_result(runs[run_id], timestamp)
+        result["full_response"] = "ERROR after all retries: missing from batch results"
+        save_run(result, "ERROR", out_dir, journal)
+        err += 1
+    return ok, err
+
+
+def provider_config(provider, base_url):
+    """(base_url, api_key) for a provider; --base-url points every provider at one server."""
+    cfg = PROVIDERS[provider]
+    if base_url:
+        return f"{base_url.rstrip('/')}/v1", load_api_key(cfg["key_env"]) or "mock"
+    return cfg["base_url"], load_api_key(cfg["key_env"])
+
+
+def main(phase, out_dir=None, resume=False, batch_size=BATCH_SIZE, poll_seconds=POLL_SECONDS,
+         base_url=None, workers=4, pool_size=None, timeout=None):
+    # One pooled connection per API call that can be in flight, so nobody queues for a slot
+    configure(pool_size=pool_size or max(1, min(workers, sum(MODEL_CONCURRENCY.values()))),
+              read_timeout=timeout)
+    spec = PHASES[phase]
+    out_dir = Path(out_dir) if out_dir else RAW_ROOT / spec["raw_dir"]
+    batch_dir = out_dir / "batches"
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    journal = RunJournal(out_dir / f"PPH-001-{phase}-progress.jsonl")
+    ledger = RunJournal(batch_dir / f"PPH-001-{phase}-batches.jsonl", key="batch_id")
+
+    configs = {}
+    for provider in {p for m, (p, _) in BATCH_MODELS.items() if m in spec["axes"]["model"]}:
+        configs[provider] = provider_config(provider, base_url)
+        if not configs[provider][1]:
+            print(f"ERROR: {PROVIDERS[provider]['key_env']} not found in environment or .env file.")
+            return
+
+    print("=" * 80)
+    print(f"PPH-001 {phase}: {count(phase)} runs, batch mode")
+    print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Output:  {out_dir}")
+    print("=" * 80)
+
+    # Outstanding batches from an interrupted invocation are polled, not resubmitted
+    outstanding = {}
+    if resume:
+        outstanding = {bid: row for bid, row in ledger.load().items() if row["status"] == "submitted"}
+        if outstanding:
+            print(f"Resume:  {len(outstanding)} outstanding batches")
+    in_flight = {run_id for row in outstanding.values() for run_id in row["run_ids"]}
+
+    runs = expand(phase)
+    if resume:
+        runs = (run for run in runs if run.run_id not in in_flight
+                and not is_completed(load_run(out_dir / f"{run.run_id}.json")))
+
+    pending = {}        # provider -> runs waiting to fill a submission file
+    synchronous = []    # models without a batch endpoint
+    for run in runs:
+        if run.model not in BATCH_MODELS:
+            synchronous.append(run)
+            continue
+        provider = BATCH_MODELS[run.model][0]
+        pending.setdefault(provider, []).append(run)
+        if len(pending[provider]) >= batch_size:
+            row = submit_chunk(provider, pending.pop(provider), batch_dir, *configs[provider], ledger)
+            outstanding[row["batch_id"]] = row
+    for provider, chunk in pending.items():
+        row = submit_chunk(provider, chunk, batch_dir, *configs[provider], ledger)
+        outstanding[row["batch_id"]] = row
+
+    ok = err = 0
+    if synchronous:
+        print(f"\n{len(synchronous)} runs have no batch endpoint; running them synchronously")
+        api_key = load_api_key()
+        if not api_key:
+            print("ERROR: OPENROUTER_API_KEY not found; skipping synchronous runs.")
+        else:
+            s_ok, s_err = dispatch(synchronous, api_key, workers, out_dir, journal)
+            ok, err = ok + s_ok, err + s_err
+
+    start = time.time()
+    while outstanding:
+        for batch_id, batch in list(outstanding.items()):
+            provider_url, api_key = configs[batch["provider"]]
+            protocol = PROTOCOLS[PROVIDERS[batch["provider"]]["protocol"]]
+            try:
+                ref = protocol["poll"](provider_url, api_key, batch_id)
+            except RuntimeError as e:
+                print(f"  {e}; its runs stay pending for the next --resume")
+                ledger.append({**batch, "status": "failed"})
+                del outstanding[batch_id]
+                continue
+            if ref is None:
+                continue
+            b_ok, b_err = collect(batch, ref, phase, provider_url, api_key, out_dir, journal)
+            ok, err = ok + b_ok, err + b_err
+            ledger.append({**batch, "status": "collected",
+                           "collected": datetime.now(timezone.utc).isoformat()})
+            del outstanding[batch_id]
+            print(f"  collected {batch_id}: {b_ok} OK, {b_err} ERROR ({time.time() - start:.0f}s)")
+        if outstanding:
+            time.sleep(poll_seconds)
+
+    summary, summary_path = write_summary(phase, out_dir, journal)
+    print(f"\nThis session: {ok} OK, {err} ERROR")
+    print(f"Phase total:  {summary['successful']}/{count(phase)} OK")
+    print(f"Summary:      {summary_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PPH-001 provider batch runner")
+    parser.add_argument("phase", choices=list(PHASES))
+    parser.add_argument("--out", help="Output directory (default: the phase's raw dir)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Poll outstanding batches and skip completed run_ids")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"Requests per submission file (default: {BATCH_SIZE})")
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS,
+                        help=f"Seconds between status polls (default: {POLL_SECONDS})")
+    parser.add_argument("--base-url", help="Send every batch to one server (e.g. mock_server.py)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Concurrency for the synchronous fallback (default: 4)")
+    parser.add_argument("--pool-size", type=int, default=None,
+                        help="OpenRouter keep-alive connections (default: in-flight API calls allowed by --workers)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help=f"Seconds per OpenRouter socket read (default: {READ_TIMEOUT})")
+    args = parser.parse_args()
+
+    main(args.phase, args.out, args.resume, args.batch_size, args.poll, args.base_url, args.workers,
+         args.pool_size, args.timeout)
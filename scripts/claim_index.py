@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+"""
+PPH Claim Index
+Persistent approximate nearest-neighbor index (IVF-flat, NumPy only)
+over the claims of every run, for "has this explanation appeared
+before?" lookups, index-backed support scoring and large-group
+clustering.
+
+Each row is one claim: its L2-normalized embedding plus metadata
+(claim_id, run_id, model, scenario, sha1, text). Vectors are clustered
+into n_cells() cells (about 2 sqrt(n)) by spherical k-means, and each row is filed under its
+nearest centroid. A query scores the NPROBE nearest cells exactly and
+keeps the top k. Larger query batches are grouped per cell, so a batch
+costs one small matmul per probed cell rather than a loop per query.
+
+Rows added after the last packing form a tail that is always scanned
+exactly. The tail is folded into the packed cells once it exceeds
+REPACK_FRACTION of the index. Below TRAIN_MIN rows the index is exact
+(everything is tail). It retrains when it has grown RETRAIN_GROWTH-fold
+since training. Claims are keyed by claim_id, so re-adding a run is a
+no-op.
+
+Layout (index_dir=None keeps everything in memory):
+    <index_dir>/<model>__<segmenter>/meta.json      dim, nlist, trained_rows
+    <index_dir>/<model>__<segmenter>/vectors.f32    row-major float32 vectors
+    <index_dir>/<model>__<segmenter>/lists.i32      cell of each row (-1 = unassigned)
+    <index_dir>/<model>__<segmenter>/centroids.f32  nlist x dim
+    <index_dir>/<model>__<segmenter>/claims.jsonl   metadata, one line per row
+
+Writes append under an exclusive file lock. A claims.jsonl line is
+written last, so a row exists once its line is complete. Under the lock
+a writer first reads the rows (and any retraining) other processes added,
+then truncates all three row files back to that shared row count, so
+rows a crashed writer left without a claims line are dropped rather than
+shifting later rows out of alignment. Readers see other processes' rows
+when they reopen the index or next add to it.
+
+Usage:
+    python3 claim_index.py --build                 # index every run in data/phase*
+    python3 claim_index.py --query "Seasonal demand effects"
+    python3 claim_index.py --bench                 # synthetic recall / latency check
+"""
+
+import argparse
+import fcntl
+import json
+import math
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_DIR = SCRIPT_DIR.parent
+sys.path.insert(0, str(SCRIPT_DIR))
+
+from claims import DEFAULT_MODE, MODES, claim_refs
+from similarity import normalize_rows
+
+DEFAULT_INDEX_DIR = REPO_DIR / ".cache" / "claim_index"
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+META_FIELDS = ("claim_id", "run_id", "model", "scenario", "sha1", "text")
+
+TRAIN_MIN = 2048            # exact search below this many rows
+TRAIN_PER_CELL = 64         # k-means sample size per cell
+KMEANS_ITERS = 10
+RETRAIN_GROWTH = 4          # retrain once rows >= this x trained_rows
+REPACK_FRACTION = 0.1       # fold the tail into cells beyond this share of rows
+NPROBE = 8
+SMALL_BATCH = 8             # queries searched one by one rather than per cell
+CHUNK = 4096                # rows per assignment matmul
+
+
+def n_cells(n_rows: int) -> int:
+    """Cell count for n_rows (about 2 sqrt(n), at least 32 rows per cell)."""
+    return max(1, min(int(2 * math.sqrt(n_rows)), n_rows // 32))
+
+
+def nearest_centroid(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.concatenate([np.argmax(vectors[i:i + CHUNK] @ centroids.T, axis=1)
+                           for i in range(0, len(vectors), CHUNK)] or [np.zeros(0, dtype=np.int64)])
+
+
+def spherical_kmeans(vectors: np.ndarray, k: int, iters: int = KMEANS_ITERS, seed: int = 0) -> np.ndarray:
+    """k unit centroids for unit vectors (empty cells are reseeded from random rows)."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = nearest_centroid(vectors, centroids)
+        order = np.argsort(assign, kind="stable")
+        cells, starts = np.unique(assign[order], return_index=True)
+        sums = np.zeros_like(centroids)
+        sums[cells] = np.add.reduceat(vectors[order], starts, axis=0)
+        empty = np.setdiff1d(np.arange(k), cells)
+        sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class ClaimIndex:
+    """IVF-flat cosine index over claim embeddings with claim metadata."""
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR, model_name: str = DEFAULT_MODEL,
+                 segmenter: str = None):
+        self.model_name = model_name
+        self.segmenter = segmenter or DEFAULT_MODE
+        self.dir = None
+        if index_dir is not None:
+            self.dir = Path(index_dir) / f"{model_name.replace('/', '__')}__{self.segmenter}"
+            self.dir.mkdir(parents=True, exist_ok=True)
+
+        self.dim = None
+        self.meta = []              # row -> metadata dict
+        self.rows = {}              # claim_id -> row
+        self.runs = {}              # run_id -> code
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._cell = np.zeros(0, dtype=np.int32)
+        self._run_code = np.zeros(0, dtype=np.int64)
+        self.centroids = None
+        self.trained_rows = 0
+        self._claims_offset = 0     # bytes of claims.jsonl already read
+
+        # Packed layout: rows of cell c are _order[_bounds[c]:_bounds[c + 1]]
+        self._packed = None
+        self._order = None
+        self._bounds = None
+        self._packed_rows = 0
+
+        self._sync()
+
+    # ---------------------------------------------------------------
+    # Persistence
+    # ---------------------------------------------------------------
+    def _path(self, name: str) -> Path:
+        return self.dir / name
+
+    @contextmanager
+    def _locked(self):
+        if self.dir is None:
+            yield
+            return
+        with open(self._path(".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _sync(self):
+        """Pick up rows and retraining written since the last read (by us or another process)."""
+        if self.dir is None or not self._path("meta.json").exists():
+            return
+        info = json.loads(self._path("meta.json").read_text())
+        if self.dim is None:
+            self.dim = info["dim"]
+            self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+
+        # A row is valid once its vector, its cell and its claims line are all on disk
+        start = len(self.meta)
+        n_disk = min(self._path(name).stat().st_size // width if self._path(name).exists() else 0
+                     for name, width in (("vectors.f32", self.dim * 4), ("lists.i32", 4)))
+        metas = []
+        if self._path("claims.jsonl").exists():
+            with open(self._path("claims.jsonl"), "rb") as f:
+                f.seek(self._claims_offset)
+                for line in f:
+                    if not line.endswith(b"\n") or start + len(metas) >= n_disk:
+                        break
+                    metas.append(json.loads(line))
+                    self._claims_offset += len(line)
+        n = start + len(metas)
+
+        retrained = info.get("trained_rows", 0) != self.trained_rows
+        if retrained:
+            self.trained_rows = info.get("trained_rows", 0)
+            self.centroids = np.fromfile(self._path("centroids.f32"), dtype=np.float32).reshape(-1, self.dim) \
+                if self.trained_rows else None
+            self._packed_rows = 0
+        if metas:
+            fresh = np.fromfile(self._path("vectors.f32"), dtype=np.float32, count=len(metas) * self.dim,
+                                offset=start * self.dim * 4).reshape(-1, self.dim)
+            self._vectors = np.concatenate([self._vectors, fresh])
+            self._register(metas)
+        if retrained or metas:
+            first = 0 if retrained else start
+            cells = np.fromfile(self._path("lists.i32"), dtype=np.int32, count=n - first, offset=first * 4)
+            self._cell = np.concatenate([self._cell[:first], cells])
+
+    def _truncate(self):
+        """Cut every row file back to the rows all three agree on."""
+        if self.dir is None:
+            return
+        n = len(self.meta)
+        for name, size in (("vectors.f32", n * self.dim * 4), ("lists.i32", n * 4),
+                           ("claims.jsonl", self._claims_offset)):
+            if self._path(name).exists():
+                os.truncate(self._path(name), size)
+
+    def _write_meta(self):
+        if self.dir is None:
+            return
+        info = {"model": self.model_name, "segmenter": self.segmenter, "dim": self.dim,
+                "nlist": 0 if self.centroids is None else len(self.centroids),
+                "trained_rows": self.trained_rows}
+        tmp = self._path("meta.json.tmp")
+        tmp.write_text(json.dumps(info))
+        os.replace(tmp, self._path("meta.json"))
+
+    def _rewrite(self, name: str, array: np.ndarray):
+        tmp = self._path(name + ".tmp")
+        array.tofile(tmp)
+        os.replace(tmp, self._path(name))
+
+    def _register(self, metas: list):
+        codes = []
+        for meta in metas:
+            self.rows[meta["claim_id"]] = len(self.meta)
+            self.meta.append(meta)
+            codes.append(self.runs.setdefault(meta["run_id"], len(self.runs)))
+        self._run_code = np.concatenate([self._run_code, np.asarray(codes, dtype=np.int64)])
+
+    # ---------------------------------------------------------------
+    # Training and layout
+    # ---------------------------------------------------------------
+    def train(self, seed: int = 0):
+        """(Re)cluster all rows, including those other processes added, and reassign every row to a cell."""
+        with self._locked():
+            self._sync()
+            self._train(seed)
+
+    def _train(self, seed: int = 0):
+        n = len(self.meta)
+        k = n_cells(n)
+        sample = self._vectors
+        if n > TRAIN_PER_CELL * k:
+            sample = self._vectors[np.random.default_rng(seed).choice(n, TRAIN_PER_CELL * k, replace=False)]
+        self.centroids = spherical_kmeans(sample, k, seed=seed)
+        self._cell = nearest_centroid(self._vectors, self.centroids).astype(np.int32)
+        self.trained_rows = n
+        self._packed_rows = 0
+        if self.dir is not None:
+            self._rewrite("centroids.f32", self.centroids)
+            self._rewrite("lists.i32", self._cell)
+            self._write_meta()
+
+    def _pack(self):
+        """Fold the tail into the packed cells once it is big enough."""
+        n = len(self.meta)
+        if self.centroids is None or n - self._packed_rows <= REPACK_FRACTION * max(self._packed_rows, 1):
+            return
+        self._order = np.argsort(self._cell[:n], kind="stable")
+        self._bounds = np.searchsorted(self._cell[self._order], np.arange(len(self.centroids) + 1))
+        self._packed = self._vectors[self._order]
+        self._packed_rows = n
+
+    # ---------------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.meta)
+
+    def __contains__(self, claim_id: str) -> bool:
+        return claim_id in self.rows
+
+    def add(self, metas: list[dict], vectors) -> int:
+        """
+        Add claims (metadata dicts with at least claim_id and run_id) and
+        their embeddings. Claims already in the index are skipped.
+        Returns the number of rows added.
+        """
+        vectors = normalize_rows(vectors)
+
+        with self._locked():
+            # Dedupe against rows other processes appended meanwhile
+            self._sync()
+            fresh, seen = [], set()
+            for i, meta in enumerate(metas):
+                if meta["claim_id"] not in self.rows and meta["claim_id"] not in seen:
+                    seen.add(meta["claim_id"])
+                    fresh.append(i)
+            if not fresh:
+                return 0
+            metas = [{k: metas[i].get(k) for k in META_FIELDS} for i in fresh]
+            vectors = vectors[fresh]
+
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+                self._write_meta()
+            self._truncate()
+            cells = (nearest_centroid(vectors, self.centroids).astype(np.int32)
+                     if self.centroids is not None else np.full(len(vectors), -1, dtype=np.int32))
+            self._vectors = np.concatenate([self._vectors, vectors])
+            self._cell = np.concatenate([self._cell, cells])
+            self._register(metas)
+
+            if self.dir is not None:
+                with open(self._path("vectors.f32"), "ab") as f:
+                    f.write(vectors.tobytes())
+                with open(self._path("lists.i32"), "ab") as f:
+                    f.write(cells.tobytes())
+                with open(self._path("claims.jsonl"), "ab") as f:
+                    f.write("".join(json.dumps(m, ensure_ascii=False) + "\n" for m in metas).encode("utf-8"))
+                    f.flush()
+                    os.fsync(f.fileno())
+                    self._claims_offset = f.tell()
+
+            n = len(self.meta)
+            if (self.centroids is None and n >= TRAIN_MIN) or \
+                    (self.centroids is not None and n >= RETRAIN_GROWTH * self.trained_rows):
+                self._train()
+        return len(fresh)
+
+    def add_runs(self, runs, store, extra: dict = None) -> int:
+        """
+        Segment and embed every run not yet indexed. runs are mappings
+        with run_id and response (plus model / scenario if known);
+        embeddings come from the EmbeddingStore `store`.
+        """
+        metas = []
+        for run in runs:
+            if run["run_id"] in self.runs or not isinstance(run["response"], str):
+                continue
+            for ref in claim_refs(run["run_id"], run["response"], self.segmenter):
+                metas.append({**ref, "model": run.get("model"), "scenario": run.get("scenario"),
+                              **(extra or {})})
+        if not metas:
+            return 0
+        return self.add(metas, store.encode([m["text"] for m in metas]))
+
+    def search(self, queries, k: int = 10, nprobe: int = NPROBE, run_ids=None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k cosine neighbors of each query row.
+
+        run_ids restricts hits to claims of those runs.
+        Returns (scores, rows), both (n_queries x k), best first. Missing
+        hits are padded with row -1 and score -inf.
+        """
+        q = normalize_rows(np.atleast_2d(queries))
+        nq = len(q)
+        best_s = np.full((nq, k), -np.inf, dtype=np.float32)
+        best_r = np.full((nq, k), -1, dtype=np.int64)
+        if not nq or not self.meta:
+            return best_s, best_r
+        self._pack()
+
+        allowed = None
+        if run_ids is not None:
+            codes = [self.runs[r] for r in run_ids if r in self.runs]
+            allowed = np.isin(self._run_code, codes)
+
+        def merge(qidx, rows, block):
+            if allowed is not None:
+                block[:, ~allowed[rows]] = -np.inf
+            scores = np.concatenate([best_s[qidx], block], axis=1)
+            cand = np.concatenate([best_r[qidx], np.broadcast_to(rows, block.shape)], axis=1)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            best_s[qidx] = np.take_along_axis(scores, top, axis=1)
+            best_r[qidx] = np.take_along_axis(cand, top, axis=1)
+
+        if self._packed_rows:
+            nlist = len(self.centroids)
+            probe = min(nprobe, nlist)
+            cells = np.argpartition(-(q @ self.centroids.T), probe - 1, axis=1)[:, :probe]
+            if nq <= SMALL_BATCH:
+                # Few queries: gather each one's cells and score them in one go
+                for i in range(nq):
+                    spans = [(self._bounds[c], self._bounds[c + 1]) for c in cells[i]]
+                    rows = np.concatenate([self._order[a:b] for a, b in spans])
+                    block = np.concatenate([self._packed[a:b] @ q[i] for a, b in spans])
+                    merge(np.array([i]), rows, block[None, :])
+            else:
+                # Batches: one matmul per probed cell over the queries probing it
+                flat = cells.ravel()
+                owners = np.repeat(np.arange(nq), probe)
+                by_cell = np.argsort(flat, kind="stable")
+                cell_ids, starts = np.unique(flat[by_cell], return_index=True)
+                for c, lo, hi in zip(cell_ids, starts, list(starts[1:]) + [len(flat)]):
+                    a, b = self._bounds[c], self._bounds[c + 1]
+                    if a == b:
+                        continue
+                    qidx = owners[by_cell[lo:hi]]
+                    merge(qidx, self._order[a:b], q[qidx] @ self._packed[a:b].T)
+
+        tail = np.arange(self._packed_rows, len(self.meta))
+        for i in range(0, len(tail), CHUNK):
+            rows = tail[i:i + CHUNK]
+            merge(np.arange(nq), rows, q @ self._vectors[rows].T)
+
+        order = np.argsort(-best_s, axis=1, kind="stable")
+        best_s = np.take_along_axis(best_s, order, axis=1)
+        best_r = np.take_along_axis(best_r, order, axis=1)
+        best_r[~np.isfinite(best_s)] = -1
+        return best_s, best_r
+
+    def neighbors(self, queries, k: int = 10, nprobe: int = NPROBE, run_ids=None) -> list[list[dict]]:
+        """search() results as metadata dicts with a "similarity" key."""
+        scores, rows = self.search(queries, k, nprobe, run_ids)
+        return [[{**self.meta[r], "similarity": round(float(s), 4)} for s, r in zip(srow, rrow) if r >= 0]
+                for srow, rrow in zip(scores, rows)]
+
+    def run_support(self, claim_vectors, run_ids: list, k_per_run: int = 4,
+                    nprobe: int = NPROBE) -> np.ndarray:
+        """
+        Index-backed max_support_scores: (n_claims x len(run_ids)) max
+        cosine between each claim and its best hit in each run. A run with
+        no claim among a claim's top k_per_run x len(run_ids) hits is NaN,
+        not 0: the caller scores those pairs exactly. Found pairs are the
+        best hit in the probed cells, a lower bound on the true max.
+        """
+        run_ids = list(run_ids)
+        support = np.full((len(claim_vectors), len(run_ids)), np.nan, dtype=np.float32)
+        if not run_ids or not len(claim_vectors):
+            return support
+        scores, rows = self.search(claim_vectors, k_per_run * len(run_ids), nprobe, run_ids)
+        column = {self.runs[r]: j for j, r in enumerate(run_ids) if r in self.runs}
+        for i, (srow, rrow) in enumerate(zip(scores, rows)):
+            for s, r in zip(srow, rrow):
+                if r < 0:
+                    break
+                j = column[self._run_code[r]]
+                if np.isnan(support[i, j]):     # rows are best first
+                    support[i, j] = s
+        return support
+
+    def knn_edges(self, threshold: float, k: int = 32, nprobe: int = NPROBE) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate similarity.threshold_edges over the indexed rows: each
+        row's top-k neighbors with cosine >= threshold, as (src, dst) pairs
+        with src < dst.
+        """
+        src, dst = [], []
+        for i in range(0, len(self.meta), CHUNK):
+            rows = np.arange(i, min(i + CHUNK, len(self.meta)))
+            scores, hits = self.search(self._vectors[rows], k + 1, nprobe)
+            keep = (scores >= threshold) & (hits >= 0) & (hits != rows[:, None])
+            a = np.broadcast_to(rows[:, None], hits.shape)[keep]
+            b = hits[keep]
+            src.append(np.minimum(a, b))
+            dst.append(np.maximum(a, b))
+        if not src:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        n = len(self.meta)
+        pairs = np.unique(np.concatenate(src) * n + np.concatenate(dst))
+        return pairs // n, pairs % n
+
+    def stats(self) -> str:
+        cells = 0 if self.centroids is None else len(self.centroids)
+        return f"{len(self.meta)} claims from {len(self.runs)} runs, {cells} cells (trained on {self.trained_rows})"
+
+
+def build(index: ClaimIndex, store) -> int:
+    """Index every run in the run store (all phases)."""
+    from run_store import get_store
+    from selfcheckgpt_test import STOCH_FIELDS
+
+    runs = get_store()
+    runs.sync_all()
+    return index.add_runs(runs.select(names=STOCH_FIELDS), store)
+
+
+def bench(n: int = 50_000, dim: int = 384, k: int = 10, n_queries: int = 1000, seed: int = 0):
+    """Recall@k and latency against exact search on clustered synthetic vectors."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n // 50, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), n)] + 1.2 * rng.normal(size=(n, dim)).astype(np.float32)
+    metas = [{"claim_id": f"R{i // 20}#{i % 20}", "run_id": f"R{i // 20}"} for i in range(n)]
+
+    index = ClaimIndex(None)
+    start = time.perf_counter()
+    for i in range(0, n, 5000):
+        index.add(metas[i:i + 5000], vectors[i:i + 5000])
+    print(f"insert {n} x {dim}: {time.perf_counter() - start:.2f}s  ({index.stats()})")
+
+    queries = vectors[rng.choice(n, n_queries, replace=False)] + 0.3 * rng.normal(size=(n_queries, dim)).astype(np.float32)
+    exact = np.argsort(-(normalize_rows(queries) @ normalize_rows(vectors).T), axis=1)[:, :k]
+    for nprobe in (1, 4, NPROBE, 16, 32):
+        index.search(queries[:10], k, nprobe)
+        start = time.perf_counter()
+        _, rows = index.search(queries, k, nprobe)
+        batch = time.perf_counter() - start
+        start = time.perf_counter()
+        for q in queries[:200]:
+            index.search(q, k, nprobe)
+        single = (time.perf_counter() - start) / 200
+        recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(rows, exact)])
+        print(f"nprobe={nprobe:>3}  recall@{k}={recall:.3f}  batched {batch / n_queries * 1e3:.3f} ms/query  "
+              f"single {single * 1e3:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PPH claim nearest-neighbor index")
+    parser.add_argument("--build", action="store_true", help="Index every run in data/phase*")
+    parser.add_argument("--query", action="append", default=[], help="Claim text to look up (repeatable)")
+    parser.add_argument("-k", type=int, default=10, help="Neighbors per query")
+    parser.add_argument("--nprobe", type=int, default=NPROBE, help="Cells scanned per query")
+    parser.add_argument("--segmenter", choices=MODES, default=None,
+                        help="Claim segmenter (default: $PPH_SEGMENTER or legacy)")
+    parser.add_argument("--index-dir", default=None, help="Index directory (default: <repo>/.cache/claim_index)")
+    parser.add_argument("--cache-dir", default=None, help="Embedding cache directory (default: <repo>/.cache/embeddings)")
+    parser.add_argument("--bench", action="store_true", help="Synthetic recall / latency benchmark")
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(k=args.k)
+        sys.exit(0)
+
+    from embedding_store import DEFAULT_CACHE_DIR, EmbeddingStore
+    store = EmbeddingStore(args.cache_dir or DEFAULT_CACHE_DIR)
+    index = ClaimIndex(args.index_dir or DEFAULT_INDEX_DIR, store.model_name, args.segmenter)
+    if args.build:
+        start = time.perf_counter()
+        added = build(index, store)
+        print(f"Added {added} claims in {time.perf_counter() - start:.2f}s: {index.stats()}")
+    for text, hits in zip(args.query, index.neighbors(store.encode(args.query), args.k, args.nprobe)):
+        print(f"\n{text}")
+        for hit in hits:
+            print(f"  {hit['similarity']:.3f}  {hit['claim_id']:<50} {hit['text'][:80]}")
+    if not args.build and not args.query:
+        print(index.stats())
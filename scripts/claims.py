@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+PPH Claim Segmenter
+Splits a model response into claims with character offsets, for the
+SelfCheckGPT scorers.
+
+Two modes:
+    legacy    the original extract_claims: drop "#" header lines, split
+              after . ! ?, keep pieces longer than 20 characters that do
+              not start with "|" or "-". Claim text is identical to the
+              old output, so published scores reproduce exactly.
+    markdown  block-aware. Fenced code blocks, headers and rules are
+              skipped. Each bullet or numbered item, including nested
+              and continuation lines, is split into sentences on its own
+              (confabulation lists live in bullets, which legacy drops).
+              Every table body row becomes one claim; header and
+              separator rows are skipped. Paragraphs are split into
+              sentences. Lead-in fragments ending in ":" are skipped.
+
+iter_claims() is a generator of Claim(text, start, end, kind). The
+offsets index the original response. In markdown mode text is always
+response[start:end]. In legacy mode that holds unless a removed header
+line fell inside the sentence. segment() memoizes the full tuple per
+(response, mode); scorers that re-split the same reference responses
+hit the cache.
+
+claim_refs() attaches stable identity to each claim of a run: run_id,
+claim_index, start, end and the sha1 of the claim text. claim_id is
+"<run_id>#<mode>#<claim_index>": the same index means a different claim
+under another segmenter, so IDs from different modes never collide.
+Scorer outputs carry these fields, so results from different scorers
+join on claim_id (or on sha1 across runs) without re-segmenting any
+response.
+
+The default mode comes from PPH_SEGMENTER (legacy if unset).
+
+Benchmark over every run in data/phase*:
+    python3 claims.py --bench
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Iterator, NamedTuple
+
+MODES = ("legacy", "markdown")
+DEFAULT_MODE = os.environ.get("PPH_SEGMENTER", "legacy")
+MIN_CHARS = 20          # claims must be longer than this
+CACHE_SIZE = 4096       # responses kept per process
+
+_HEADER = re.compile(r"^#+\s+.*$", re.MULTILINE)
+_BOUNDARY = re.compile(r"(?<=[.!?])(\s+)")
+_GAP = re.compile(r"[.!?](\s+)")      # _BOUNDARY with the punctuation consumed (no lookbehind per position)
+
+_FENCE = re.compile(r"[ \t]{0,3}(```|~~~)")
+_HEADER_LINE = re.compile(r"[ \t]{0,3}#{1,6}(?:\s|$)")
+_RULE = re.compile(r"[ \t]{0,3}([-*_])(?:[ \t]*\1){2,}[ \t]*$")
+_BULLET = re.compile(r"[ \t]*(?:[-*+]|\d{1,3}[.)])[ \t]+")
+_QUOTE = re.compile(r"[ \t]{0,3}>[ \t]?")
+_TABLE_ROW = re.compile(r"[ \t]*\|")
+_TABLE_SEP = re.compile(r"[ \t]*\|?[ \t]*:?-+:?[ \t]*(?:\|[ \t]*:?-+:?[ \t]*)*\|?[ \t]*$")
+
+
+class Claim(NamedTuple):
+    text: str
+    start: int
+    end: int
+    kind: str       # "text", "bullet" or "table"
+
+
+def _sentences(text: str, base: int, kind: str) -> Iterator[Claim]:
+    """Sentence pieces of text (offsets shifted by base) that pass the claim filter."""
+    parts = _BOUNDARY.split(text)      # piece, separator, piece, ...
+    pos = base
+    for i in range(0, len(parts), 2):
+        piece = parts[i]
+        s = piece.strip()
+        if len(s) > MIN_CHARS and s[-1] != ":":
+            start = pos + len(piece) - len(piece.lstrip())
+            yield Claim(s, start, start + len(s), kind)
+        pos += len(piece)
+        if i + 1 < len(parts):
+            pos += len(parts[i + 1])
+
+
+def _header_spans(response: str) -> list[tuple[int, int]]:
+    """Spans of _HEADER matches, trying only the lines that start with '#'."""
+    spans, i = [], -1
+    while True:
+        m = _HEADER.match(response, i + 1)
+        if m:
+            spans.append(m.span())
+        i = response.find("\n#", m.end() if m else i + 1)
+        if i < 0:
+            return spans
+
+
+def _iter_legacy(response: str) -> Iterator[Claim]:
+    # Header lines are blanked in place rather than removed: every split
+    # point is the same (a blank run is whitespace, like the newlines
+    # removal leaves), and offsets already index the response
+    headers = _header_spans(response) if "#" in response else []
+    text = response
+    if headers:
+        parts, p = [], 0
+        for start, end in headers:
+            parts += (response[p:start], " " * (end - start))
+            p = end
+        parts.append(response[p:])
+        text = "".join(parts)
+    starts = [start for start, _ in headers]
+
+    pos = 0
+    ends = [(m.start(1), m.end()) for m in _GAP.finditer(text)]
+    ends.append((len(text), len(text)))
+    for stop, nxt in ends:
+        if stop - pos <= MIN_CHARS:
+            pos = nxt
+            continue        # too short before stripping, never a claim
+        piece = text[pos:stop]
+        pos = nxt
+        s = piece.strip()
+        if len(s) <= MIN_CHARS:
+            continue        # dropping header text can only shorten it
+        start = stop - len(piece.lstrip())
+        end = start + len(s)
+        if headers:
+            h = bisect_left(starts, start)
+            if h < len(starts) and starts[h] < end:
+                # A header line inside the sentence: drop it from the text, as removal did
+                kept, p = [], start
+                while h < len(starts) and starts[h] < end:
+                    kept.append(response[p:starts[h]])
+                    p = headers[h][1]
+                    h += 1
+                kept.append(response[p:end])
+                s = "".join(kept)
+        if len(s) > MIN_CHARS and s[0] != "|" and s[0] != "-":
+            yield Claim(s, start, end, "text")
+
+
+def _iter_markdown(response: str) -> Iterator[Claim]:
+    block = None        # [kind, start, end] of the paragraph/bullet being built
+    table = []          # (start, end) of consecutive table lines
+    fence = None
+
+    def flush_block():
+        nonlocal block
+        if block:
+            kind, start, end = block
+            block = None
+            yield from _sentences(response[start:end], start, kind)
+
+    def flush_table():
+        rows = table[:]
+        table.clear()
+        if len(rows) > 1 and _TABLE_SEP.match(response, rows[1][0], rows[1][1]):
+            rows = rows[2:]   # header row + separator
+        for start, end in rows:
+            if _TABLE_SEP.match(response, start, end):
+                continue
+            row = response[start:end]
+            s = row.strip()
+            if len(s) > MIN_CHARS:
+                lead = len(row) - len(row.lstrip())
+                yield Claim(s, start + lead, start + lead + len(s), "table")
+
+    pos = 0
+    n = len(response)
+    while pos < n:
+        nl = response.find("\n", pos)
+        end = n if nl < 0 else nl
+        nxt = n if nl < 0 else nl + 1
+
+        m = _FENCE.match(response, pos, end)
+        if fence is not None:
+            if m and m.group(1) == fence:
+                fence = None
+            pos = nxt
+            continue
+        if m:
+            yield from flush_block()
+            yield from flush_table()
+            fence = m.group(1)
+            pos = nxt
+            continue
+
+        if _TABLE_ROW.match(response, pos, end):
+            yield from flush_block()
+            table.append((pos, end))
+            pos = nxt
+            continue
+        if table:
+            yield from flush_table()
+
+        if not response[pos:end].strip() or _HEADER_LINE.match(response, pos, end) or _RULE.match(response, pos, end):
+            yield from flush_block()
+        elif (m := _BULLET.match(response, pos, end)):
+            yield from flush_block()
+            block = ["bullet", m.end(), end]
+        elif (m := _QUOTE.match(response, pos, end)):
+            yield from flush_block()
+            block = ["text", m.end(), end]
+        elif block:
+            block[2] = end          # continuation line
+        else:
+            block = ["text", pos, end]
+        pos = nxt
+
+    yield from flush_block()
+    yield from flush_table()
+
+
+def iter_claims(response: str, mode: str = None) -> Iterator[Claim]:
+    """Claims of a response, in order, with offsets into it."""
+    mode = mode or DEFAULT_MODE
+    if mode == "legacy":
+        return _iter_legacy(response)
+    if mode == "markdown":
+        return _iter_markdown(response)
+    raise ValueError(f"segmenter mode must be one of {MODES}, got {mode!r}")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def segment(response: str, mode: str = None) -> tuple[Claim, ...]:
+    """All claims of a response (memoized per response and mode)."""
+    return tuple(iter_claims(response, mode))
+
+
+def extract_claims(response: str, mode: str = None) -> list[str]:
+    """Claim texts of a response (drop-in for the old extract_claims)."""
+    return [c.text for c in segment(response, mode or DEFAULT_MODE)]
+
+
+def claim_id(run_id: str, claim_index: int, mode: str = None) -> str:
+    return f"{run_id}#{mode or DEFAULT_MODE}#{claim_index}"
+
+
+def claim_refs(run_id: str, response: str, mode: str = None) -> list[dict]:
+    """
+    One dict per claim: claim_id, run_id, claim_index, start, end, sha1
+    and the full text (the scorers drop "text" before saving).
+    """
+    mode = mode or DEFAULT_MODE
+    return [{
+        "claim_id": claim_id(run_id, i, mode),
+        "run_id": run_id,
+        "claim_index": i,
+        "start": c.start,
+        "end": c.end,
+        "sha1": hashlib.sha1(c.text.encode("utf-8")).hexdigest(),
+        "text": c.text,
+    } for i, c in enumerate(segment(response, mode))]
+
+
+def without_text(ref: dict) -> dict:
+    """A claim_refs() entry minus its text, for embedding in scorer output."""
+    return {k: v for k, v in ref.items() if k != "text"}
+
+
+def _reference_extract_claims(response: str) -> list[str]:
+    """The pre-segmenter extract_claims, kept for the --bench equivalence check."""
+    text = re.sub(r'^#+\s+.*$', '', response, flags=re.MULTILINE)
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+    claims = []
+    for s in sentences:
+        s = s.strip()
+        if len(s) > 20 and not s.startswith("|") and not s.startswith("-"):
+            claims.append(s)
+    return claims
+
+
+def bench(repeat: int = 20):
+    """Time each segmenter over every indexed run and check legacy equivalence."""
+    from run_store import get_store
+
+    store = get_store()
+    store.sync_all()
+    responses = [r["full_response"] for r in store.select()]
+    responses = [r for r in responses if isinstance(r, str)]
+    chars = sum(len(r) for r in responses)
+    print(f"{len(responses)} responses, {chars / 1e6:.2f} M chars, best of {repeat}\n")
+
+    mismatches = sum(_reference_extract_claims(r) != [c.text for c in _iter_legacy(r)] for r in responses)
+    print(f"legacy vs original extract_claims: {mismatches} mismatching responses\n")
+
+    rows = [("original extract_claims", lambda r: len(_reference_extract_claims(r)))]
+    for mode in MODES:
+        rows.append((f"{mode} iter_claims", lambda r, m=mode: len(list(iter_claims(r, m)))))
+        rows.append((f"{mode} segment (memoized)", lambda r, m=mode: len(segment(r, m))))
+
+    # Rows take turns within each round, so load spikes hit them all alike
+    times = [[] for _ in rows]
+    totals = [0] * len(rows)
+    for _ in range(repeat):
+        for i, (_, fn) in enumerate(rows):
+            t = time.perf_counter()
+            totals[i] = sum(fn(r) for r in responses)
+            times[i].append(time.perf_counter() - t)
+
+    print(f"{'segmenter':<28} {'ms':>8} {'MB/s':>7} {'claims':>7}")
+    for (name, _), row_times, total in zip(rows, times, totals):
+        seconds = min(row_times)
+        print(f"{name:<28} {seconds * 1e3:>8.2f} {chars / 1e6 / seconds:>7.1f} {total:>7}")
+
+    kinds = {}
+    for r in responses:
+        for c in segment(r, "markdown"):
+            kinds[c.kind] = kinds.get(c.kind, 0) + 1
+    print(f"\nmarkdown claims by kind: {kinds}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PPH claim segmenter")
+    parser.add_argument("--bench", action="store_true", help="Benchmark segmenters over all runs")
+    parser.add_argument("--repeat", type=int, default=20, help="Timing repetitions for --bench")
+    parser.add_argument("--mode", choices=MODES, default=DEFAULT_MODE, help="Mode for segmenting stdin")
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(args.repeat)
+    else:
+        for c in iter_claims(sys.stdin.read(), args.mode):
+            print(f"[{c.start}:{c.end}] {c.kind:<6} {c.text}")
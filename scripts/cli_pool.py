@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+PPH CLI Subprocess Pool
+Bounded, concurrent `claude -p` / `gemini` invocations for the CLI routes.
+
+Each CLI (keyed by executable name) gets a pool of at most POOL_SIZE live
+processes. Threads that call run() beyond that wait for a free slot. The
+prompt goes to the child on a stdin pipe, not a temp file. stdout and
+stderr are drained incrementally by reader threads, so a long response
+never fills a pipe buffer, and callers can watch output as it arrives
+via on_output.
+
+Every child starts in its own process group. On timeout, the whole group
+gets SIGTERM, then SIGKILL after KILL_GRACE seconds, so helper processes
+the CLI spawned do not outlive it. Ctrl-C (or any other exception) while
+waiting kills the group the same way before re-raising. A child is only
+dropped from the live set once it has been reaped, so anything still
+running at interpreter exit is killed too.
+
+Errors mirror subprocess.run: a timeout raises subprocess.TimeoutExpired
+with whatever output was captured so far.
+"""
+
+import atexit
+import codecs
+import os
+import signal
+import subprocess
+import threading
+import time
+
+POOL_SIZE = 4       # max concurrent processes per CLI
+TIMEOUT = 300       # seconds per invocation
+KILL_GRACE = 5      # seconds between SIGTERM and SIGKILL
+
+_live = set()
+_live_lock = threading.Lock()
+
+
+def _kill_group(proc, grace: float = KILL_GRACE):
+    """SIGTERM the child's process group, SIGKILL it if still alive after grace."""
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(proc.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            return
+        try:
+            proc.wait(timeout=grace)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def _drain(stream, parts: list, on_output=None):
+    """Read a pipe to EOF as UTF-8, keeping (and optionally forwarding) each chunk."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for chunk in iter(lambda: stream.read1(65536), b""):
+        text = decoder.decode(chunk)
+        parts.append(text)
+        if on_output is not None and text:
+            on_output(text)
+    parts.append(decoder.decode(b"", final=True))
+    stream.close()
+
+
+def _feed(stream, data: bytes):
+    try:
+        stream.write(data)
+    except BrokenPipeError:
+        pass  # child exited without reading its input; its rc/stderr says why
+    finally:
+        try:
+            stream.close()
+        except BrokenPipeError:
+            pass
+
+
+class CLIPool:
+    """At most `size` concurrent processes of one CLI."""
+
+    def __init__(self, name: str, size: int = POOL_SIZE, timeout: float = TIMEOUT):
+        self.name = name
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+
+    def run(self, args: list, stdin_text: str = "", env: dict = None,
+            timeout: float = None, on_output=None):
+        """
+        Run one invocation, prompt on stdin. Returns
+        (returncode, stdout, stderr, elapsed_seconds).
+        """
+        timeout = self.timeout if timeout is None else timeout
+        with self._slots:
+            start = time.time()
+            proc = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE, env=env, start_new_session=True)
+            with _live_lock:
+                _live.add(proc)
+
+            out, err = [], []
+            threads = [
+                threading.Thread(target=_feed, args=(proc.stdin, stdin_text.encode("utf-8")), daemon=True),
+                threading.Thread(target=_drain, args=(proc.stdout, out, on_output), daemon=True),
+                threading.Thread(target=_drain, args=(proc.stderr, err), daemon=True),
+            ]
+            for t in threads:
+                t.start()
+
+            try:
+                proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                _kill_group(proc)
+                for t in threads:
+                    t.join(KILL_GRACE)
+                raise subprocess.TimeoutExpired(args, timeout, "".join(out), "".join(err))
+            except BaseException:
+                _kill_group(proc)
+                raise
+            finally:
+                if proc.poll() is not None:
+                    with _live_lock:
+                        _live.discard(proc)
+
+            for t in threads:
+                t.join()
+            return proc.returncode, "".join(out), "".join(err), time.time() - start
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def configure(pool_size: int = None, timeout: float = None):
+    """Change pool defaults. Only affects pools created afterwards."""
+    global POOL_SIZE, TIMEOUT
+    if pool_size is not None:
+        POOL_SIZE = pool_size
+    if timeout is not None:
+        TIMEOUT = timeout
+
+
+def get_pool(name: str) -> CLIPool:
+    """Process-wide pool for one CLI executable."""
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = CLIPool(name, POOL_SIZE, TIMEOUT)
+        return _pools[name]
+
+
+def run_cli(args: list, stdin_text: str = "", env: dict = None,
+            timeout: float = None, on_output=None):
+    """run() on the pool for args[0]."""
+    return get_pool(args[0]).run(args, stdin_text, env=env, timeout=timeout, on_output=on_output)
+
+
+@atexit.register
+def kill_all():
+    """Kill every child still running (interrupted runs, stuck CLIs)."""
+    with _live_lock:
+        procs = list(_live)
+    for proc in procs:
+        _kill_group(proc, grace=1)
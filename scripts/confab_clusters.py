@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+PPH Confabulation Clusters
+Clusters every claim of every run in a model x scenario group and
+reports how often each cluster recurs across runs.
+
+Claims (see claims.claim_refs) are embedded through the EmbeddingStore,
+so a warm cache needs no model. Two claims are linked when their cosine
+similarity is at least THRESHOLD; clusters are the connected components
+of that graph (single linkage). The graph is built in row chunks and
+split with vectorized hook-and-jump (similarity.threshold_edges and
+similarity.connected_components), so nothing loops over claim pairs in
+Python. Groups above EXACT_MAX claims link each claim to its top
+K_NEIGHBORS approximate neighbors from an in-memory ClaimIndex instead
+of the all-pairs pass, which keeps large groups near-linear.
+
+Each cluster with claims from at least MIN_RUNS runs is written with
+the run_ids it appears in and its recurrence rate (runs containing it /
+runs in the group), plus a representative claim (closest to the
+cluster centroid) and a cohesion score (mean cosine to the centroid).
+Low cohesion flags clusters that single linkage chained together.
+
+Usage:
+    python3 confab_clusters.py [--threshold 0.75] [--segmenter markdown]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_DIR = SCRIPT_DIR.parent
+sys.path.insert(0, str(SCRIPT_DIR))
+
+from claims import DEFAULT_MODE, MODES, claim_refs, extract_claims
+from selfcheckgpt_test import load_stochastic_runs
+from similarity import connected_components, normalize_rows, threshold_edges
+
+DATA_DIR = str(REPO_DIR / "data" / "phase2a") + "/"
+OUTPUT = str(REPO_DIR / "data" / "phase2a" / "confab_clusters.json")
+THRESHOLD = 0.75
+MIN_RUNS = 2
+EXACT_MAX = 10_000        # claims per group linked exactly (all pairs)
+K_NEIGHBORS = 32
+HEADLINE_RATE = 0.8       # summary counts clusters recurring in at least this share of runs
+
+
+def cluster_group(runs: list, store, threshold: float = THRESHOLD, segmenter: str = None,
+                  min_runs: int = MIN_RUNS, exact_max: int = EXACT_MAX) -> dict:
+    """Recurring claim clusters of one group of runs."""
+    refs = [ref for run in runs for ref in claim_refs(run["run_id"], run["response"], segmenter)]
+    n_runs = len(runs)
+    result = {
+        "model": runs[0]["model"],
+        "scenario": runs[0]["scenario"],
+        "n_runs": n_runs,
+        "n_claims": len(refs),
+        "segmenter": segmenter or DEFAULT_MODE,
+        "threshold": threshold,
+        "linkage": "exact" if len(refs) <= exact_max else f"top-{K_NEIGHBORS} approximate",
+        "clusters": [],
+    }
+    if not refs:
+        return result
+
+    matrix = normalize_rows(store.encode([ref["text"] for ref in refs]))
+    if len(matrix) <= exact_max:
+        src, dst = threshold_edges(matrix, threshold)
+    else:
+        from claim_index import ClaimIndex
+        index = ClaimIndex(None, store.model_name, segmenter)
+        index.add(refs, matrix)
+        src, dst = index.knn_edges(threshold, K_NEIGHBORS)
+    labels = connected_components(len(matrix), src, dst)
+    n_clusters = int(labels.max()) + 1
+
+    # Centroids and each claim's cosine to its own centroid
+    sums = np.zeros((n_clusters, matrix.shape[1]), dtype=np.float32)
+    np.add.at(sums, labels, matrix)
+    centroids = normalize_rows(sums)
+    to_centroid = np.einsum("ij,ij->i", matrix, centroids[labels])
+
+    members = np.argsort(labels, kind="stable")
+    bounds = np.searchsorted(labels[members], np.arange(n_clusters + 1))
+    clusters = []
+    for c in range(n_clusters):
+        rows = members[bounds[c]:bounds[c + 1]]
+        run_ids = sorted({refs[i]["run_id"] for i in rows})
+        if len(run_ids) < min_runs:
+            continue
+        rep = refs[rows[np.argmax(to_centroid[rows])]]
+        clusters.append({
+            "recurrence_rate": round(len(run_ids) / n_runs, 3),
+            "n_runs": len(run_ids),
+            "n_claims": len(rows),
+            "cohesion": round(float(to_centroid[rows].mean()), 3),
+            "representative": {"claim_id": rep["claim_id"], "text": rep["text"]},
+            "run_ids": run_ids,
+            "claim_ids": [refs[i]["claim_id"] for i in rows],
+        })
+    clusters.sort(key=lambda c: (-c["n_runs"], -c["n_claims"], c["representative"]["claim_id"]))
+
+    result.update({
+        "n_edges": len(src),
+        "n_clusters_total": n_clusters,
+        "n_recurring": len(clusters),
+        f"n_recurring_{HEADLINE_RATE:.0%}": sum(c["recurrence_rate"] >= HEADLINE_RATE for c in clusters),
+        "clusters": clusters,
+    })
+    return result
+
+
+def run(data_dir: str = DATA_DIR, output: str = OUTPUT, threshold: float = THRESHOLD,
+        segmenter: str = None, min_runs: int = MIN_RUNS, cache_dir: str = None,
+        exact_max: int = EXACT_MAX) -> dict:
+    from embedding_store import DEFAULT_CACHE_DIR, EmbeddingStore
+
+    store = EmbeddingStore(cache_dir or DEFAULT_CACHE_DIR)
+    groups = load_stochastic_runs(data_dir)
+    store.prefetch(s for runs in groups.values() for r in runs for s in extract_claims(r["response"], segmenter))
+
+    results = {}
+    for group_key, runs in sorted(groups.items()):
+        start = time.perf_counter()
+        results[group_key] = res = cluster_group(runs, store, threshold, segmenter, min_runs, exact_max)
+        print(f"{group_key:<35} {res['n_runs']:>4} runs {res['n_claims']:>6} claims "
+              f"{res['n_recurring']:>5} recurring clusters  ({time.perf_counter() - start:.2f}s)")
+        for c in res["clusters"][:3]:
+            text = c["representative"]["text"]
+            print(f"    {c['recurrence_rate']:>5.0%}  {text[:90] + '...' if len(text) > 90 else text}")
+
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved: {output}")
+    print(f"Embedding cache: {store.stats()}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PPH cross-run confabulation clustering")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Directory containing STOCH JSON files")
+    parser.add_argument("--output", default=OUTPUT, help="Output file path")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="Cosine similarity linking two claims")
+    parser.add_argument("--min-runs", type=int, default=MIN_RUNS, help="Only report clusters in at least this many runs")
+    parser.add_argument("--segmenter", choices=MODES, default=None,
+                        help="Claim segmenter (default: $PPH_SEGMENTER or legacy)")
+    parser.add_argument("--exact-max", type=int, default=EXACT_MAX,
+                        help="Largest group linked by exact all-pairs similarity (above: approximate neighbors)")
+    parser.add_argument("--cache-dir", default=None, help="Embedding cache directory (default: <repo>/.cache/embeddings)")
+    args = parser.parse_args()
+
+    run(args.data_dir, args.output, args.threshold, args.segmenter, args.min_runs, args.cache_dir, args.exact_max)
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+PPH Embedding Store
+Persistent, content-addressed sentence embedding cache shared by the
+SelfCheckGPT scorers.
+
+Each (model id, normalized sentence) pair hashes to a key. Vectors live
+in one append-only float32 file that is memory-mapped for reads; a
+parallel keys file holds one key per line, so line N is the key of row N.
+Appends happen under an exclusive file lock, so several scorer processes
+can share one store. Each append first truncates both files back to the
+last complete row, so a writer that died between its two writes never
+shifts later keys onto the wrong vectors.
+
+The sentence-transformers model is only loaded when a sentence is
+missing from the store. A warm run does zero forward passes and never
+imports torch.
+
+Missing sentences go to the model in a single encode call with
+ENCODE_BATCH-sized batches (sentence-transformers length-sorts its input
+before batching). Scoring tasks call prefetch() once with every sentence
+they will need, so a task is one deduplicated encode call instead of
+one small call per response. The per-claim encode() calls that follow
+are cache reads.
+
+Benchmark (per-response calls vs one prefetch pass, Phase 2A):
+    python3 embedding_store.py --bench
+
+Layout:
+    <cache_dir>/<model id>/meta.json     {"model": ..., "dim": ...}
+    <cache_dir>/<model id>/keys.txt      one sha1 key per row
+    <cache_dir>/<model id>/vectors.f32   row-major float32 vectors
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import unicodedata
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_DIR = SCRIPT_DIR.parent
+
+DEFAULT_CACHE_DIR = REPO_DIR / ".cache" / "embeddings"
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+ENCODE_BATCH = 128          # sentences per forward pass
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sentence(text: str) -> str:
+    """Canonical form used for keying and encoding: NFC, collapsed whitespace."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def sentence_key(model_name: str, text: str) -> str:
+    """Content address of a sentence under a given model."""
+    payload = f"{model_name}\0{normalize_sentence(text)}".encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()
+
+
+class EmbeddingStore:
+    """Memory-mapped sentence embedding cache with lazy model loading."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, model_name: str = DEFAULT_MODEL):
+        self.model_name = model_name
+        self.dir = Path(cache_dir) / model_name.replace("/", "__")
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.meta_path = self.dir / "meta.json"
+        self.keys_path = self.dir / "keys.txt"
+        self.vectors_path = self.dir / "vectors.f32"
+        self.lock_path = self.dir / ".lock"
+
+        self.model = None
+        self.dim = None
+        self.rows = {}          # key -> row number
+        self._keys_offset = 0   # bytes of keys.txt already indexed
+        self._mmap = None
+        self._mmap_rows = 0
+
+        # Counters for run reports
+        self.hits = 0
+        self.encoded = 0
+
+        self._refresh()
+
+    # ---------------------------------------------------------------
+    # Index maintenance
+    # ---------------------------------------------------------------
+    @contextmanager
+    def _locked(self):
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Pick up rows appended since the last read (by us or another process)."""
+        if self.dim is None and self.meta_path.exists():
+            self.dim = json.loads(self.meta_path.read_text())["dim"]
+        if self.dim is None or not self.keys_path.exists():
+            return
+
+        # Rows are only valid once both the vector and its key are on disk
+        n_vectors = self.vectors_path.stat().st_size // (self.dim * 4)
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            for line in f:
+                if not line.endswith(b"\n") or len(self.rows) >= n_vectors:
+                    break
+                self.rows[line[:-1].decode("ascii")] = len(self.rows)
+                self._keys_offset += len(line)
+
+    def _vectors(self) -> np.ndarray:
+        if self._mmap is None or self._mmap_rows != len(self.rows):
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                   shape=(len(self.rows), self.dim))
+            self._mmap_rows = len(self.rows)
+        return self._mmap
+
+    def _load_model(self):
+        if self.model is None:
+            from sentence_transformers import SentenceTransformer
+            self.model = SentenceTransformer(self.model_name)
+        return self.model
+
+    def _append(self, keys: list[str], texts: list[str]):
+        """Encode texts and append them under the store lock."""
+        vectors = np.asarray(self._load_model().encode(texts, batch_size=ENCODE_BATCH, show_progress_bar=False),
+                             dtype=np.float32)
+        self.encoded += len(texts)
+
+        with self._locked():
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                if not self.meta_path.exists():
+                    self.meta_path.write_text(json.dumps({"model": self.model_name, "dim": self.dim}))
+            self._refresh()
+
+            # Another process may have written some of these meanwhile
+            fresh = [i for i, k in enumerate(keys) if k not in self.rows]
+            if not fresh:
+                return
+            # Drop vectors (and a torn key line) a crashed writer left without
+            # keys, so row i keeps pairing with key line i
+            if self.vectors_path.exists():
+                os.truncate(self.vectors_path, len(self.rows) * self.dim * 4)
+            if self.keys_path.exists():
+                os.truncate(self.keys_path, self._keys_offset)
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors[fresh].tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.keys_path, "a") as f:
+                f.write("".join(keys[i] + "\n" for i in fresh))
+            self._refresh()
+
+    # ---------------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, text: str) -> bool:
+        return sentence_key(self.model_name, text) in self.rows
+
+    def _ensure(self, sentences) -> list[str]:
+        """Encode and store the missing sentences (one model call); return all keys."""
+        keys = [sentence_key(self.model_name, s) for s in sentences]
+
+        self._refresh()
+        missing = {}
+        for k, s in zip(keys, sentences):
+            if k not in self.rows and k not in missing:
+                missing[k] = normalize_sentence(s)
+        self.hits += len(keys) - sum(1 for k in keys if k in missing)
+
+        if missing:
+            self._append(list(missing), list(missing.values()))
+        return keys
+
+    def prefetch(self, sentences) -> int:
+        """
+        Make sure every sentence is stored, encoding the missing ones in
+        one deduplicated model call. Returns how many were encoded.
+        """
+        before = self.encoded
+        self._ensure(list(sentences))
+        return self.encoded - before
+
+    def encode(self, sentences: list[str]) -> np.ndarray:
+        """
+        Return an (n x dim) float32 array for sentences, in order.
+        Only sentences missing from the store reach the model.
+        """
+        keys = self._ensure(sentences)
+
+        if not keys:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.array(self._vectors()[[self.rows[k] for k in keys]])
+
+    def stats(self) -> str:
+        loaded = "loaded" if self.model is not None else "not loaded"
+        return (f"{self.hits} cached, {self.encoded} encoded, "
+                f"{len(self.rows)} stored (model {loaded})")
+
+
+def bench(data_dir: str = None, model_name: str = DEFAULT_MODEL):
+    """
+    Sentences/sec encoding every Phase 2A claim from scratch: one
+    store.encode per response (the old per-call pattern) vs one
+    prefetch() over the job. Both use empty temporary stores sharing one
+    loaded model.
+    """
+    sys.path.insert(0, str(SCRIPT_DIR))
+    from claims import extract_claims
+    from selfcheckgpt_test import load_stochastic_runs
+
+    groups = load_stochastic_runs(data_dir or str(REPO_DIR / "data" / "phase2a") + "/")
+    per_response = [extract_claims(r["response"]) for runs in groups.values() for r in runs]
+    per_response = [s for s in per_response if s]
+    total = sum(len(s) for s in per_response)
+    print(f"{len(per_response)} responses, {total} sentences")
+
+    tmp = Path(tempfile.mkdtemp(prefix="pph-encode-bench-"))
+    try:
+        before_store = EmbeddingStore(tmp / "before", model_name)
+        model = before_store._load_model()
+        model.encode(per_response[0][:8])      # warm-up
+        start = time.perf_counter()
+        for sentences in per_response:
+            before_store.encode(sentences)
+        before = time.perf_counter() - start
+
+        after_store = EmbeddingStore(tmp / "after", model_name)
+        after_store.model = model
+        start = time.perf_counter()
+        after_store.prefetch(x for s in per_response for x in s)
+        after = time.perf_counter() - start
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"{'per-response encode calls':<28} {before:>7.2f}s  {total / before:>7.0f} sentences/s "
+          f"({len(per_response)} calls, {before_store.encoded} encoded)")
+    print(f"{'one prefetch call':<28} {after:>7.2f}s  {total / after:>7.0f} sentences/s "
+          f"(batch {ENCODE_BATCH}, {after_store.encoded} encoded)")
+    print(f"speedup {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PPH embedding store")
+    parser.add_argument("--bench", action="store_true", help="Benchmark per-response vs prefetched encoding")
+    parser.add_argument("--data-dir", default=None, help="STOCH runs for --bench (default: data/phase2a)")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Embedding model")
+    args = parser.parse_args()
+    if args.bench:
+        bench(args.data_dir, args.model)
+    else:
+        store = EmbeddingStore(model_name=args.model)
+        print(store.stats())
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+PPH Mock Provider Server
+Local stand-in for OpenRouter and the provider batch endpoints, for
+testing and load-testing the runners with no key and no network.
+
+    python mock_server.py --port 8765 --latency lognormal:0.5,0.6 --rate-429 0.05
+    PPH_OPENROUTER_URL=http://127.0.0.1:8765/api/v1/chat/completions \
+        python run_matrix.py phase2a --workers 16 --out /tmp/pph-2a
+    python batch_submit.py phase2a --base-url http://127.0.0.1:8765 --out /tmp/pph-2a
+
+OpenRouter chat completions
+    POST /api/v1/chat/completions           JSON body, or SSE when "stream": true
+    GET  /stats                             request / fault counters
+
+    Responses replay the recorded runs in data/phase*: a request whose
+    (model, prompt) matches stored runs gets their responses round-robin,
+    with their reasoning and usage. Unmatched requests get a deterministic
+    fake completion. Faults are injected to exercise the runners' error
+    paths:
+        --latency SPEC      fixed:S | uniform:A,B | lognormal:MU,SIGMA | replay[:SCALE]
+        --missing-models    comma list of model strings answered with 404
+                            (fallback strings replay their primary's recordings)
+        --rate-429 P        fraction of requests answered 429 + Retry-After
+        --rpm N             hard per-minute budget; excess requests get 429
+        --truncate P        fraction of bodies cut off mid-response
+
+Batch protocols used by batch_submit.py:
+
+    Anthropic Message Batches
+        POST /v1/messages/batches                 {"requests": [{custom_id, params}]}
+        GET  /v1/messages/batches/{id}            processing_status, results_url
+        GET  /v1/messages/batches/{id}/results    JSONL of {custom_id, result}
+
+    OpenAI-compatible files + batches
+        POST /v1/files                            multipart upload (purpose=batch)
+        POST /v1/batches                          {input_file_id, endpoint, completion_window}
+        GET  /v1/batches/{id}                     status, output_file_id
+        GET  /v1/files/{id}/content               JSONL of {custom_id, response}
+
+A batch reports in progress until --batch-delay seconds after submission,
+then ended/completed. Completions are deterministic functions of
+(custom_id, model, temperature, prompt), so reruns give identical
+output. A prompt containing MOCK_FAIL produces a per-request error.
+State is in memory only.
+"""
+
+import argparse
+import email.parser
+import email.policy
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DATA_DIR = SCRIPT_DIR.parent / "data"
+
+# Fallback model string -> primary string whose recordings it replays
+# (run --missing-models with the primaries to exercise the 404 fallback path)
+FALLBACK_OF = {
+    "anthropic/claude-opus-4-6": "anthropic/claude-opus-4.6",
+    "google/gemini-3-pro": "google/gemini-3-pro-preview",
+}
+RETRY_AFTER = 2
+
+WORDS = ("demand price elasticity signal quarter growth measurement calibration sensor "
+         "friction apparatus anomaly inventory premium brand effect data trend").split()
+
+_lock = threading.Lock()
+_files = {}     # file_id -> bytes
+_batches = {}   # batch_id -> {"protocol", "created", "requests", ...}
+
+
+def load_recordings(data_dir=DATA_DIR) -> dict:
+    """(model_api_string, prompt_text) -> list of recorded responses."""
+    recordings = {}
+    for path in sorted(Path(data_dir).glob("phase*/PPH-*.json")):
+        with open(path) as f:
+            run = json.load(f)
+        response = run.get("full_response")
+        if not isinstance(response, str) or response.startswith("ERROR"):
+            continue
+        meta = run.get("metadata", {})
+        recordings.setdefault((run["model_api_string"], run["prompt_text"]), []).append({
+            "content": response,
+            "reasoning": run.get("reasoning_trace"),
+            "reasoning_details": run.get("reasoning_details_raw"),
+            "latency": meta.get("response_time_seconds", 0.0),
+            "finish_reason": meta.get("finish_reason") or "stop",
+            "prompt_tokens": meta.get("input_tokens", 0),
+            "completion_tokens": meta.get("output_tokens", 0),
+            "reasoning_tokens": meta.get("reasoning_tokens", 0),
+        })
+    return recordings
+
+
+def parse_latency(spec: str):
+    """Latency sampler from a spec: fixed:S, uniform:A,B, lognormal:MU,SIGMA, replay[:SCALE]."""
+    kind, _, args = (spec or "fixed:0").partition(":")
+    nums = [float(x) for x in args.split(",") if x]
+    if kind == "fixed":
+        return lambda recorded: nums[0] if nums else 0.0
+    if kind == "uniform":
+        return lambda recorded: random.uniform(nums[0], nums[1])
+    if kind == "lognormal":
+        return lambda recorded: random.lognormvariate(nums[0], nums[1])
+    if kind == "replay":
+        scale = nums[0] if nums else 1.0
+        return lambda recorded: (recorded or 0.0) * scale
+    raise ValueError(f"unknown latency spec {spec!r}")
+
+
+def fake_completion(custom_id: str, model: str, temperature, prompt: str) -> tuple[str, int]:
+    """Deterministic pseudo-response text and its token count."""
+    seed = hashlib.sha256(f"{custom_id}\0{model}\0{temperature}\0{prompt}".encode()).digest()
+    n = 40 + seed[0] % 80
+    words = [WORDS[(seed[i % len(seed)] + i) % len(WORDS)] for i in range(n)]
+    return f"[mock {model}] " + " ".join(words) + ".", n + 3
+
+
+def prompt_of(messages: list) -> str:
+    return "\n".join(m.get("content", "") for m in messages if isinstance(m.get("content"), str))
+
+
+def anthropic_result(custom_id: str, params: dict) -> dict:
+    prompt = prompt_of(params.get("messages", []))
+    if "MOCK_FAIL" in prompt:
+        return {"custom_id": custom_id, "result": {
+            "type": "errored", "error": {"type": "invalid_request_error", "message": "mock failure"}}}
+    text, tokens = fake_completion(custom_id, params.get("model"), params.get("temperature"), prompt)
+    return {"custom_id": custom_id, "result": {"type": "succeeded", "message": {
+        "id": f"msg_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": params.get("model"),
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "usage": {"input_tokens": len(prompt) // 4, "output_tokens": tokens},
+    }}}
+
+
+def openai_result(line: dict) -> dict:
+    body = line.get("body", {})
+    prompt = prompt_of(body.get("messages", []))
+    custom_id = line.get("custom_id")
+    if "MOCK_FAIL" in prompt:
+        return {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": custom_id,
+                "response": {"status_code": 400, "body": {"error": {"message": "mock failure"}}},
+                "error": None}
+    text, tokens = fake_completion(custom_id, body.get("model"), body.get("temperature"), prompt)
+    prompt_tokens = len(prompt) // 4
+    return {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": custom_id, "error": None,
+            "response": {"status_code": 200, "body": {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                "object": "chat.completion",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": tokens,
+                          "total_tokens": prompt_tokens + tokens},
+            }}}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    batch_delay = 2.0
+    quiet = True
+
+    # chat completions (set by serve())
+    recordings = {}
+    latency = staticmethod(parse_latency("fixed:0"))
+    missing_models = frozenset()
+    rate_429 = 0.0
+    rpm = None
+    truncate = 0.0
+    stats = Counter()
+    cursors = {}            # recording key -> itertools.count for round-robin
+    window = []             # request timestamps for --rpm
+
+    def log_message(self, fmt, *args):
+        if not self.quiet:
+            super().log_message(fmt, *args)
+
+    def _send(self, status: int, body, content_type: str = "application/json"):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _ended(self, batch: dict) -> bool:
+        return time.time() - batch["created"] >= self.batch_delay
+
+    # ---------------- Anthropic Message Batches ----------------
+    def _anthropic_status(self, batch_id: str, batch: dict) -> dict:
+        ended = self._ended(batch)
+        n = len(batch["requests"])
+        base = f"http://{self.headers.get('Host')}"
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {"processing": 0 if ended else n, "succeeded": n if ended else 0,
+                               "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": batch["created"],
+            "results_url": f"{base}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    # ---------------- OpenRouter chat completions ----------------
+    def _rate_limited(self) -> float | None:
+        """Seconds to Retry-After if this request should get a 429, else None."""
+        if self.rate_429 and random.random() < self.rate_429:
+            return RETRY_AFTER
+        if self.rpm:
+            now = time.time()
+            with _lock:
+                self.window[:] = [t for t in self.window if now - t < 60]
+                if len(self.window) >= self.rpm:
+                    return max(60 - (now - self.window[0]), 1)
+                self.window.append(now)
+        return None
+
+    def _completion(self, body: dict) -> dict:
+        """Recorded (round-robin) or fake completion for a chat request."""
+        model = body.get("model")
+        prompt = prompt_of(body.get("messages", []))
+        key = (FALLBACK_OF.get(model, model), prompt)
+        recorded = self.recordings.get(key)
+        if recorded:
+            with _lock:
+                cursor = self.cursors.setdefault(key, itertools.count())
+                rec = recorded[next(cursor) % len(recorded)]
+            self.stats["replayed"] += 1
+            return rec
+        text, tokens = fake_completion("", model, body.get("temperature"), prompt)
+        self.stats["synthetic"] += 1
+        return {"content": text, "reasoning": None, "reasoning_details": None, "latency": None,
+                "finish_reason": "stop", "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": tokens, "reasoning_tokens": 0}
+
+    def _chat(self):
+        body = json.loads(self._body())
+        model = body.get("model")
+        self.stats["requests"] += 1
+
+        if model in self.missing_models:
+            self.stats["404"] += 1
+            return self._send(404, {"error": {"code": 404, "message": f"No endpoints found for {model}."}})
+
+        retry_after = self._rate_limited()
+        if retry_after is not None:
+            self.stats["429"] += 1
+            data = json.dumps({"error": {"code": 429, "message": "Rate limit exceeded"}}).encode()
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Retry-After", f"{retry_after:.0f}")
+            self.send_header("X-RateLimit-Remaining", "0")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        rec = self._completion(body)
+        delay = self.latency(rec["latency"])
+        usage = {"prompt_tokens": rec["prompt_tokens"], "completion_tokens": rec["completion_tokens"],
+                 "reasoning_tokens": rec["reasoning_tokens"],
+                 "total_tokens": rec["prompt_tokens"] + rec["completion_tokens"]}
+        gen_id = f"gen-mock-{uuid.uuid4().hex[:16]}"
+        truncated = self.truncate and random.random() < self.truncate
+        if truncated:
+            self.stats["truncated"] += 1
+
+        if body.get("stream"):
+            return self._stream(rec, model, usage, gen_id, delay, truncated)
+
+        time.sleep(delay)
+        message = {"role": "assistant", "content": rec["content"]}
+        if rec["reasoning"]:
+            message["reasoning"] = rec["reasoning"]
+        if rec["reasoning_details"]:
+            message["reasoning_details"] = rec["reasoning_details"]
+        data = json.dumps({"id": gen_id, "model": model, "object": "chat.completion",
+                           "choices": [{"index": 0, "message": message,
+                                        "finish_reason": rec["finish_reason"]}],
+                           "usage": usage}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if truncated:
+            self.wfile.write(data[:len(data) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(data)
+
+    def _stream(self, rec, model, usage, gen_id, delay, truncated):
+        """SSE response: reasoning then content deltas, spread over the sampled latency."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(data: bytes):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def event(delta=None, finish=None, with_usage=False):
+            payload = {"id": gen_id, "model": model,
+                       "choices": [{"index": 0, "delta": delta or {}, "finish_reason": finish}]}
+            if with_usage:
+                payload["usage"] = usage
+            chunk(b"data: " + json.dumps(payload).encode() + b"\n\n")
+
+        pieces = [("reasoning", p) for p in _split(rec["reasoning"])] + \
+                 [("content", p) for p in _split(rec["content"])]
+        chunk(b": OPENROUTER PROCESSING\n\n")
+        step = delay / max(len(pieces), 1)
+        for i, (field, text) in enumerate(pieces):
+            if truncated and i >= len(pieces) // 2:
+                self.close_connection = True
+                return
+            time.sleep(step)
+            event({field: text})
+        if rec["reasoning_details"]:
+            event({"reasoning_details": rec["reasoning_details"]})
+        event(finish=rec["finish_reason"], with_usage=True)
+        chunk(b"data: [DONE]\n\n")
+        chunk(b"")
+
+    # ---------------- routing ----------------
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        if path == "/api/v1/chat/completions":
+            return self._chat()
+        if path == "/v1/messages/batches":
+            requests = json.loads(self._body()).get("requests", [])
+            batch_id = f"msgbatch_{uuid.uuid4().hex[:24]}"
+            with _lock:
+                _batches[batch_id] = {"protocol": "anthropic", "created": time.time(), "requests": requests}
+            return self._send(200, self._anthropic_status(batch_id, _batches[batch_id]))
+
+        if path == "/v1/files":
+            msg = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + self._body())
+            content = next((part.get_payload(decode=True) for part in msg.iter_parts()
+                            if part.get_param("name", header="content-disposition") == "file"), b"")
+            file_id = f"file-{uuid.uuid4().hex[:24]}"
+            with _lock:
+                _files[file_id] = content
+            return self._send(200, {"id": file_id, "object": "file", "bytes": len(content),
+                                    "purpose": "batch"})
+
+        if path == "/v1/batches":
+            req = json.loads(self._body())
+            content = _files.get(req.get("input_file_id"))
+            if content is None:
+                return self._send(404, {"error": {"message": "input file not found"}})
+            lines = [json.loads(line) for line in content.decode().splitlines() if line.strip()]
+            batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+            with _lock:
+                _batches[batch_id] = {"protocol": "openai", "created": time.time(), "requests": lines,
+                                      "endpoint": req.get("endpoint")}
+            return self._get_openai_batch(batch_id)
+
+        self._send(404, {"error": {"message": f"no route for POST {path}"}})
+
+    def _get_openai_batch(self, batch_id: str):
+        batch = _batches[batch_id]
+        status = {"id": batch_id, "object": "batch", "endpoint": batch["endpoint"],
+                  "status": "in_progress", "created_at": int(batch["created"]),
+                  "output_file_id": None, "error_file_id": None,
+                  "request_counts": {"total": len(batch["requests"]), "completed": 0, "failed": 0}}
+        if self._ended(batch):
+            with _lock:
+                if "output_file_id" not in batch:
+                    results = [openai_result(line) for line in batch["requests"]]
+                    file_id = f"file-{uuid.uuid4().hex[:24]}"
+                    _files[file_id] = "".join(json.dumps(r) + "\n" for r in results).encode()
+                    batch["output_file_id"] = file_id
+            status.update({"status": "completed", "output_file_id": batch["output_file_id"]})
+            status["request_counts"]["completed"] = len(batch["requests"])
+        return self._send(200, status)
+
+    def do_GET(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+
+        if parts == ["stats"]:
+            return self._send(200, dict(self.stats))
+
+        if parts[:3] == ["v1", "messages", "batches"] and len(parts) >= 4:
+            batch = _batches.get(parts[3])
+            if batch is None or batch["protocol"] != "anthropic":
+                return self._send(404, {"error": {"message": "batch not found"}})
+            if len(parts) == 5 and parts[4] == "results":
+                if not self._ended(batch):
+                    return self._send(409, {"error": {"message": "batch still processing"}})
+                lines = [anthropic_result(r["custom_id"], r["params"]) for r in batch["requests"]]
+                return self._send(200, "".join(json.dumps(x) + "\n" for x in lines).encode(),
+                                  "application/x-jsonl")
+            return self._send(200, self._anthropic_status(parts[3], batch))
+
+        if parts[:2] == ["v1", "batches"] and len(parts) == 3:
+            if parts[2] not in _batches:
+                return self._send(404, {"error": {"message": "batch not found"}})
+            return self._get_openai_batch(parts[2])
+
+        if parts[:2] == ["v1", "files"] and len(parts) == 4 and parts[3] == "content":
+            content = _files.get(parts[2])
+            if content is None:
+                return self._send(404, {"error": {"message": "file not found"}})
+            return self._send(200, content, "application/x-jsonl")
+
+        self._send(404, {"error": {"message": f"no route for GET {self.path}"}})
+
+
+def _split(text, size: int = 80) -> list:
+    """Stream pieces of about `size` characters."""
+    if not text:
+        return []
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, batch_delay: float = 2.0, quiet: bool = True,
+          latency: str = "fixed:0", missing_models=(), rate_429: float = 0.0,
+          rpm: int = None, truncate: float = 0.0, replay: bool = True):
+    """Start the server in a background thread. Returns the server (call .shutdown() to stop)."""
+    handler = type("Handler", (MockHandler,), {
+        "batch_delay": batch_delay,
+        "quiet": quiet,
+        "recordings": load_recordings() if replay else {},
+        "latency": staticmethod(parse_latency(latency)),
+        "missing_models": frozenset(missing_models),
+        "rate_429": rate_429,
+        "rpm": rpm,
+        "truncate": truncate,
+        "stats": Counter(),
+        "cursors": {},
+        "window": [],
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PPH mock provider server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--batch-delay", type=float, default=2.0,
+                        help="Seconds a batch stays in progress before it completes")
+    parser.add_argument("--latency", default="fixed:0",
+                        help="Chat latency: fixed:S | uniform:A,B | lognormal:MU,SIGMA | replay[:SCALE]")
+    parser.add_argument("--missing-models", default="",
+                        help="Comma list of model strings answered with 404, e.g. "
+                             "anthropic/claude-opus-4.6 to force the fallback path")
+    parser.add_argument("--rate-429", type=float, default=0.0,
+                        help="Fraction of chat requests answered 429 with Retry-After")
+    parser.add_argument("--rpm", type=int, help="Hard per-minute chat budget (excess gets 429)")
+    parser.add_argument("--truncate", type=float, default=0.0,
+                        help="Fraction of chat responses cut off mid-body")
+    parser.add_argument("--no-replay", action="store_true",
+                        help="Always synthesize completions instead of replaying data/phase*")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.batch_delay, quiet=not args.verbose,
+                   latency=args.latency, missing_models=[m for m in args.missing_models.split(",") if m],
+                   rate_429=args.rate_429, rpm=args.rpm, truncate=args.truncate,
+                   replay=not args.no_replay)
+    recorded = sum(len(v) for v in server.RequestHandlerClass.recordings.values())
+    print(f"Mock provider listening on http://{args.host}:{server.server_address[1]}")
+    print(f"Replaying {recorded} recorded responses from {DATA_DIR}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+PPH Async OpenRouter Client
+Streaming chat completions on asyncio, with time-to-first-token metrics.
+
+Requests go out with "stream": true over a plain asyncio TLS connection.
+Server-sent-event chunks are parsed as they arrive, and content,
+reasoning and reasoning_details are assembled incrementally. Nothing
+blocks a thread, so hundreds of in-flight requests (including long
+DeepSeek R1 reasoning streams) share one event loop.
+
+stream_chat() returns a body in the same shape as a non-streaming
+completion ({"id", "model", "choices": [{"message", "finish_reason"}],
+"usage"}), so callers and the response cache treat both paths alike.
+Timings:
+    ttft_seconds        request sent -> first content/reasoning delta
+    total_seconds       request sent -> stream finished
+    tokens_per_second   completion tokens / (total - ttft)
+
+Errors mirror urllib: a status >= 400 raises urllib.error.HTTPError with
+.code, .headers and the error body.
+"""
+
+import asyncio
+import email.parser
+import io
+import json
+import ssl
+import time
+import urllib.error
+from urllib.parse import urlsplit
+
+CONNECT_TIMEOUT = 10    # seconds for TCP + TLS setup
+READ_TIMEOUT = 120      # max silence between stream chunks
+
+
+async def _read_head(reader):
+    """Status code, reason and headers of an HTTP/1.1 response."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed before response")
+    _, code, *reason = status_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+
+    raw = b""
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        raw += line
+    headers = email.parser.Parser().parsestr(raw.decode("latin-1"), headersonly=True)
+    return int(code), reason[0] if reason else "", headers
+
+
+async def _iter_body(reader, headers, read_timeout):
+    """Yield body bytes as they arrive (chunked, sized or read-to-close)."""
+    if "chunked" in (headers.get("Transfer-Encoding") or "").lower():
+        while True:
+            size_line = await asyncio.wait_for(reader.readline(), read_timeout)
+            if not size_line:
+                raise ConnectionError("connection closed mid-body")
+            size = int(size_line.split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                await reader.readline()
+                return
+            chunk = await asyncio.wait_for(reader.readexactly(size), read_timeout)
+            await reader.readline()
+            yield chunk
+    elif headers.get("Content-Length") is not None:
+        remaining = int(headers["Content-Length"])
+        while remaining > 0:
+            chunk = await asyncio.wait_for(reader.read(min(remaining, 65536)), read_timeout)
+            if not chunk:
+                raise ConnectionError("connection closed mid-body")
+            remaining -= len(chunk)
+            yield chunk
+    else:
+        while True:
+            chunk = await asyncio.wait_for(reader.read(65536), read_timeout)
+            if not chunk:
+                return
+            yield chunk
+
+
+async def _iter_events(body):
+    """Yield parsed JSON payloads from SSE "data:" lines until [DONE]."""
+    buffer = b""
+    async for chunk in body:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line = line.strip()
+            if not line.startswith(b"data:"):
+                continue  # blank separators and ": OPENROUTER PROCESSING" keep-alives
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                return
+            yield json.loads(data)
+    raise ConnectionError("stream ended before [DONE]")
+
+
+async def stream_chat(url: str, payload: dict, headers: dict,
+                      connect_timeout: float = CONNECT_TIMEOUT,
+                      read_timeout: float = READ_TIMEOUT):
+    """
+    Stream one chat completion. Returns (body, response_headers, timings)
+    where body matches the non-streaming response shape.
+    """
+    parts = urlsplit(url)
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    data = json.dumps({**payload, "stream": True}).encode()
+
+    start = time.time()
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port,
+                                ssl=ssl.create_default_context() if secure else None),
+        connect_timeout)
+    connect_seconds = time.time() - start
+
+    try:
+        head = [f"POST {path} HTTP/1.1", f"Host: {parts.netloc}",
+                f"Content-Length: {len(data)}", "Accept: text/event-stream", "Connection: close"]
+        head += [f"{k}: {v}" for k, v in headers.items()]
+        sent = time.time()
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+        await writer.drain()
+
+        status, reason, resp_headers = await asyncio.wait_for(_read_head(reader), read_timeout)
+        body = _iter_body(reader, resp_headers, read_timeout)
+        if status >= 400:
+            error_body = b"".join([chunk async for chunk in body])
+            raise urllib.error.HTTPError(url, status, reason, resp_headers, io.BytesIO(error_body))
+
+        content, reasoning, details = [], [], []
+        result = {"id": None, "model": payload.get("model"), "usage": {}}
+        finish_reason = None
+        first_token = None
+
+        async for event in _iter_events(body):
+            if "error" in event:
+                raise RuntimeError(f"stream error: {event['error']}")
+            result["id"] = event.get("id", result["id"])
+            result["model"] = event.get("model", result["model"])
+            if event.get("usage"):
+                result["usage"] = event["usage"]
+            for choice in event.get("choices", []):
+                delta = choice.get("delta") or {}
+                if delta.get("content"):
+                    content.append(delta["content"])
+                if delta.get("reasoning"):
+                    reasoning.append(delta["reasoning"])
+                if delta.get("reasoning_details"):
+                    details.extend(delta["reasoning_details"])
+                if first_token is None and (delta.get("content") or delta.get("reasoning")):
+                    first_token = time.time()
+                finish_reason = choice.get("finish_reason") or finish_reason
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (ConnectionError, ssl.SSLError):
+            pass
+
+    end = time.time()
+    ttft = (first_token or end) - sent
+    completion_tokens = result["usage"].get("completion_tokens", 0)
+    generating = end - (first_token or end)
+
+    result["choices"] = [{
+        "message": {
+            "role": "assistant",
+            "content": "".join(content),
+            "reasoning": "".join(reasoning) or None,
+            "reasoning_details": details or None,
+        },
+        "finish_reason": finish_reason,
+    }]
+    timings = {
+        "connect_seconds": round(connect_seconds, 4),
+        "ttft_seconds": round(ttft, 4),
+        "total_seconds": round(end - sent, 4),
+        "tokens_per_second": round(completion_tokens / generating, 2) if generating > 0 else None,
+    }
+    return result, resp_headers, timings
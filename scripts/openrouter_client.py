@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+PPH OpenRouter HTTP Client
+Keep-alive connection pool shared by every OpenRouter-backed runner.
+
+urllib opens a new TCP + TLS connection per request. This module keeps
+up to POOL_SIZE persistent http.client connections per host. Concurrent
+workers reuse warm connections instead of handshaking on every call.
+Each call reports connect time (0.0 on a reused connection) and time to
+first byte, so handshake cost shows up in the run metadata. It also reports
+queue_seconds, the time spent waiting for a free pool slot, so runners
+can keep it out of their response latency.
+
+Runners size the pool with configure() from their --workers and per-model
+limits (or --pool-size), and set the read timeout from --timeout.
+
+The runners only use the standard library, and it has no HTTP/2 client,
+so connections are HTTP/1.1 keep-alive.
+
+Errors mirror urllib: any status >= 400 raises urllib.error.HTTPError
+with .code, .headers and a readable body. Existing retry / fallback /
+429 handling keeps working unchanged.
+"""
+
+import http.client
+import io
+import json
+import queue
+import threading
+import time
+import urllib.error
+from urllib.parse import urlsplit
+
+POOL_SIZE = 8           # max connections per host
+CONNECT_TIMEOUT = 10    # seconds for TCP + TLS setup
+READ_TIMEOUT = 120      # seconds per socket read once connected
+
+
+class ConnectionPool:
+    """Bounded pool of keep-alive connections to one scheme://host:port."""
+
+    def __init__(self, scheme: str, host: str, port: int | None = None,
+                 pool_size: int = POOL_SIZE, connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def _new_connection(self):
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.connect_timeout)
+
+    def _exchange(self, conn, method, path, body, headers):
+        timings = {"connect_seconds": 0.0, "ttfb_seconds": 0.0}
+        start = time.time()
+        if conn.sock is None:
+            conn.connect()
+            conn.sock.settimeout(self.read_timeout)
+            timings["connect_seconds"] = round(time.time() - start, 4)
+
+        sent = time.time()
+        conn.request(method, path, body=body, headers=headers)
+        resp = conn.getresponse()
+        timings["ttfb_seconds"] = round(time.time() - sent, 4)
+        data = resp.read()
+        return resp, data, timings
+
+    def request(self, method: str, path: str, body: bytes = None, headers: dict = None):
+        """Send one request. Returns (status, reason, headers, body_bytes, timings)."""
+        headers = dict(headers or {})
+        headers.setdefault("Connection", "keep-alive")
+
+        queued = time.time()
+        with self._slots:
+            queue_seconds = round(time.time() - queued, 4)
+            try:
+                conn, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                conn, reused = self._new_connection(), False
+
+            try:
+                resp, data, timings = self._exchange(conn, method, path, body, headers)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Server closed an idle keep-alive connection; retry once on a fresh one
+                conn.close()
+                if not reused:
+                    raise
+                conn = self._new_connection()
+                try:
+                    resp, data, timings = self._exchange(conn, method, path, body, headers)
+                except Exception:
+                    conn.close()
+                    raise
+            except Exception:
+                conn.close()
+                raise
+
+            if resp.will_close:
+                conn.close()
+            else:
+                self._idle.put(conn)
+            timings["queue_seconds"] = queue_seconds
+            return resp.status, resp.reason, resp.headers, data, timings
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def configure(pool_size: int = None, connect_timeout: float = None, read_timeout: float = None):
+    """Change pool defaults. Only affects pools created afterwards."""
+    global POOL_SIZE, CONNECT_TIMEOUT, READ_TIMEOUT
+    if pool_size is not None:
+        POOL_SIZE = pool_size
+    if connect_timeout is not None:
+        CONNECT_TIMEOUT = connect_timeout
+    if read_timeout is not None:
+        READ_TIMEOUT = read_timeout
+
+
+def get_pool(url: str) -> ConnectionPool:
+    """Process-wide pool for the URL's scheme://host:port."""
+    parts = urlsplit(url)
+    key = (parts.scheme, parts.hostname, parts.port)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(parts.scheme, parts.hostname, parts.port,
+                                         POOL_SIZE, CONNECT_TIMEOUT, READ_TIMEOUT)
+        return _pools[key]
+
+
+def request(method: str, url: str, body: bytes = None, headers: dict = None):
+    """
+    Send one request over the shared pool.
+    Returns (body_bytes, response_headers, timings); raises HTTPError on >= 400.
+    """
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+
+    status, reason, resp_headers, data, timings = get_pool(url).request(
+        method, path, body=body, headers=headers)
+
+    if status >= 400:
+        raise urllib.error.HTTPError(url, status, reason, resp_headers, io.BytesIO(data))
+    return data, resp_headers, timings
+
+
+def post_json(url: str, payload: dict, headers: dict):
+    """
+    POST a JSON payload over the shared pool.
+    Returns (parsed_body, response_headers, timings); raises HTTPError on >= 400.
+    """
+    data, resp_headers, timings = request("POST", url, json.dumps(payload).encode(), headers)
+    return json.loads(data.decode()), resp_headers, timings
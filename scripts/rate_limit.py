@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+PPH Rate Limiter
+Per-route token buckets shared by every runner thread and process.
+
+Each route (openrouter, anthropic-cli, google-cli) has a request bucket
+and an optional token bucket. Bucket state lives in a small JSON file
+guarded by an exclusive file lock. Concurrent workers and separate runner
+processes draw from the same budget, so nobody needs a fixed sleep.
+
+Provider feedback tightens the buckets:
+    - Retry-After on a 429 blocks the route until it expires
+    - X-RateLimit-Remaining / X-RateLimit-Reset (OpenRouter) drain the
+      request bucket and block the route until the reset time when the
+      remaining count hits zero
+    - actual token usage replaces the up-front estimate after each call
+"""
+
+import asyncio
+import fcntl
+import json
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_DIR = SCRIPT_DIR.parent
+
+STATE_DIR = REPO_DIR / ".cache" / "ratelimit"
+
+# Budgets per route. tokens_per_minute=None disables the token bucket.
+ROUTE_LIMITS = {
+    "openrouter": {"requests_per_minute": 60, "tokens_per_minute": 400_000},
+    "anthropic-cli": {"requests_per_minute": 20, "tokens_per_minute": None},
+    "google-cli": {"requests_per_minute": 20, "tokens_per_minute": None},
+}
+
+MAX_WAIT_SLICE = 5.0  # re-check shared state at least this often while waiting
+
+
+def parse_retry_after(value) -> float | None:
+    """Retry-After as seconds (delta-seconds or HTTP-date form)."""
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_reset(value) -> float | None:
+    """X-RateLimit-Reset as an epoch timestamp (OpenRouter sends milliseconds)."""
+    try:
+        reset = float(value)
+    except (TypeError, ValueError):
+        return None
+    return reset / 1000 if reset > 1e11 else reset
+
+
+class RateLimiter:
+    """Token bucket for one route, persisted under a file lock."""
+
+    def __init__(self, route: str, requests_per_minute: float,
+                 tokens_per_minute: float | None = None, state_dir=STATE_DIR):
+        self.route = route
+        self.request_rate = requests_per_minute / 60.0
+        self.request_capacity = float(requests_per_minute)
+        self.token_rate = tokens_per_minute / 60.0 if tokens_per_minute else None
+        self.token_capacity = float(tokens_per_minute) if tokens_per_minute else None
+
+        state_dir = Path(state_dir)
+        state_dir.mkdir(parents=True, exist_ok=True)
+        self.state_path = state_dir / f"{route}.json"
+        self.lock_path = state_dir / f"{route}.lock"
+
+    @contextmanager
+    def _state(self):
+        """Load, refill and yield the shared bucket state; save on exit."""
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                try:
+                    state = json.loads(self.state_path.read_text())
+                except (FileNotFoundError, json.JSONDecodeError):
+                    state = {"requests": self.request_capacity, "tokens": self.token_capacity,
+                             "updated": now, "blocked_until": 0.0}
+
+                elapsed = max(now - state["updated"], 0.0)
+                state["requests"] = min(self.request_capacity,
+                                        state["requests"] + elapsed * self.request_rate)
+                if self.token_rate:
+                    state["tokens"] = min(self.token_capacity,
+                                          (state["tokens"] or 0.0) + elapsed * self.token_rate)
+                state["updated"] = now
+
+                yield state, now
+
+                self.state_path.write_text(json.dumps(state))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Take one request + tokens if they fit; otherwise return seconds to wait."""
+        if self.token_capacity:
+            tokens = min(tokens, self.token_capacity)
+        with self._state() as (state, now):
+            wait = state["blocked_until"] - now
+            if wait <= 0:
+                wait = (1.0 - state["requests"]) / self.request_rate
+                if self.token_rate and tokens:
+                    wait = max(wait, (tokens - state["tokens"]) / self.token_rate)
+            if wait <= 0:
+                state["requests"] -= 1.0
+                if self.token_rate:
+                    state["tokens"] -= tokens
+                return 0.0
+        return min(wait, MAX_WAIT_SLICE)
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Block until one request (and `tokens` tokens) fit the budget, then
+        take them. Returns the seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, tokens: int = 0) -> float:
+        """
+        acquire() for event-loop callers: the locked state update runs in a
+        worker thread and waits use asyncio.sleep, so the loop never blocks.
+        """
+        waited = 0.0
+        while True:
+            wait = await asyncio.to_thread(self._try_acquire, tokens)
+            if wait <= 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def settle(self, reserved: int, used: int):
+        """Replace a token reservation with the actual usage."""
+        if not self.token_rate or reserved == used:
+            return
+        with self._state() as (state, _):
+            state["tokens"] = min(self.token_capacity, state["tokens"] + reserved - used)
+
+    def observe(self, headers) -> float:
+        """
+        Apply provider rate-limit headers. Returns how long the route is now
+        blocked for (0.0 if the headers imposed no block).
+        """
+        if headers is None:
+            return 0.0
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_at = parse_reset(headers.get("X-RateLimit-Reset"))
+
+        with self._state() as (state, now):
+            if remaining is not None:
+                try:
+                    state["requests"] = min(state["requests"], float(remaining))
+                except ValueError:
+                    pass
+            if retry_after is not None:
+                state["blocked_until"] = max(state["blocked_until"], now + retry_after)
+            elif remaining is not None and state["requests"] < 1 and reset_at:
+                state["blocked_until"] = max(state["blocked_until"], reset_at)
+            return max(state["blocked_until"] - now, 0.0)
+
+    def penalize(self, seconds: float):
+        """Block the route for `seconds` (e.g. 429 without usable headers)."""
+        with self._state() as (state, now):
+            state["requests"] = min(state["requests"], 0.0)
+            state["blocked_until"] = max(state["blocked_until"], now + seconds)
+
+
+_limiters = {}
+
+
+def get_limiter(route: str) -> RateLimiter:
+    """Process-wide limiter for a route, configured from ROUTE_LIMITS."""
+    if route not in _limiters:
+        _limiters[route] = RateLimiter(route, **ROUTE_LIMITS[route])
+    return _limiters[route]
+
+
+def estimate_tokens(prompt_text: str, max_tokens: int) -> int:
+    """Up-front token reservation: rough prompt size plus the completion cap."""
+    return len(prompt_text) // 4 + max_tokens
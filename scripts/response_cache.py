@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+PPH Response Cache
+Local cache of OpenRouter response bodies for deterministic (T0) calls.
+
+The key is a sha256 over the request parameters that determine the
+answer: model string, prompt messages, temperature, max_tokens and
+reasoning settings. The value is the full response body plus the
+original latency. Entries are one JSON file each. Total size is capped
+at max_bytes, with least-recently-used eviction (a hit refreshes the
+file's mtime).
+
+Policies (runner --cache / --refresh flags):
+    off      never read or write (default)
+    use      serve hits from disk, store misses
+    refresh  always call the API, overwrite the stored entry
+
+Stochastic samples are never cached in any mode: any temperature other
+than 0.0 bypasses the cache, so T0.7 runs always draw a fresh sample.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_DIR = SCRIPT_DIR.parent
+
+CACHE_DIR = REPO_DIR / ".cache" / "responses"
+MAX_BYTES = 512 * 1024 * 1024
+
+MODES = ("off", "use", "refresh")
+KEY_FIELDS = ("model", "messages", "temperature", "max_tokens", "reasoning")
+
+
+def request_key(payload: dict) -> str:
+    """Hash of the answer-determining request fields."""
+    fields = {k: payload.get(k) for k in KEY_FIELDS}
+    canonical = json.dumps(fields, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def is_deterministic(payload: dict) -> bool:
+    """Only temperature 0.0 requests are eligible for caching."""
+    try:
+        return float(payload.get("temperature", 1.0)) == 0.0
+    except (TypeError, ValueError):
+        return False
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of response bodies, one JSON file per key."""
+
+    def __init__(self, mode: str = "off", cache_dir=CACHE_DIR, max_bytes: int = MAX_BYTES):
+        if mode not in MODES:
+            raise ValueError(f"cache mode must be one of {MODES}, got {mode!r}")
+        self.mode = mode
+        self.dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.stores = 0
+        self._lock = threading.Lock()
+        self._size = None
+
+    def _path(self, key: str) -> Path:
+        return self.dir / key[:2] / f"{key}.json"
+
+    def get(self, payload: dict) -> dict | None:
+        """Cached {"body", "elapsed"} for payload, or None."""
+        if self.mode != "use" or not is_deterministic(payload):
+            return None
+        path = self._path(request_key(payload))
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        os.utime(path)  # LRU touch
+        self.hits += 1
+        return entry
+
+    def put(self, payload: dict, body: dict, elapsed: float):
+        """Store a response body (no-op when off or non-deterministic)."""
+        if self.mode == "off" or not is_deterministic(payload):
+            return
+        path = self._path(request_key(payload))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"body": body, "elapsed": elapsed, "stored": time.time()},
+                          ensure_ascii=False).encode("utf-8")
+
+        with self._lock:
+            size = self._current_size()
+            old = path.stat().st_size if path.exists() else 0
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+            self.stores += 1
+            self._size = size + len(data) - old
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self) -> list:
+        return [p for p in self.dir.glob("*/*.json")] if self.dir.exists() else []
+
+    def _current_size(self) -> int:
+        if self._size is None:
+            self._size = sum(p.stat().st_size for p in self._entries())
+        return self._size
+
+    def _evict(self):
+        """Drop least-recently-used entries until under max_bytes."""
+        entries = []
+        for p in self._entries():
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+        self._size = total
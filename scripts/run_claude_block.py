@@ -1,19 +1,22 @@
 #!/usr/bin/env python3
 """PPH-001: Re-run only the Claude block (runs 1-6) with nested session fix."""
 
+import argparse
 import json
 import os
-import subprocess
-import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from pathlib import Path
 
+from cli_pool import run_cli
+from rate_limit import get_limiter
+from run_summary import update_file
+
 RAW_DIR = Path.home() / "Documents" / "SeriesFusion" / "PPH-001" / "raw"
 CLAUDE_MODEL = "claude-opus-4-6"
 MAX_RETRIES = 3
 RETRY_DELAY = 5
-INTER_CALL_DELAY = 5
 
 # Import prompts inline (same exact text)
 ECON_ALIGNED = """You are analyzing retail market data for a consumer electronics company.
@@ -117,134 +120,140 @@ RUNS = [
 
 
 def run_claude(prompt_text):
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".txt", delete=False) as f:
-        f.write(prompt_text)
-        tmp_path = f.name
+    env = {k: v for k, v in os.environ.items() if k != "CLAUDECODE"}
+    get_limiter("anthropic-cli").acquire()
+    returncode, stdout, stderr, elapsed = run_cli(
+        ["claude", "-p", "--model", CLAUDE_MODEL, "--output-format", "json"],
+        prompt_text, env=env)
 
-    try:
-        env = {k: v for k, v in os.environ.items() if k != "CLAUDECODE"}
-        start = time.time()
-        result = subprocess.run(
-            ["claude", "-p", "--model", CLAUDE_MODEL, "--output-format", "json"],
-            stdin=open(tmp_path),
-            capture_output=True,
-            text=True,
-            timeout=300,
-            env=env,
-        )
-        elapsed = time.time() - start
-
-        if result.returncode != 0:
-            raise RuntimeError(f"Claude CLI error (rc={result.returncode}): stderr={result.stderr} stdout={result.stdout[:500]}")
+    if returncode != 0:
+        raise RuntimeError(f"Claude CLI error (rc={returncode}): stderr={stderr} stdout={stdout[:500]}")
 
+    try:
+        json_out = json.loads(stdout)
+        response_text = json_out.get("result", stdout)
+        usage = json_out.get("usage", {})
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+    except (json.JSONDecodeError, TypeError):
+        response_text = stdout
+        input_tokens = 0
+        output_tokens = 0
+
+    return response_text, {
+        "response_time_seconds": round(elapsed, 2),
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+    }
+
+
+def execute_run(run_def):
+    """Run one Claude prompt with retries. Returns (result, status)."""
+    run_id, scenario, prior_strength, condition, escape_hatch, prompt_text = run_def
+
+    result = {
+        "experiment": "PPH-001",
+        "run_id": run_id,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "scenario": scenario,
+        "scenario_prior_strength": prior_strength,
+        "condition": condition,
+        "model": "claude-opus-4.6",
+        "model_api_string": "claude-opus-4-6 (via CLI, resolved from claude-opus-4-6-20250514)",
+        "model_route": "anthropic-cli",
+        "temperature": "default (no CLI flag)",
+        "escape_hatch": escape_hatch,
+        "prompt_text": prompt_text,
+        "full_response": None,
+        "reasoning_trace": None,
+        "metadata": {
+            "response_length_chars": 0,
+            "response_length_words": 0,
+            "response_time_seconds": 0.0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "total_tokens": 0,
+        },
+        "scores": {
+            "confabulation_count": None,
+            "confabulations_listed": [],
+            "confabulation_specificity_max": None,
+            "prior_preservation": None,
+            "hedging_count": None,
+            "direct_contradiction_acknowledged": None,
+        },
+        "scorer_notes": "",
+    }
+
+    status = "ERROR"
+    last_error = None
+    for attempt in range(1, MAX_RETRIES + 1):
         try:
-            json_out = json.loads(result.stdout)
-            response_text = json_out.get("result", result.stdout)
-            usage = json_out.get("usage", {})
-            input_tokens = usage.get("input_tokens", 0)
-            output_tokens = usage.get("output_tokens", 0)
-        except (json.JSONDecodeError, TypeError):
-            response_text = result.stdout
-            input_tokens = 0
-            output_tokens = 0
-
-        return response_text, {
-            "response_time_seconds": round(elapsed, 2),
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
-            "total_tokens": input_tokens + output_tokens,
-        }
-    finally:
-        os.unlink(tmp_path)
-
-
-def main():
+            print(f"  Attempt {attempt}/{MAX_RETRIES}...", end=" ", flush=True)
+            response_text, meta = run_claude(prompt_text)
+
+            result["full_response"] = response_text
+            result["metadata"]["response_length_chars"] = len(response_text)
+            result["metadata"]["response_length_words"] = len(response_text.split())
+            result["metadata"]["response_time_seconds"] = meta["response_time_seconds"]
+            result["metadata"]["input_tokens"] = meta["input_tokens"]
+            result["metadata"]["output_tokens"] = meta["output_tokens"]
+            result["metadata"]["total_tokens"] = meta["total_tokens"]
+
+            print(f"OK ({meta['response_time_seconds']}s, {len(response_text.split())} words)")
+            status = "OK"
+            break
+        except Exception as e:
+            last_error = str(e)
+            print(f"FAILED: {last_error}")
+            if attempt < MAX_RETRIES:
+                print(f"  Retrying in {RETRY_DELAY}s...")
+                time.sleep(RETRY_DELAY)
+
+    if status == "ERROR":
+        result["full_response"] = f"ERROR after {MAX_RETRIES} retries: {last_error}"
+    return result, status
+
+
+def save_run(result, status):
+    """Write one run JSON (overwriting the error files from the first run); return its summary row."""
+    out_path = RAW_DIR / f"{result['run_id']}.json"
+    with open(out_path, "w") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+    return {
+        "run_id": result["run_id"],
+        "status": status,
+        "response_words": result["metadata"]["response_length_words"],
+        "response_time_seconds": result["metadata"]["response_time_seconds"],
+        "total_tokens": result["metadata"].get("total_tokens"),
+    }
+
+
+def main(workers=1):
     print("=" * 70)
     print("PPH-001: Claude Block Re-run (6 prompts)")
     print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    if workers > 1:
+        print(f"Workers: {workers} concurrent CLI invocations")
     print("=" * 70)
 
-    summary_rows = []
-
-    for i, (run_id, scenario, prior_strength, condition, escape_hatch, prompt_text) in enumerate(RUNS):
-        print(f"\n[{i+1}/6] {run_id}")
-
-        result = {
-            "experiment": "PPH-001",
-            "run_id": run_id,
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "scenario": scenario,
-            "scenario_prior_strength": prior_strength,
-            "condition": condition,
-            "model": "claude-opus-4.6",
-            "model_api_string": "claude-opus-4-6 (via CLI, resolved from claude-opus-4-6-20250514)",
-            "model_route": "anthropic-cli",
-            "temperature": "default (no CLI flag)",
-            "escape_hatch": escape_hatch,
-            "prompt_text": prompt_text,
-            "full_response": None,
-            "reasoning_trace": None,
-            "metadata": {
-                "response_length_chars": 0,
-                "response_length_words": 0,
-                "response_time_seconds": 0.0,
-                "input_tokens": 0,
-                "output_tokens": 0,
-                "total_tokens": 0,
-            },
-            "scores": {
-                "confabulation_count": None,
-                "confabulations_listed": [],
-                "confabulation_specificity_max": None,
-                "prior_preservation": None,
-                "hedging_count": None,
-                "direct_contradiction_acknowledged": None,
-            },
-            "scorer_notes": "",
-        }
-
-        status = "ERROR"
-        last_error = None
-        for attempt in range(1, MAX_RETRIES + 1):
-            try:
-                print(f"  Attempt {attempt}/{MAX_RETRIES}...", end=" ", flush=True)
-                response_text, meta = run_claude(prompt_text)
-
-                result["full_response"] = response_text
-                result["metadata"]["response_length_chars"] = len(response_text)
-                result["metadata"]["response_length_words"] = len(response_text.split())
-                result["metadata"]["response_time_seconds"] = meta["response_time_seconds"]
-                result["metadata"]["input_tokens"] = meta["input_tokens"]
-                result["metadata"]["output_tokens"] = meta["output_tokens"]
-                result["metadata"]["total_tokens"] = meta["total_tokens"]
-
-                print(f"OK ({meta['response_time_seconds']}s, {len(response_text.split())} words)")
-                status = "OK"
-                break
-            except Exception as e:
-                last_error = str(e)
-                print(f"FAILED: {last_error}")
-                if attempt < MAX_RETRIES:
-                    print(f"  Retrying in {RETRY_DELAY}s...")
-                    time.sleep(RETRY_DELAY)
-
-        if status == "ERROR":
-            result["full_response"] = f"ERROR after {MAX_RETRIES} retries: {last_error}"
-
-        # Save JSON (overwrites the error files from first run)
-        out_path = RAW_DIR / f"{run_id}.json"
-        with open(out_path, "w") as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
-
-        summary_rows.append({
-            "run_id": run_id,
-            "status": status,
-            "response_words": result["metadata"]["response_length_words"],
-            "response_time_seconds": result["metadata"]["response_time_seconds"],
-        })
-
-        if i < len(RUNS) - 1:
-            time.sleep(INTER_CALL_DELAY)
+    if workers > 1:
+        summary_rows = [None] * len(RUNS)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(execute_run, run_def): i for i, run_def in enumerate(RUNS)}
+            for done, future in enumerate(as_completed(futures), 1):
+                i = futures[future]
+                result, status = future.result()
+                summary_rows[i] = save_run(result, status)
+                print(f"\n[{done}/{len(RUNS)}] {RUNS[i][0]}: {status}")
+    else:
+        summary_rows = []
+        for i, run_def in enumerate(RUNS):
+            print(f"\n[{i+1}/{len(RUNS)}] {run_def[0]}")
+            result, status = execute_run(run_def)
+            summary_rows.append(save_run(result, status))
 
     # Summary
     print("\n" + "=" * 70)
@@ -262,20 +271,14 @@ def main():
     # Update the master summary
     summary_path = RAW_DIR / "PPH-001-summary.json"
     if summary_path.exists():
-        with open(summary_path) as f:
-            master = json.load(f)
-        # Update Claude entries
-        for row in summary_rows:
-            for mrow in master["runs"]:
-                if mrow["run_id"] == row["run_id"]:
-                    mrow.update(row)
-        master["successful"] = sum(1 for r in master["runs"] if r["status"] == "OK")
-        master["failed"] = sum(1 for r in master["runs"] if r["status"] == "ERROR")
-        master["completed"] = datetime.now(timezone.utc).isoformat()
-        with open(summary_path, "w") as f:
-            json.dump(master, f, indent=2)
+        update_file(summary_path, summary_rows)
         print(f"\nMaster summary updated: {summary_path}")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="PPH-001 Claude block re-run")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Concurrent Claude CLI invocations (default: 1 = sequential)")
+    args = parser.parse_args()
+
+    main(args.workers)
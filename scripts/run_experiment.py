@@ -1,29 +1,44 @@
 #!/usr/bin/env python3
 """PPH-001: Prior-Protective Hallucination — Minimum Viable Experiment Runner"""
 
+import argparse
 import json
 import os
-import subprocess
-import tempfile
+import threading
 import time
-import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from pathlib import Path
 
+from cli_pool import run_cli
+from openrouter_client import READ_TIMEOUT, configure, post_json
+from rate_limit import get_limiter, estimate_tokens
+from response_cache import ResponseCache
+from run_journal import RunJournal, load_run, split_completed
+from run_summary import SummaryAggregator, write_json
+
 # -------------------------------------------------------------------
 # Config
 # -------------------------------------------------------------------
 RAW_DIR = Path.home() / "Documents" / "SeriesFusion" / "PPH-001" / "raw"
 ENV_FILE = Path.home() / "Documents" / "SeriesFusion" / "PPH-001" / ".env"
+JOURNAL_FILE = RAW_DIR / "PPH-001-progress.jsonl"
 
 CLAUDE_MODEL = "claude-opus-4-6-20250514"
 GEMINI_MODEL = "gemini-3-pro-preview"
 DEEPSEEK_MODEL = "deepseek/deepseek-r1"
-OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+# PPH_OPENROUTER_URL points the runner at a stand-in (e.g. mock_server.py)
+OPENROUTER_URL = os.environ.get("PPH_OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
 
 MAX_RETRIES = 3
 RETRY_DELAY = 5
-INTER_CALL_DELAY = 5  # seconds between calls
+
+# DeepSeek T0 response cache; mode set by --cache / --refresh
+RESPONSE_CACHE = ResponseCache()
+
+# Max in-flight runs per model with --workers > 1 (CLI runs are also capped by cli_pool)
+MODEL_CONCURRENCY = {"CLAUDE": 4, "GEMINI": 4, "DEEPSEEK": 4}
 
 # -------------------------------------------------------------------
 # Prompts — exact text from mission brief, zero modifications
@@ -178,87 +193,62 @@ def load_api_key():
 
 def run_claude(prompt_text):
     """Run prompt via Claude CLI. Returns (response_text, metadata_dict)."""
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".txt", delete=False) as f:
-        f.write(prompt_text)
-        tmp_path = f.name
+    # Strip CLAUDECODE env var to allow nested CLI invocation
+    env = {k: v for k, v in os.environ.items() if k != "CLAUDECODE"}
+    get_limiter("anthropic-cli").acquire()
+    returncode, stdout, stderr, elapsed = run_cli(
+        ["claude", "-p", "--model", CLAUDE_MODEL, "--output-format", "json"],
+        prompt_text, env=env)
 
+    if returncode != 0:
+        raise RuntimeError(f"Claude CLI error (rc={returncode}): {stderr}")
+
+    # Try to parse JSON output for token counts
     try:
-        # Strip CLAUDECODE env var to allow nested CLI invocation
-        env = {k: v for k, v in os.environ.items() if k != "CLAUDECODE"}
-        start = time.time()
-        result = subprocess.run(
-            ["claude", "-p", "--model", CLAUDE_MODEL, "--output-format", "json"],
-            stdin=open(tmp_path),
-            capture_output=True,
-            text=True,
-            timeout=300,
-            env=env,
-        )
-        elapsed = time.time() - start
-
-        if result.returncode != 0:
-            raise RuntimeError(f"Claude CLI error (rc={result.returncode}): {result.stderr}")
-
-        # Try to parse JSON output for token counts
-        try:
-            json_out = json.loads(result.stdout)
-            response_text = json_out.get("result", result.stdout)
-            usage = json_out.get("usage", {})
-            input_tokens = usage.get("input_tokens", 0)
-            output_tokens = usage.get("output_tokens", 0)
-        except (json.JSONDecodeError, TypeError):
-            response_text = result.stdout
-            input_tokens = 0
-            output_tokens = 0
-
-        return response_text, {
-            "response_time_seconds": round(elapsed, 2),
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
-            "total_tokens": input_tokens + output_tokens,
-        }
-    finally:
-        os.unlink(tmp_path)
+        json_out = json.loads(stdout)
+        response_text = json_out.get("result", stdout)
+        usage = json_out.get("usage", {})
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+    except (json.JSONDecodeError, TypeError):
+        response_text = stdout
+        input_tokens = 0
+        output_tokens = 0
+
+    return response_text, {
+        "response_time_seconds": round(elapsed, 2),
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+    }
 
 
 def run_gemini(prompt_text):
     """Run prompt via Gemini CLI. Returns (response_text, metadata_dict)."""
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".txt", delete=False) as f:
-        f.write(prompt_text)
-        tmp_path = f.name
+    # Piped stdin puts the Gemini CLI in non-interactive mode; no -p needed
+    get_limiter("google-cli").acquire()
+    returncode, stdout, stderr, elapsed = run_cli(["gemini", "--model", GEMINI_MODEL], prompt_text)
 
-    try:
-        start = time.time()
-        result = subprocess.run(
-            ["gemini", "-p", prompt_text, "--model", GEMINI_MODEL],
-            capture_output=True,
-            text=True,
-            timeout=300,
-        )
-        elapsed = time.time() - start
-
-        if result.returncode != 0:
-            raise RuntimeError(f"Gemini CLI error (rc={result.returncode}): {result.stderr}")
-
-        response_text = result.stdout.strip()
-        return response_text, {
-            "response_time_seconds": round(elapsed, 2),
-            "input_tokens": 0,
-            "output_tokens": 0,
-            "total_tokens": 0,
-        }
-    finally:
-        os.unlink(tmp_path)
+    if returncode != 0:
+        raise RuntimeError(f"Gemini CLI error (rc={returncode}): {stderr}")
+
+    response_text = stdout.strip()
+    return response_text, {
+        "response_time_seconds": round(elapsed, 2),
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "total_tokens": 0,
+    }
 
 
 def run_deepseek(prompt_text, api_key):
     """Run prompt via OpenRouter API. Returns (response_text, reasoning_trace, metadata_dict)."""
-    payload = json.dumps({
+    payload = {
         "model": DEEPSEEK_MODEL,
         "messages": [{"role": "user", "content": prompt_text}],
         "temperature": 0.0,
         "max_tokens": 4096,
-    }).encode()
+    }
 
     headers = {
         "Authorization": f"Bearer {api_key}",
@@ -267,12 +257,25 @@ def run_deepseek(prompt_text, api_key):
         "X-Title": "PPH-001 Experiment",
     }
 
-    req = urllib.request.Request(OPENROUTER_URL, data=payload, headers=headers, method="POST")
+    cached = RESPONSE_CACHE.get(payload)
+    if cached is not None:
+        body, elapsed = cached["body"], cached["elapsed"]
+        timings = {"connect_seconds": 0.0, "ttfb_seconds": 0.0}
+    else:
+        limiter = get_limiter("openrouter")
+        reserved = estimate_tokens(prompt_text, 4096)
+        limiter.acquire(reserved)
 
-    start = time.time()
-    with urllib.request.urlopen(req, timeout=120) as resp:
-        body = json.loads(resp.read().decode())
-    elapsed = time.time() - start
+        start = time.time()
+        try:
+            body, resp_headers, timings = post_json(OPENROUTER_URL, payload, headers)
+        except Exception:
+            limiter.settle(reserved, 0)     # nothing generated; hand the reservation back
+            raise
+        limiter.observe(resp_headers)
+        elapsed = time.time() - start - timings["queue_seconds"]     # waiting for a pool slot is not latency
+        limiter.settle(reserved, (body.get("usage") or {}).get("total_tokens", reserved))
+        RESPONSE_CACHE.put(payload, body, elapsed)
 
     choice = body["choices"][0]
     message = choice["message"]
@@ -281,15 +284,18 @@ def run_deepseek(prompt_text, api_key):
     # Capture reasoning/thinking tokens if available
     reasoning_trace = message.get("reasoning_content") or message.get("thinking") or None
 
-    usage = body.get("usage", {})
+    usage = body.get("usage") or {}
     input_tokens = usage.get("prompt_tokens", 0)
     output_tokens = usage.get("completion_tokens", 0)
 
     return response_text, reasoning_trace, {
         "response_time_seconds": round(elapsed, 2),
+        "connect_time_seconds": timings["connect_seconds"],
+        "time_to_first_byte_seconds": timings["ttfb_seconds"],
         "input_tokens": input_tokens,
         "output_tokens": output_tokens,
         "total_tokens": input_tokens + output_tokens,
+        "response_cache_hit": cached is not None,
     }
 
 
@@ -354,10 +360,34 @@ def execute_run(run_def, api_key):
             result["metadata"]["input_tokens"] = meta["input_tokens"]
             result["metadata"]["output_tokens"] = meta["output_tokens"]
             result["metadata"]["total_tokens"] = meta["total_tokens"]
+            for key in ("connect_time_seconds", "time_to_first_byte_seconds", "response_cache_hit"):
+                if key in meta:
+                    result["metadata"][key] = meta[key]
 
             print(f"OK ({meta['response_time_seconds']}s, {len(response_text.split())} words)")
             return result, "OK"
 
+        except urllib.error.HTTPError as e:
+            error_body = ""
+            try:
+                error_body = e.read().decode()[:500]
+            except Exception:
+                pass
+            last_error = f"HTTP {e.code}: {error_body}"
+            print(f"FAILED: {last_error}")
+
+            # Rate limited: block the shared route; the next acquire() waits
+            if e.code == 429:
+                limiter = get_limiter("openrouter")
+                retry_after = limiter.observe(e.headers)
+                if not retry_after:
+                    retry_after = RETRY_DELAY * 2 ** (attempt - 1)
+                    limiter.penalize(retry_after)
+                print(f"  Rate limited. Route blocked for {retry_after:.0f}s...")
+            elif attempt < MAX_RETRIES:
+                print(f"  Retrying in {RETRY_DELAY}s...")
+                time.sleep(RETRY_DELAY)
+
         except Exception as e:
             last_error = str(e)
             print(f"FAILED: {last_error}")
@@ -371,54 +401,119 @@ def execute_run(run_def, api_key):
     return result, "ERROR"
 
 
-def main():
-    RAW_DIR.mkdir(parents=True, exist_ok=True)
-
-    api_key = load_api_key()
-    if not api_key:
-        print("ERROR: OPENROUTER_API_KEY not found. Set it in environment or .env file.")
-        print("DeepSeek R1 block will fail. Continue anyway? (y/n)")
-        if input().strip().lower() != "y":
-            return
-
-    print("=" * 70)
-    print("PPH-001: Prior-Protective Hallucination — MVE Runner")
-    print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"Output:  {RAW_DIR}")
-    print("=" * 70)
-
-    summary_rows = []
-    deepseek_had_reasoning = False
-
-    for i, run_def in enumerate(RUNS):
-        run_id = run_def[0]
-        model_short = run_def[5]
-
-        print(f"\n[{i+1}/18] {run_id}")
-
-        result, status = execute_run(run_def, api_key)
-
-        # Check for DeepSeek reasoning tokens
-        if model_short == "DEEPSEEK" and result.get("reasoning_trace"):
-            deepseek_had_reasoning = True
-
-        # Save individual JSON
-        out_path = RAW_DIR / f"{run_id}.json"
-        with open(out_path, "w") as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
+def summary_row(result, status):
+    """Summary row for one run result."""
+    return {
+        "run_id": result["run_id"],
+        "status": status,
+        "response_words": result["metadata"]["response_length_words"],
+        "response_time_seconds": result["metadata"]["response_time_seconds"],
+        "total_tokens": result["metadata"].get("total_tokens"),
+    }
 
-        word_count = result["metadata"]["response_length_words"]
-        elapsed = result["metadata"]["response_time_seconds"]
-        summary_rows.append({
-            "run_id": run_id,
-            "status": status,
-            "response_words": word_count,
-            "response_time_seconds": elapsed,
-        })
 
-        # Rate limiting between calls
-        if i < len(RUNS) - 1:
-            time.sleep(INTER_CALL_DELAY)
+def deepseek_reasoning_found():
+    """True if any saved DeepSeek run in RAW_DIR carries a reasoning trace."""
+    for run_def in RUNS:
+        if run_def[5] == "DEEPSEEK":
+            result = load_run(RAW_DIR / f"{run_def[0]}.json")
+            if result and result.get("reasoning_trace"):
+                return True
+    return False
+
+
+def save_run(result, status, journal=None):
+    """Write one run JSON to RAW_DIR, journal it, and return its summary row."""
+    out_path = RAW_DIR / f"{result['run_id']}.json"
+    with open(out_path, "w") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+    row = summary_row(result, status)
+    if journal is not None:
+        journal.append(row)
+    return row
+
+
+def run_concurrent(runs, api_key, workers, journal=None):
+    """
+    Execute runs on a bounded thread pool. MODEL_CONCURRENCY caps in-flight
+    runs per model, so the Claude CLI, Gemini CLI and DeepSeek API blocks
+    proceed side by side. Summary rows come back in the original run order.
+    """
+    limits = {key: threading.Semaphore(n) for key, n in MODEL_CONCURRENCY.items()}
+
+    def worker(run_def):
+        with limits[run_def[5]]:
+            return execute_run(run_def, api_key)
+
+    rows = [None] * len(runs)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(worker, run_def): i for i, run_def in enumerate(runs)}
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            result, status = future.result()
+            rows[i] = save_run(result, status, journal)
+            print(f"\n[{done}/{len(runs)}] {runs[i][0]}: {status}")
+    return rows
+
+
+def main(resume=False, rebuild_summary=False, cache_mode="off", workers=1, pool_size=None, timeout=None):
+    RAW_DIR.mkdir(parents=True, exist_ok=True)
+    RESPONSE_CACHE.mode = cache_mode
+    # One pooled connection per API call that can be in flight, so nobody queues for a slot
+    configure(pool_size=pool_size or max(1, min(workers, sum(MODEL_CONCURRENCY.values()))),
+              read_timeout=timeout)
+    journal = RunJournal(JOURNAL_FILE)
+    agg = SummaryAggregator(order=[run_def[0] for run_def in RUNS])
+
+    if rebuild_summary:
+        # No model calls: summary comes from the progress journal alone
+        logged = journal.load()
+        for run_def in RUNS:
+            if run_def[0] in logged:
+                agg.record(logged[run_def[0]])
+        print(f"Rebuilding summary from {JOURNAL_FILE} ({agg.ok + agg.error}/{len(RUNS)} runs logged)")
+    else:
+        api_key = load_api_key()
+        if not api_key:
+            print("ERROR: OPENROUTER_API_KEY not found. Set it in environment or .env file.")
+            print("DeepSeek R1 block will fail. Continue anyway? (y/n)")
+            if input().strip().lower() != "y":
+                return
+
+        print("=" * 70)
+        print("PPH-001: Prior-Protective Hallucination — MVE Runner")
+        print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"Output:  {RAW_DIR}")
+        if workers > 1:
+            print(f"Workers: {workers} (per model: {MODEL_CONCURRENCY})")
+
+        runs = RUNS
+        if resume:
+            runs, completed = split_completed(RUNS, RAW_DIR)
+            logged = journal.load()
+            for run_id, result in completed.items():
+                row = logged.get(run_id)
+                agg.record(row if row and row["status"] == "OK" else summary_row(result, "OK"))
+            print(f"Resume:  {len(completed)} completed, {len(runs)} to run")
+        print("=" * 70)
+
+        if workers > 1:
+            for row in run_concurrent(runs, api_key, workers, journal):
+                agg.record(row)
+        else:
+            for i, run_def in enumerate(runs):
+                run_id = run_def[0]
+
+                print(f"\n[{i+1}/{len(runs)}] {run_id}")
+
+                result, status = execute_run(run_def, api_key)
+                agg.record(save_run(result, status, journal))
+
+    summary_rows = agg.rows()
+
+    # Check for DeepSeek reasoning tokens
+    deepseek_had_reasoning = deepseek_reasoning_found()
 
     # Print summary table
     print("\n" + "=" * 70)
@@ -430,29 +525,39 @@ def main():
         print(f"{row['run_id']:<42} | {row['status']:<6} | {row['response_words']:>6} | {row['response_time_seconds']:>8.1f}")
 
     # Save summary JSON
-    summary = {
-        "experiment": "PPH-001",
-        "completed": datetime.now(timezone.utc).isoformat(),
-        "total_runs": len(summary_rows),
-        "successful": sum(1 for r in summary_rows if r["status"] == "OK"),
-        "failed": sum(1 for r in summary_rows if r["status"] == "ERROR"),
-        "deepseek_reasoning_tokens_found": deepseek_had_reasoning,
-        "runs": summary_rows,
-    }
-    with open(RAW_DIR / "PPH-001-summary.json", "w") as f:
-        json.dump(summary, f, indent=2)
+    summary = agg.summary({"experiment": "PPH-001"},
+                          {"deepseek_reasoning_tokens_found": deepseek_had_reasoning})
+    write_json(RAW_DIR / "PPH-001-summary.json", summary)
 
     # DeepSeek reasoning flag
     if deepseek_had_reasoning:
         print("\n*** BONUS: DeepSeek R1 returned reasoning/thinking tokens! ***")
         print("Check reasoning_trace field in DEEPSEEK run JSONs.")
 
-    ok = sum(1 for r in summary_rows if r["status"] == "OK")
-    err = sum(1 for r in summary_rows if r["status"] == "ERROR")
-    print(f"\nResults: {ok} OK, {err} ERROR")
+    print(f"\nResults: {agg.ok} OK, {agg.error} ERROR")
+    if RESPONSE_CACHE.hits or RESPONSE_CACHE.stores:
+        print(f"\nResponse cache: {RESPONSE_CACHE.hits} hits, {RESPONSE_CACHE.stores} stored")
     print(f"\nAll 18 MVE runs complete. Results saved to {RAW_DIR}")
     print("Bring these results to Claude for scoring and analysis.")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="PPH-001 MVE Runner")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Concurrent runs across the CLI and API blocks (default: 1 = sequential)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip run_ids that already have a successful JSON in RAW_DIR")
+    parser.add_argument("--rebuild-summary", action="store_true",
+                        help="Rewrite the summary from the progress journal without calling any model")
+    cache = parser.add_mutually_exclusive_group()
+    cache.add_argument("--cache", dest="cache_mode", action="store_const", const="use", default="off",
+                       help="Serve repeat DeepSeek T0 calls from the local response cache")
+    cache.add_argument("--refresh", dest="cache_mode", action="store_const", const="refresh",
+                       help="Call the API and overwrite cached DeepSeek T0 responses")
+    parser.add_argument("--pool-size", type=int, default=None,
+                        help="OpenRouter keep-alive connections (default: in-flight API calls allowed by --workers)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help=f"Seconds per OpenRouter socket read (default: {READ_TIMEOUT})")
+    args = parser.parse_args()
+
+    main(args.resume, args.rebuild_summary, args.cache_mode, args.workers, args.pool_size, args.timeout)
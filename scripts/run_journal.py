@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+PPH Run Journal
+Resume support and a crash-safe progress log for the experiment runners.
+
+A run counts as completed when RAW_DIR holds a parseable JSON for its
+run_id whose full_response is a real answer, not missing or an
+"ERROR after ..." marker. With --resume the runners only dispatch runs
+that are not completed.
+
+Every finished run appends its summary row to a JSONL journal (flushed
+and fsynced per line). The summary can be rebuilt from the journal
+without calling any model. A torn last line from a crash is ignored.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+ERROR_PREFIX = "ERROR after"
+
+
+def load_run(path) -> dict | None:
+    """Parsed run JSON, or None if missing or unreadable."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def is_completed(result: dict | None) -> bool:
+    """True for a run JSON holding a successful model response."""
+    if not result:
+        return False
+    response = result.get("full_response")
+    return isinstance(response, str) and bool(response.strip()) and not response.startswith(ERROR_PREFIX)
+
+
+def split_completed(runs: list, raw_dir) -> tuple[list, dict]:
+    """
+    Partition run definitions (run_id first) into (pending, completed),
+    where completed maps run_id -> the existing result JSON.
+    """
+    pending, completed = [], {}
+    for run_def in runs:
+        result = load_run(Path(raw_dir) / f"{run_def[0]}.json")
+        if is_completed(result):
+            completed[run_def[0]] = result
+        else:
+            pending.append(run_def)
+    return pending, completed
+
+
+class RunJournal:
+    """Append-only JSONL progress log, one summary row per finished run."""
+
+    def __init__(self, path, key: str = "run_id"):
+        self.path = Path(path)
+        self.key = key
+        self._lock = threading.Lock()
+
+    def append(self, row: dict):
+        line = json.dumps(row, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def load(self) -> dict:
+        """Latest row per key (run_id by default), in first-seen order."""
+        rows = {}
+        if not self.path.exists():
+            return rows
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn write from a crash
+                rows[row[self.key]] = row
+        return rows
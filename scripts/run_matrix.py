@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+PPH Matrix Runner
+One runner for every phase in experiment_matrix.PHASES.
+
+    python run_matrix.py phase2a --workers 8 --resume
+    python run_matrix.py phase1-v2 --cache
+    python run_matrix.py phase2b --dry-run
+
+Runs are pulled from the lazy expand() generator into a bounded window of
+in-flight work (2 x workers), so memory stays flat however large the
+grid is. Each result JSON is written as soon as its run finishes and its
+summary row goes to the progress journal. The phase summary is rebuilt
+from the journal at the end.
+
+Routing follows the phase spec:
+    openrouter / openrouter-api   shared keep-alive pool, rate limiter,
+                                  T0 response cache, 404 fallback model
+    anthropic-cli / google-cli    cli_pool subprocesses (prompt on stdin)
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.error
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from pathlib import Path
+
+from cli_pool import run_cli
+from experiment_matrix import CLI_ROUTES, MODELS, PHASES, RAW_ROOT, count, expand, new_result, route
+from openrouter_client import READ_TIMEOUT, configure, post_json
+from rate_limit import get_limiter, estimate_tokens
+from response_cache import ResponseCache
+from run_journal import RunJournal, is_completed, load_run
+from run_summary import SummaryAggregator, write_json
+
+ENV_FILE = RAW_ROOT / ".env"
+# PPH_OPENROUTER_URL points the runner at a stand-in (e.g. mock_server.py)
+OPENROUTER_URL = os.environ.get("PPH_OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
+
+MAX_TOKENS = 4096
+MAX_RETRIES = 3
+RETRY_DELAYS = [10, 20, 40]
+
+# Max in-flight runs per model; --workers caps the total
+MODEL_CONCURRENCY = {"CLAUDE": 4, "GEMINI": 4, "DEEPSEEK": 4}
+
+RESPONSE_CACHE = ResponseCache()
+
+
+def load_api_key(name="OPENROUTER_API_KEY"):
+    if os.environ.get(name):
+        return os.environ[name]
+    if ENV_FILE.exists():
+        for line in ENV_FILE.read_text().splitlines():
+            if line.startswith(f"{name}="):
+                return line.split("=", 1)[1].strip()
+    return None
+
+
+def call_openrouter(api_key, model_string, prompt_text, temperature, enable_reasoning):
+    """One OpenRouter call. Returns (response_text, reasoning_trace, metadata_dict)."""
+    payload = {
+        "model": model_string,
+        "temperature": temperature,
+        "max_tokens": MAX_TOKENS,
+        "messages": [{"role": "user", "content": prompt_text}],
+    }
+    if enable_reasoning:
+        payload["reasoning"] = {"effort": "medium"}
+
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "https://seriesfusion.com",
+        "X-Title": "PPH-001-HypothesisEngine",
+    }
+
+    cached = RESPONSE_CACHE.get(payload)
+    if cached is not None:
+        data, elapsed = cached["body"], cached["elapsed"]
+    else:
+        limiter = get_limiter("openrouter")
+        reserved = estimate_tokens(prompt_text, MAX_TOKENS)
+        limiter.acquire(reserved)
+
+        start = time.time()
+        try:
+            data, resp_headers, timings = post_json(OPENROUTER_URL, payload, headers)
+        except Exception:
+            limiter.settle(reserved, 0)     # nothing generated; hand the reservation back
+            raise
+        limiter.observe(resp_headers)
+        elapsed = time.time() - start - timings["queue_seconds"]     # waiting for a pool slot is not latency
+        limiter.settle(reserved, (data.get("usage") or {}).get("total_tokens", reserved))
+        RESPONSE_CACHE.put(payload, data, elapsed)
+
+    choice = data["choices"][0]
+    message = choice["message"]
+    usage = data.get("usage") or {}
+    reasoning = message.get("reasoning") or message.get("reasoning_content")
+    return message.get("content", ""), reasoning, {
+        "response_time_seconds": round(elapsed, 2),
+        "input_tokens": usage.get("prompt_tokens", 0),
+        "output_tokens": usage.get("completion_tokens", 0),
+        "reasoning_tokens": usage.get("reasoning_tokens", 0),
+        "total_tokens": usage.get("total_tokens", 0),
+        "openrouter_generation_id": data.get("id"),
+        "finish_reason": choice.get("finish_reason"),
+        "model_returned": data.get("model", model_string),
+        "response_cache_hit": cached is not None,
+    }
+
+
+def call_cli(run_route, model_key, prompt_text):
+    """One CLI invocation. Returns (response_text, None, metadata_dict)."""
+    env = None
+    if run_route == "anthropic-cli":
+        # Strip CLAUDECODE env var to allow nested CLI invocation
+        env = {k: v for k, v in os.environ.items() if k != "CLAUDECODE"}
+    get_limiter(run_route).acquire()
+    returncode, stdout, stderr, elapsed = run_cli(MODELS[model_key]["cli"], prompt_text, env=env)
+    if returncode != 0:
+        raise RuntimeError(f"{run_route} error (rc={returncode}): {stderr}")
+
+    response_text, input_tokens, output_tokens = stdout.strip(), 0, 0
+    if run_route == "anthropic-cli":
+        try:
+            json_out = json.loads(stdout)
+            response_text = json_out.get("result", stdout)
+            usage = json_out.get("usage", {})
+            input_tokens = usage.get("input_tokens", 0)
+            output_tokens = usage.get("output_tokens", 0)
+        except (json.JSONDecodeError, TypeError):
+            pass
+    return response_text, None, {
+        "response_time_seconds": round(elapsed, 2),
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+    }
+
+
+def execute_run(run, api_key):
+    """Execute one matrix run with retries and fallback. Returns (result, status)."""
+    result = new_result(run, datetime.now(timezone.utc).isoformat())
+    run_route = route(run)
+    model = MODELS[run.model]
+
+    if run_route in CLI_ROUTES:
+        models_to_try = [None]
+    else:
+        models_to_try = [model["openrouter"]] + ([model["fallback"]] if model["fallback"] else [])
+
+    last_error = None
+    for model_string in models_to_try:
+        for attempt in range(MAX_RETRIES):
+            try:
+                if model_string is None:
+                    text, reasoning, meta = call_cli(run_route, run.model, run.prompt_text)
+                else:
+                    text, reasoning, meta = call_openrouter(api_key, model_string, run.prompt_text,
+                                                            run.temperature, model["reasoning"])
+                    result["model_api_string"] = model_string
+
+                result["full_response"] = text
+                result["reasoning_trace"] = reasoning
+                result["metadata"]["response_length_chars"] = len(text)
+                result["metadata"]["response_length_words"] = len(text.split())
+                result["metadata"].update(meta)
+                return result, "OK"
+
+            except urllib.error.HTTPError as e:
+                try:
+                    last_error = f"HTTP {e.code}: {e.read().decode()[:500]}"
+                except Exception:
+                    last_error = f"HTTP {e.code}"
+                print(f"  {run.run_id} attempt {attempt+1}/{MAX_RETRIES}: {last_error}")
+
+                if e.code == 404 and model_string == model["openrouter"] and model["fallback"]:
+                    break  # try the fallback model string
+                if e.code == 429:
+                    limiter = get_limiter("openrouter")
+                    if not limiter.observe(e.headers):
+                        limiter.penalize(RETRY_DELAYS[attempt])
+                    continue
+                if attempt < MAX_RETRIES - 1:
+                    time.sleep(RETRY_DELAYS[attempt])
+
+            except Exception as e:
+                last_error = str(e)
+                print(f"  {run.run_id} attempt {attempt+1}/{MAX_RETRIES}: {last_error}")
+                if attempt < MAX_RETRIES - 1:
+                    time.sleep(RETRY_DELAYS[attempt])
+
+    result["full_response"] = f"ERROR after all retries: {last_error}"
+    return result, "ERROR"
+
+
+def summary_row(result, status):
+    """Summary row for one run result."""
+    return {
+        "run_id": result["run_id"],
+        "status": status,
+        "model": result["model"],
+        "condition": result["condition"],
+        "temperature": result["temperature"],
+        "response_words": result["metadata"]["response_length_words"],
+        "response_time_seconds": result["metadata"]["response_time_seconds"],
+        "total_tokens": result["metadata"].get("total_tokens"),
+        "model_returned": result["metadata"].get("model_returned"),
+    }
+
+
+def save_run(result, status, out_dir, journal):
+    """Write one run JSON to out_dir and append its summary row to the journal."""
+    with open(Path(out_dir) / f"{result['run_id']}.json", "w") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    journal.append(summary_row(result, status))
+
+
+def dispatch(runs, api_key, workers, out_dir, journal):
+    """
+    Execute an iterable of runs with at most 2 x workers submitted at once.
+    Returns (ok, error) counts.
+    """
+    limits = {key: threading.Semaphore(n) for key, n in MODEL_CONCURRENCY.items()}
+    counts = {"OK": 0, "ERROR": 0}
+
+    def worker(run):
+        with limits[run.model]:
+            return execute_run(run, api_key)
+
+    def finish(done):
+        for future in done:
+            result, status = future.result()
+            save_run(result, status, out_dir, journal)
+            counts[status] += 1
+            print(f"[{sum(counts.values())}] {result['run_id']}: {status}")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight = set()
+        for run in runs:
+            if len(in_flight) >= 2 * workers:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                finish(done)
+            in_flight.add(pool.submit(worker, run))
+        finish(wait(in_flight).done)
+    return counts["OK"], counts["ERROR"]
+
+
+def write_summary(phase, out_dir, journal):
+    """
+    Write the phase summary in matrix order from the journal (so resumed
+    and batch-collected runs are included). Returns (summary, path).
+    """
+    run_ids = [run.run_id for run in expand(phase)]
+    agg = SummaryAggregator(order=run_ids)
+    logged = journal.load()
+    for run_id in run_ids:
+        if run_id in logged:
+            agg.record(logged[run_id])
+    summary = agg.summary({"experiment": "PPH-001", "phase": PHASES[phase]["phase"] or phase})
+    summary_path = Path(out_dir) / f"PPH-001-{phase}-summary.json"
+    write_json(summary_path, summary)
+    return summary, summary_path
+
+
+def main(phase, out_dir=None, workers=1, resume=False, cache_mode="off", dry_run=False,
+         pool_size=None, timeout=None):
+    spec = PHASES[phase]
+    out_dir = Path(out_dir) if out_dir else RAW_ROOT / spec["raw_dir"]
+    journal = RunJournal(out_dir / f"PPH-001-{phase}-progress.jsonl")
+    RESPONSE_CACHE.mode = cache_mode
+    # One pooled connection per API call that can be in flight, so nobody queues for a slot
+    configure(pool_size=pool_size or max(1, min(workers, sum(MODEL_CONCURRENCY.values()))),
+              read_timeout=timeout)
+
+    runs = expand(phase)
+    if resume:
+        runs = (run for run in runs if not is_completed(load_run(out_dir / f"{run.run_id}.json")))
+
+    if dry_run:
+        n = 0
+        for n, run in enumerate(runs, 1):
+            print(f"{run.run_id:<48} {route(run)}")
+        print(f"\n{n}/{count(phase)} runs would be executed")
+        return
+
+    needs_key = any(r not in CLI_ROUTES for r in spec["routes"].values())
+    api_key = load_api_key() if needs_key else None
+    if needs_key and not api_key:
+        print("ERROR: OPENROUTER_API_KEY not found in environment or .env file.")
+        return
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    print("=" * 80)
+    print(f"PPH-001 {phase}: {count(phase)} runs")
+    print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Output:  {out_dir}")
+    print(f"Workers: {workers} (per model: {MODEL_CONCURRENCY})")
+    if cache_mode != "off":
+        print(f"Cache:   {cache_mode} ({RESPONSE_CACHE.dir})")
+    print("=" * 80)
+
+    ok, err = dispatch(runs, api_key, workers, out_dir, journal)
+
+    summary, summary_path = write_summary(phase, out_dir, journal)
+    print(f"\nThis session: {ok} OK, {err} ERROR")
+    print(f"Phase total:  {summary['successful']}/{count(phase)} OK")
+    print(f"Summary:      {summary_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PPH-001 matrix runner")
+    parser.add_argument("phase", choices=list(PHASES))
+    parser.add_argument("--out", help="Output directory (default: the phase's raw dir)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Concurrent runs (default: 1 = sequential)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip run_ids that already have a successful JSON in the output dir")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="List the runs that would execute without calling any model")
+    cache = parser.add_mutually_exclusive_group()
+    cache.add_argument("--cache", dest="cache_mode", action="store_const", const="use", default="off",
+                       help="Serve repeat T0 calls from the local response cache")
+    cache.add_argument("--refresh", dest="cache_mode", action="store_const", const="refresh",
+                       help="Call the API and overwrite cached T0 responses")
+    parser.add_argument("--pool-size", type=int, default=None,
+                        help="OpenRouter keep-alive connections (default: in-flight API calls allowed by --workers)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help=f"Seconds per OpenRouter socket read (default: {READ_TIMEOUT})")
+    args = parser.parse_args()
+
+    main(args.phase, args.out, args.workers, args.resume, args.cache_mode, args.dry_run,
+         args.pool_size, args.timeout)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+PPH Run Store
+SQLite index over the run JSONs in data/phase*/, with lazily loaded text.
+
+The `runs` table holds one compact row per run file: run_id, phase (the
+data directory name), model, scenario, condition, temperature and
+run_number. It is indexed on those columns, so selecting a group (e.g.
+all phase2a runs of one model and scenario) is a single indexed query
+that never opens a JSON. The full document sits in a separate `docs`
+table. It is parsed only when a field outside the index is read
+(full_response, prompt_text, reasoning_trace, scores, ...).
+
+sync() keeps the index current: it stats every PPH-*.json in a
+directory and re-parses only the files whose (mtime, size) changed.
+Rows for deleted files are dropped. Scorer outputs that live next to
+the runs (selfcheckgpt_*.json) are never read.
+
+Layout:
+    .cache/runs.sqlite     runs (index columns) + docs (raw JSON text)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Mapping
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_DIR = SCRIPT_DIR.parent
+
+DATA_DIR = REPO_DIR / "data"
+DB_PATH = REPO_DIR / ".cache" / "runs.sqlite"
+SCHEMA_VERSION = 1
+
+RUN_PREFIX = "PPH-"
+INDEX_FIELDS = ("run_id", "phase", "model", "scenario", "condition", "temperature", "run_number")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id          INTEGER PRIMARY KEY,
+    dir         TEXT NOT NULL,
+    file        TEXT NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    size        INTEGER NOT NULL,
+    run_id      TEXT NOT NULL,
+    phase       TEXT NOT NULL,
+    model       TEXT,
+    scenario    TEXT,
+    condition   TEXT,
+    temperature REAL,
+    run_number  INTEGER,
+    UNIQUE (dir, file)
+);
+CREATE TABLE IF NOT EXISTS docs (
+    id   INTEGER PRIMARY KEY REFERENCES runs(id) ON DELETE CASCADE,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_group ON runs (phase, model, scenario, run_number);
+CREATE INDEX IF NOT EXISTS runs_dir_group ON runs (dir, model, scenario, file);
+CREATE INDEX IF NOT EXISTS runs_run_id ON runs (run_id);
+CREATE INDEX IF NOT EXISTS runs_condition ON runs (phase, condition);
+"""
+
+
+class RunRecord(Mapping):
+    """
+    Read-only view of one run. Index fields are served from the row;
+    any other field loads and parses the stored document on first use.
+    `names` optionally renames keys (view key -> document field).
+    """
+
+    __slots__ = ("_store", "_id", "_row", "_names", "_doc")
+
+    def __init__(self, store, row_id: int, row: dict, names: dict = None):
+        self._store = store
+        self._id = row_id
+        self._row = row
+        self._names = names
+        self._doc = None
+
+    def document(self) -> dict:
+        """The full parsed run JSON."""
+        if self._doc is None:
+            self._doc = self._store.document(self._id)
+        return self._doc
+
+    def __getitem__(self, key):
+        field = self._names[key] if self._names is not None else key
+        if field in self._row:
+            return self._row[field]
+        return self.document()[field]
+
+    def __iter__(self):
+        if self._names is not None:
+            return iter(self._names)
+        return iter(self.document())
+
+    def __len__(self):
+        return len(self._names) if self._names is not None else len(self.document())
+
+    def __repr__(self):
+        return f"RunRecord({self._row['run_id']!r})"
+
+
+def _index_row(doc: dict, phase: str) -> tuple:
+    return (doc["run_id"], phase, doc.get("model"), doc.get("scenario"), doc.get("condition"),
+            doc.get("temperature"), doc.get("run_number", 0))
+
+
+class RunStore:
+    """Indexed, incrementally synced view of the run JSON files."""
+
+    def __init__(self, db_path=DB_PATH):
+        self.path = Path(db_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._db.executescript("DROP TABLE IF EXISTS docs; DROP TABLE IF EXISTS runs;")
+            self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def sync(self, data_dir) -> dict:
+        """
+        Bring the index for one directory up to date. Returns counts of
+        {"added", "updated", "removed", "unchanged"} files.
+        """
+        data_dir = Path(data_dir).resolve()
+        dir_key, phase = str(data_dir), data_dir.name
+        counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+
+        with self._lock, self._db:
+            known = {file: (row_id, mtime, size) for row_id, file, mtime, size in self._db.execute(
+                "SELECT id, file, mtime_ns, size FROM runs WHERE dir = ?", (dir_key,))}
+            seen = set()
+
+            with os.scandir(data_dir) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if not (name.startswith(RUN_PREFIX) and name.endswith(".json") and entry.is_file()):
+                        continue
+                    st = entry.stat()
+                    prev = known.get(name)
+                    if prev and prev[1:] == (st.st_mtime_ns, st.st_size):
+                        seen.add(name)
+                        counts["unchanged"] += 1
+                        continue
+                    try:
+                        with open(entry.path) as f:
+                            body = f.read()
+                        doc = json.loads(body)
+                    except (OSError, json.JSONDecodeError):
+                        continue  # half-written file; re-read on the next sync
+                    if not isinstance(doc, dict) or "run_id" not in doc:
+                        continue
+
+                    seen.add(name)
+                    fields = _index_row(doc, phase)
+                    if prev:
+                        self._db.execute(
+                            f"UPDATE runs SET mtime_ns=?, size=?, {', '.join(f'{c}=?' for c in INDEX_FIELDS)} "
+                            "WHERE id=?", (st.st_mtime_ns, st.st_size, *fields, prev[0]))
+                        self._db.execute("UPDATE docs SET body=? WHERE id=?", (body, prev[0]))
+                        counts["updated"] += 1
+                    else:
+                        cur = self._db.execute(
+                            f"INSERT INTO runs (dir, file, mtime_ns, size, {', '.join(INDEX_FIELDS)}) "
+                            f"VALUES (?, ?, ?, ?, {', '.join('?' * len(INDEX_FIELDS))})",
+                            (dir_key, name, st.st_mtime_ns, st.st_size, *fields))
+                        self._db.execute("INSERT INTO docs (id, body) VALUES (?, ?)", (cur.lastrowid, body))
+                        counts["added"] += 1
+
+            gone = [(known[f][0],) for f in known.keys() - seen]
+            self._db.executemany("DELETE FROM runs WHERE id = ?", gone)
+            counts["removed"] = len(gone)
+        return counts
+
+    def sync_all(self, data_root=DATA_DIR) -> dict:
+        """sync() every data/phase*/ directory."""
+        return {d.name: self.sync(d) for d in sorted(Path(data_root).glob("phase*")) if d.is_dir()}
+
+    def select(self, data_dir=None, names: dict = None, file_glob: str = None, **where) -> list[RunRecord]:
+        """
+        Runs matching equality filters on index fields (phase=, model=,
+        scenario=, condition=, temperature=, run_number=, run_id=),
+        optionally restricted to one synced directory and a filename
+        GLOB pattern (case-sensitive). Ordered by file name.
+        """
+        unknown = set(where) - set(INDEX_FIELDS)
+        if unknown:
+            raise ValueError(f"not an index field: {', '.join(sorted(unknown))}")
+        clauses, params = [], []
+        if data_dir is not None:
+            clauses.append("dir = ?")
+            params.append(str(Path(data_dir).resolve()))
+        if file_glob is not None:
+            clauses.append("file GLOB ?")
+            params.append(file_glob)
+        for col, value in where.items():
+            clauses.append(f"{col} = ?")
+            params.append(value)
+        sql = f"SELECT id, {', '.join(INDEX_FIELDS)} FROM runs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY file"
+
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [RunRecord(self, row[0], dict(zip(INDEX_FIELDS, row[1:])), names) for row in rows]
+
+    def document(self, row_id: int) -> dict:
+        """Parsed JSON document for one runs.id."""
+        with self._lock:
+            (body,) = self._db.execute("SELECT body FROM docs WHERE id = ?", (row_id,)).fetchone()
+        return json.loads(body)
+
+    def fingerprint(self, data_dir) -> str:
+        """sha1 over (file, mtime, size) of every indexed run in a directory."""
+        h = hashlib.sha1()
+        with self._lock:
+            for row in self._db.execute("SELECT file, mtime_ns, size FROM runs WHERE dir = ? ORDER BY file",
+                                        (str(Path(data_dir).resolve()),)):
+                h.update(f"{row[0]}\0{row[1]}\0{row[2]}\n".encode())
+        return h.hexdigest()
+
+    def counts(self) -> list[tuple]:
+        """(phase, runs) per indexed directory."""
+        with self._lock:
+            return self._db.execute("SELECT phase, COUNT(*) FROM runs GROUP BY dir ORDER BY phase").fetchall()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_store() -> RunStore:
+    """Process-wide store at DB_PATH."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = RunStore()
+        return _default
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PPH run store (SQLite index over data/phase*)")
+    parser.add_argument("--rebuild", action="store_true", help="Drop the index and re-read every file")
+    args = parser.parse_args()
+
+    if args.rebuild and DB_PATH.exists():
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{DB_PATH}{suffix}").unlink(missing_ok=True)
+
+    store = get_store()
+    start = time.perf_counter()
+    synced = store.sync_all()
+    elapsed = time.perf_counter() - start
+    for phase, c in synced.items():
+        print(f"{phase:<10} +{c['added']} ~{c['updated']} -{c['removed']} ={c['unchanged']}")
+    print(f"Synced in {elapsed * 1000:.1f} ms; {sum(n for _, n in store.counts())} runs indexed at {DB_PATH}")
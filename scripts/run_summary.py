@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+PPH Run Summary
+Incrementally maintained phase summaries (PPH-001-*-summary.json).
+
+SummaryAggregator holds one summary row per run_id plus running totals:
+OK/ERROR counts, word and token sums for OK runs, and a log-bucketed
+latency histogram for percentiles. record(row) is O(1). If a run_id was
+already recorded, its old contribution is subtracted first, so retries,
+resumes and block reruns replace rows instead of double counting.
+
+Rows are written in `order` (the runner's run list), with unknown
+run_ids after it. Percentiles come from the histogram, so they are
+accurate to one bucket (LATENCY_GROWTH, about 9%). Each bucket also keeps
+the slowest latency recorded into it, and the max is read from the
+highest non-empty bucket, so replacing the slowest run lowers it again
+(to within one bucket).
+
+update_file() patches an existing summary on disk. It takes an exclusive
+lock, loads the file, records the new rows and rewrites it atomically,
+so runners in separate processes can share one master summary.
+"""
+
+import fcntl
+import json
+import math
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+TOKEN_FIELDS = ("input_tokens", "output_tokens", "reasoning_tokens", "total_tokens")
+LATENCY_FLOOR = 0.01                # seconds; bucket 0 is everything below this
+LATENCY_GROWTH = 2 ** 0.125         # bucket width ratio
+PERCENTILES = (50, 90, 99)
+STANDARD_KEYS = ("completed", "total_runs", "successful", "failed", "aggregates", "runs")
+
+
+def latency_bucket(seconds: float) -> int:
+    if seconds <= LATENCY_FLOOR:
+        return 0
+    return 1 + int(math.log(seconds / LATENCY_FLOOR, LATENCY_GROWTH))
+
+
+def bucket_upper(bucket: int) -> float:
+    return LATENCY_FLOOR * LATENCY_GROWTH ** bucket
+
+
+class SummaryAggregator:
+    """Running phase totals over summary rows, keyed by run_id."""
+
+    def __init__(self, order: list = None):
+        self._pos = {run_id: i for i, run_id in enumerate(order or [])}
+        self._rows = {}
+        self._lock = threading.Lock()
+        self.ok = 0
+        self.error = 0
+        self.words = 0
+        self.tokens = dict.fromkeys(TOKEN_FIELDS, 0)
+        self._latency = {}          # bucket -> [count, slowest seconds recorded]
+
+    def _apply(self, row: dict, sign: int):
+        if row["status"] != "OK":
+            self.error += sign
+            return
+        self.ok += sign
+        self.words += sign * (row.get("response_words") or 0)
+        for field in TOKEN_FIELDS:
+            self.tokens[field] += sign * (row.get(field) or 0)
+        seconds = row.get("response_time_seconds")
+        if seconds is not None:
+            b = latency_bucket(seconds)
+            bucket = self._latency.setdefault(b, [0, 0.0])
+            bucket[0] += sign
+            if sign > 0:
+                bucket[1] = max(bucket[1], seconds)
+            elif not bucket[0]:
+                del self._latency[b]
+
+    def record(self, row: dict):
+        """Add or replace the row for row["run_id"]."""
+        with self._lock:
+            old = self._rows.get(row["run_id"])
+            if old is not None:
+                self._apply(old, -1)
+            self._rows[row["run_id"]] = row
+            self._apply(row, +1)
+
+    @property
+    def latency_max(self) -> float:
+        """Slowest OK latency, from the highest non-empty bucket."""
+        return self._latency[max(self._latency)][1] if self._latency else 0.0
+
+    def percentile(self, p: float) -> float | None:
+        """Approximate p-th percentile latency of OK runs (bucket upper bound)."""
+        total = sum(count for count, _ in self._latency.values())
+        if not total:
+            return None
+        rank = math.ceil(p / 100 * total)
+        seen = 0
+        for b in sorted(self._latency):
+            seen += self._latency[b][0]
+            if seen >= rank:
+                return round(min(bucket_upper(b), self.latency_max), 2)
+        return round(self.latency_max, 2)
+
+    def rows(self) -> list[dict]:
+        """Rows in run order; run_ids outside `order` follow in record order."""
+        end = len(self._pos)
+        keyed = [(self._pos.get(run_id, end), i, row) for i, (run_id, row) in enumerate(self._rows.items())]
+        return [row for _, _, row in sorted(keyed, key=lambda k: k[:2])]
+
+    def aggregates(self) -> dict:
+        latency = {f"p{p}": self.percentile(p) for p in PERCENTILES}
+        latency["max"] = round(self.latency_max, 2) if self.ok else None
+        return {
+            "response_words_total": self.words,
+            "response_words_mean": round(self.words / self.ok, 1) if self.ok else None,
+            "response_time_seconds": latency,
+            "tokens": dict(self.tokens),
+        }
+
+    def summary(self, header: dict = None, extra: dict = None) -> dict:
+        """
+        Summary JSON. `header` keys (experiment, phase, ...) come first,
+        then the standard counts, then `extra` keys such as runner flags.
+        """
+        with self._lock:
+            return {
+                **(header or {}),
+                "completed": datetime.now(timezone.utc).isoformat(),
+                "total_runs": self.ok + self.error,
+                "successful": self.ok,
+                "failed": self.error,
+                **(extra or {}),
+                "aggregates": self.aggregates(),
+                "runs": self.rows(),
+            }
+
+    @classmethod
+    def from_summary(cls, summary: dict) -> "SummaryAggregator":
+        """Aggregator seeded from an existing summary JSON, keeping its row order."""
+        rows = summary.get("runs", [])
+        agg = cls(order=[r["run_id"] for r in rows])
+        for row in rows:
+            agg.record(row)
+        return agg
+
+
+def write_json(path, data: dict):
+    """Write JSON via a temp file and rename, so readers never see a partial file."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _locked(path: Path):
+    with open(path.with_name(path.name + ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def update_file(path, rows: list[dict]) -> dict:
+    """
+    Record rows into the summary at path (which must exist) and rewrite
+    it. Other top-level keys keep their place before or after the counts.
+    Returns the new summary.
+    """
+    path = Path(path)
+    with _locked(path):
+        with open(path) as f:
+            current = json.load(f)
+        agg = SummaryAggregator.from_summary(current)
+        for row in rows:
+            agg.record(row)
+        keys = list(current)
+        split = keys.index("completed") if "completed" in keys else len(keys)
+        header = {k: current[k] for k in keys[:split] if k not in STANDARD_KEYS}
+        extra = {k: current[k] for k in keys[split:] if k not in STANDARD_KEYS}
+        summary = agg.summary(header, extra)
+        write_json(path, summary)
+    return summary
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+PPH Run Tables
+Columnar (Arrow / Parquet) export of every run and claim-level
+SelfCheckGPT result, for cross-phase analytics.
+
+Two tables, one Parquet file per phase directory:
+    runs     one row per run: identity columns, flattened metadata
+             (tokens, latency, finish_reason, model_returned) and flattened
+             scores. Keys that do not fit a declared column are kept as
+             JSON in *_extra.
+    claims   one row per claim in data/<phase>/selfcheckgpt_results*.json
+
+Low-cardinality text (phase, model, scenario, condition, ...) is
+dictionary-encoded. update() is incremental. A partition is only
+rewritten when the fingerprint of its source files (from the run store:
+file, mtime, size) differs from the one recorded in the manifest.
+
+load() concatenates the partitions into one pyarrow.Table. Groupbys
+then run vectorized, e.g.
+
+    runs = load("runs")
+    runs.group_by(["phase", "model"]).aggregate([("total_tokens", "sum")])
+
+Requires pyarrow (pip install pyarrow).
+
+Layout:
+    .cache/tables/manifest.json         {"runs/phase2a": fingerprint, ...}
+    .cache/tables/runs/<phase>.parquet
+    .cache/tables/claims/<phase>.parquet
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_DIR = SCRIPT_DIR.parent
+sys.path.insert(0, str(SCRIPT_DIR))
+
+from run_journal import ERROR_PREFIX
+from run_store import DATA_DIR, get_store
+
+TABLES_DIR = REPO_DIR / ".cache" / "tables"
+CLAIM_RESULTS_GLOB = "selfcheckgpt_results*.json"
+
+# (column, kind). Kinds: "dict" (dictionary-encoded string), "str",
+# "int", "float", "bool", "list" (list of strings).
+RUN_FIELDS = [
+    ("phase", "dict"),
+    ("run_id", "str"),
+    ("experiment", "dict"),
+    ("model", "dict"),
+    ("model_api_string", "dict"),
+    ("model_route", "dict"),
+    ("scenario", "dict"),
+    ("scenario_prior_strength", "dict"),
+    ("condition", "dict"),
+    ("temperature", "float"),
+    ("run_number", "int"),
+    ("escape_hatch", "bool"),
+    ("timestamp", "str"),
+    ("status", "dict"),
+]
+META_FIELDS = [
+    ("response_length_chars", "int"),
+    ("response_length_words", "int"),
+    ("response_time_seconds", "float"),
+    ("time_to_first_token_seconds", "float"),
+    ("tokens_per_second", "float"),
+    ("input_tokens", "int"),
+    ("output_tokens", "int"),
+    ("reasoning_tokens", "int"),
+    ("total_tokens", "int"),
+    ("finish_reason", "dict"),
+    ("model_returned", "dict"),
+    ("openrouter_generation_id", "str"),
+]
+SCORE_FIELDS = [
+    ("confabulation_count", "int"),
+    ("confabulations_listed", "list"),
+    ("confabulation_specificity_max", "int"),
+    ("prior_preservation", "dict"),
+    ("hedging_count", "int"),
+    ("direct_contradiction_acknowledged", "bool"),
+    ("did_refuse_or_flag_uncertainty", "bool"),
+    ("fabricated_specific_details", "bool"),
+]
+CLAIM_FIELDS = [
+    ("phase", "dict"),
+    ("source", "dict"),
+    ("n_reference", "int"),
+    ("group", "dict"),
+    ("model", "dict"),
+    ("scenario", "dict"),
+    ("claim_id", "str"),
+    ("run_id", "dict"),
+    ("claim_index", "int"),
+    ("start", "int"),
+    ("end", "int"),
+    ("sha1", "str"),
+    ("claim", "str"),
+    ("avg_bertscore", "float"),
+    ("n_samples_supporting", "int"),
+    ("n_samples_total", "int"),
+    ("support_rate", "float"),
+    ("selfcheckgpt_verdict", "dict"),
+    ("pph_ground_truth", "dict"),
+]
+
+RUNS_SCHEMA = RUN_FIELDS + META_FIELDS + SCORE_FIELDS + [("metadata_extra", "str"), ("scores_extra", "str")]
+CLAIMS_SCHEMA = CLAIM_FIELDS + [("claim_extra", "str")]
+
+
+def _coerce(kind: str, value):
+    """value converted to a column kind; raises TypeError/ValueError if it does not fit."""
+    if value is None:
+        return None
+    if kind in ("str", "dict"):
+        if isinstance(value, (dict, list)):
+            raise TypeError("not a scalar")
+        return str(value)
+    if kind == "int":
+        if isinstance(value, bool) or int(value) != value:
+            raise ValueError("not an integer")
+        return int(value)
+    if kind == "float":
+        if isinstance(value, bool):
+            raise TypeError("not a number")
+        return float(value)
+    if kind == "bool":
+        if not isinstance(value, bool):
+            raise TypeError("not a bool")
+        return value
+    if kind == "list":
+        if not isinstance(value, list):
+            raise TypeError("not a list")
+        return [v if isinstance(v, str) else json.dumps(v, ensure_ascii=False) for v in value]
+    raise ValueError(f"unknown column kind {kind!r}")
+
+
+def _flatten(row: dict, source: dict, fields: list) -> str | None:
+    """Copy declared fields from source into row. Returns leftovers as JSON (or None)."""
+    extra = {}
+    declared = dict(fields)
+    for key, value in source.items():
+        if key not in declared:
+            extra[key] = value
+            continue
+        try:
+            row[key] = _coerce(declared[key], value)
+        except (TypeError, ValueError):
+            extra[key] = value
+    return json.dumps(extra, ensure_ascii=False, sort_keys=True) if extra else None
+
+
+def flatten_run(doc: dict, phase: str) -> dict:
+    """One runs-table row (plain Python values) from a run JSON."""
+    row = {name: None for name, _ in RUNS_SCHEMA}
+    for name, kind in RUN_FIELDS:
+        try:
+            row[name] = _coerce(kind, doc.get(name))
+        except (TypeError, ValueError):
+            pass
+    row["phase"] = phase
+    row["run_number"] = row["run_number"] or 0
+    response = doc.get("full_response")
+    row["status"] = "OK" if isinstance(response, str) and not response.startswith(ERROR_PREFIX) else "ERROR"
+    row["metadata_extra"] = _flatten(row, doc.get("metadata") or {}, META_FIELDS)
+    row["scores_extra"] = _flatten(row, doc.get("scores") or {}, SCORE_FIELDS)
+    return row
+
+
+def flatten_claims(results: dict, phase: str, source: str) -> list[dict]:
+    """Claims-table rows from one selfcheckgpt_results*.json document."""
+    match = re.search(r"_n(\d+)$", source)
+    n_reference = int(match.group(1)) if match else None
+    rows = []
+    for group, res in sorted(results.items()):
+        if not isinstance(res, dict):
+            continue
+        for i, detail in enumerate(res.get("claim_details") or []):
+            row = {name: None for name, _ in CLAIMS_SCHEMA}
+            row.update(phase=phase, source=source, n_reference=n_reference, group=group,
+                       model=res.get("model"), scenario=res.get("scenario"), claim_index=i)
+            row["claim_extra"] = _flatten(row, detail, CLAIM_FIELDS)
+            rows.append(row)
+    return rows
+
+
+def to_table(rows: list[dict], schema: list):
+    """Column-major pyarrow.Table from row dicts, typed by schema."""
+    import pyarrow as pa
+
+    types = {"str": pa.string(), "int": pa.int64(), "float": pa.float64(),
+             "bool": pa.bool_(), "list": pa.list_(pa.string()), "dict": pa.string()}
+    arrays, fields = [], []
+    for name, kind in schema:
+        arr = pa.array([row[name] for row in rows], type=types[kind])
+        if kind == "dict":
+            arr = arr.dictionary_encode()
+        arrays.append(arr)
+        fields.append(pa.field(name, arr.type))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def _write(table, path: Path):
+    import pyarrow.parquet as pq
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".parquet.tmp")
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+
+
+def _claims_fingerprint(files: list) -> str:
+    h = hashlib.sha1()
+    for path in files:
+        st = path.stat()
+        h.update(f"{path.name}\0{st.st_mtime_ns}\0{st.st_size}\n".encode())
+    return h.hexdigest()
+
+
+def update(out_dir=TABLES_DIR, data_root=DATA_DIR, rebuild: bool = False) -> dict:
+    """
+    Bring every partition up to date. Returns {partition: "written" |
+    "unchanged" | "removed"}.
+    """
+    out_dir = Path(out_dir)
+    manifest_path = out_dir / "manifest.json"
+    manifest = {}
+    if not rebuild and manifest_path.exists():
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    store = get_store()
+    status, current = {}, {}
+    for phase_dir in sorted(Path(data_root).glob("phase*")):
+        if not phase_dir.is_dir():
+            continue
+        phase = phase_dir.name
+        store.sync(phase_dir)
+
+        key = f"runs/{phase}"
+        current[key] = store.fingerprint(phase_dir)
+        if manifest.get(key) == current[key] and (out_dir / f"{key}.parquet").exists():
+            status[key] = "unchanged"
+        else:
+            rows = [flatten_run(r.document(), phase) for r in store.select(phase_dir)]
+            _write(to_table(rows, RUNS_SCHEMA), out_dir / f"{key}.parquet")
+            status[key] = "written"
+
+        files = sorted(phase_dir.glob(CLAIM_RESULTS_GLOB))
+        if not files:
+            continue
+        key = f"claims/{phase}"
+        current[key] = _claims_fingerprint(files)
+        if manifest.get(key) == current[key] and (out_dir / f"{key}.parquet").exists():
+            status[key] = "unchanged"
+        else:
+            rows = []
+            for path in files:
+                with open(path) as f:
+                    rows.extend(flatten_claims(json.load(f), phase, path.stem))
+            _write(to_table(rows, CLAIMS_SCHEMA), out_dir / f"{key}.parquet")
+            status[key] = "written"
+
+    for key in manifest.keys() - current.keys():
+        (out_dir / f"{key}.parquet").unlink(missing_ok=True)
+        status[key] = "removed"
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tmp = manifest_path.with_suffix(".json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(current, f, indent=2, sort_keys=True)
+    os.replace(tmp, manifest_path)
+    return status
+
+
+def load(table: str = "runs", out_dir=TABLES_DIR):
+    """All partitions of one table as a single pyarrow.Table."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parts = [pq.read_table(p) for p in sorted((Path(out_dir) / table).glob("*.parquet"))]
+    if not parts:
+        schema = RUNS_SCHEMA if table == "runs" else CLAIMS_SCHEMA
+        return to_table([], schema)
+    return pa.concat_tables(parts).unify_dictionaries()
+
+
+def overview(runs, claims):
+    """Cross-phase groupbys printed by --show."""
+    import pyarrow.compute as pc
+
+    by_model = runs.group_by(["phase", "model"]).aggregate([
+        ("run_id", "count"),
+        ("response_length_words", "mean"),
+        ("response_time_seconds", "mean"),
+        ("total_tokens", "sum"),
+    ]).to_pylist()
+    print(f"{'phase':<10} {'model':<16} {'runs':>5} {'words':>7} {'latency':>8} {'tokens':>9}")
+    for r in sorted(by_model, key=lambda r: (r["phase"], r["model"] or "")):
+        print(f"{r['phase']:<10} {r['model']:<16} {r['run_id_count']:>5} "
+              f"{r['response_length_words_mean'] or 0:>7.0f} {r['response_time_seconds_mean'] or 0:>7.1f}s "
+              f"{r['total_tokens_sum'] or 0:>9}")
+
+    if claims.num_rows:
+        claims = claims.append_column(
+            "passed", pc.equal(claims["selfcheckgpt_verdict"].cast("string"), "LIKELY_FACTUAL"))
+        by_source = claims.group_by(["source", "model"]).aggregate([
+            ("claim", "count"), ("passed", "sum"), ("support_rate", "mean"),
+        ]).to_pylist()
+        print(f"\n{'source':<28} {'model':<16} {'claims':>6} {'passed':>6} {'support':>8}")
+        for r in sorted(by_source, key=lambda r: (r["source"], r["model"] or "")):
+            print(f"{r['source']:<28} {r['model']:<16} {r['claim_count']:>6} {r['passed_sum']:>6} "
+                  f"{r['support_rate_mean']:>8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PPH columnar run/claim tables (Parquet)")
+    parser.add_argument("--out-dir", default=str(TABLES_DIR), help="Table directory")
+    parser.add_argument("--rebuild", action="store_true", help="Rewrite every partition")
+    parser.add_argument("--show", action="store_true", help="Print cross-phase groupbys after updating")
+    args = parser.parse_args()
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        sys.exit("pyarrow is required: pip install pyarrow")
+
+    for key, state in sorted(update(args.out_dir, rebuild=args.rebuild).items()):
+        print(f"  {key:<24} {state}")
+    if args.show:
+        print()
+        overview(load("runs", args.out_dir), load("claims", args.out_dir))
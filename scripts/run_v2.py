@@ -1,22 +1,34 @@
 #!/usr/bin/env python3
 """PPH-001 Phase 1 Rerun: Deterministic baseline via OpenRouter API."""
 
+import argparse
+import asyncio
 import json
 import os
+import threading
 import time
-import urllib.request
 import urllib.error
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from pathlib import Path
 
+from openrouter_async import stream_chat
+from openrouter_client import READ_TIMEOUT, configure, post_json
+from rate_limit import get_limiter, estimate_tokens
+from response_cache import ResponseCache
+from run_journal import RunJournal, split_completed
+from run_summary import SummaryAggregator, write_json
+
 # -------------------------------------------------------------------
 # Config
 # -------------------------------------------------------------------
 RAW_DIR = Path.home() / "Documents" / "SeriesFusion" / "PPH-001" / "raw-v2"
 RAW_V1_DIR = Path.home() / "Documents" / "SeriesFusion" / "PPH-001" / "raw"
 ENV_FILE = Path.home() / "Documents" / "SeriesFusion" / "PPH-001" / ".env"
+JOURNAL_FILE = RAW_DIR / "PPH-001-v2-progress.jsonl"
 
-OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+# PPH_OPENROUTER_URL points the runner at a stand-in (e.g. mock_server.py)
+OPENROUTER_URL = os.environ.get("PPH_OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
 
 CLAUDE_MODEL = "anthropic/claude-opus-4.6"
 CLAUDE_FALLBACK = "anthropic/claude-opus-4-6"
@@ -24,8 +36,13 @@ GEMINI_MODEL = "google/gemini-3-pro-preview"
 GEMINI_FALLBACK = "google/gemini-3-pro"
 
 MAX_RETRIES = 3
-RETRY_DELAYS = [10, 20, 40]  # exponential backoff
-INTER_CALL_DELAY = 2
+RETRY_DELAYS = [10, 20, 40]  # exponential backoff (also 429s without rate-limit headers)
+
+# T0 response cache; mode set by --cache / --refresh
+RESPONSE_CACHE = ResponseCache()
+
+# Concurrent mode (--workers > 1): max in-flight calls per model
+MODEL_CONCURRENCY = {"CLAUDE": 4, "GEMINI": 4}
 
 # -------------------------------------------------------------------
 # Prompts — identical to Phase 1, zero modifications
@@ -166,8 +183,8 @@ def load_api_key():
     return None
 
 
-def call_openrouter(api_key, model_string, prompt_text, enable_reasoning):
-    """Make a single OpenRouter API call. Returns parsed response dict."""
+def build_request(api_key, model_string, prompt_text, enable_reasoning):
+    """OpenRouter (payload, headers) for one prompt."""
     payload = {
         "model": model_string,
         "temperature": 0.0,
@@ -178,22 +195,17 @@ def call_openrouter(api_key, model_string, prompt_text, enable_reasoning):
     if enable_reasoning:
         payload["reasoning"] = {"effort": "medium"}
 
-    body = json.dumps(payload).encode()
-
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
         "HTTP-Referer": "https://seriesfusion.com",
         "X-Title": "PPH-001-HypothesisEngine",
     }
+    return payload, headers
 
-    req = urllib.request.Request(OPENROUTER_URL, data=body, headers=headers, method="POST")
-
-    start = time.time()
-    with urllib.request.urlopen(req, timeout=120) as resp:
-        data = json.loads(resp.read().decode())
-    elapsed = time.time() - start
 
+def parse_response(data, model_string, elapsed, timings, cache_hit):
+    """Flatten a chat completion body into the fields execute_run records."""
     choice = data["choices"][0]
     message = choice["message"]
 
@@ -201,20 +213,81 @@ def call_openrouter(api_key, model_string, prompt_text, enable_reasoning):
         "content": message.get("content", ""),
         "reasoning_text": message.get("reasoning", None),
         "reasoning_details": message.get("reasoning_details", None),
-        "usage": data.get("usage", {}),
+        "usage": data.get("usage") or {},
         "elapsed": round(elapsed, 2),
         "model_returned": data.get("model", model_string),
         "finish_reason": choice.get("finish_reason", None),
         "generation_id": data.get("id", None),
+        "connect_seconds": timings["connect_seconds"],
+        "ttfb_seconds": timings.get("ttfb_seconds"),
+        "ttft_seconds": timings.get("ttft_seconds"),
+        "tokens_per_second": timings.get("tokens_per_second"),
+        "cache_hit": cache_hit,
     }
 
 
-def execute_run(run_def, api_key):
-    """Execute a single run with retries and fallback model strings."""
+def call_openrouter(api_key, model_string, prompt_text, enable_reasoning):
+    """Make a single OpenRouter API call. Returns parsed response dict."""
+    payload, headers = build_request(api_key, model_string, prompt_text, enable_reasoning)
+
+    cached = RESPONSE_CACHE.get(payload)
+    if cached is not None:
+        data, elapsed = cached["body"], cached["elapsed"]
+        timings = {"connect_seconds": 0.0, "ttfb_seconds": 0.0}
+    else:
+        # Shared token bucket replaces fixed inter-call sleeps
+        limiter = get_limiter("openrouter")
+        reserved = estimate_tokens(prompt_text, payload["max_tokens"])
+        limiter.acquire(reserved)
+
+        start = time.time()
+        try:
+            data, resp_headers, timings = post_json(OPENROUTER_URL, payload, headers)
+        except Exception:
+            limiter.settle(reserved, 0)     # nothing generated; hand the reservation back
+            raise
+        limiter.observe(resp_headers)
+        elapsed = time.time() - start - timings["queue_seconds"]     # waiting for a pool slot is not latency
+        limiter.settle(reserved, (data.get("usage") or {}).get("total_tokens", reserved))
+        RESPONSE_CACHE.put(payload, data, elapsed)
+
+    return parse_response(data, model_string, elapsed, timings, cached is not None)
+
+
+async def call_openrouter_async(api_key, model_string, prompt_text, enable_reasoning):
+    """call_openrouter() over a streaming request on the event loop."""
+    payload, headers = build_request(api_key, model_string, prompt_text, enable_reasoning)
+
+    # Cache and limiter state are locked files: touch them off the event loop
+    cached = await asyncio.to_thread(RESPONSE_CACHE.get, payload)
+    if cached is not None:
+        data, elapsed = cached["body"], cached["elapsed"]
+        timings = {"connect_seconds": 0.0}
+    else:
+        limiter = get_limiter("openrouter")
+        reserved = estimate_tokens(prompt_text, payload["max_tokens"])
+        await limiter.acquire_async(reserved)
+
+        start = time.time()
+        try:
+            data, resp_headers, timings = await stream_chat(OPENROUTER_URL, payload, headers)
+        except Exception:
+            await asyncio.to_thread(limiter.settle, reserved, 0)
+            raise
+        elapsed = time.time() - start
+        await asyncio.to_thread(limiter.observe, resp_headers)
+        await asyncio.to_thread(limiter.settle, reserved, (data.get("usage") or {}).get("total_tokens", reserved))
+        await asyncio.to_thread(RESPONSE_CACHE.put, payload, data, elapsed)
+
+    return parse_response(data, model_string, elapsed, timings, cached is not None)
+
+
+def new_result(run_def):
+    """Empty result record for a run definition."""
     run_id, scenario, prior_strength, condition, escape_hatch, model_key, prompt_text = run_def
     cfg = MODEL_CONFIG[model_key]
 
-    result = {
+    return {
         "experiment": "PPH-001",
         "phase": "1-rerun",
         "run_id": run_id,
@@ -237,6 +310,11 @@ def execute_run(run_def, api_key):
             "response_length_chars": 0,
             "response_length_words": 0,
             "response_time_seconds": 0.0,
+            "connect_time_seconds": 0.0,
+            "time_to_first_byte_seconds": 0.0,
+            "time_to_first_token_seconds": None,
+            "tokens_per_second": None,
+            "response_cache_hit": False,
             "input_tokens": 0,
             "output_tokens": 0,
             "reasoning_tokens": 0,
@@ -256,6 +334,75 @@ def execute_run(run_def, api_key):
         "scorer_notes": "",
     }
 
+
+def record_response(result, resp, model_string):
+    """Copy a call_openrouter(_async) response into the result record."""
+    content = resp["content"]
+    result["full_response"] = content
+    result["reasoning_trace"] = resp["reasoning_text"]
+    result["reasoning_details_raw"] = resp["reasoning_details"]
+    result["model_api_string"] = model_string
+
+    usage = resp["usage"]
+    result["metadata"]["response_length_chars"] = len(content)
+    result["metadata"]["response_length_words"] = len(content.split())
+    result["metadata"]["response_time_seconds"] = resp["elapsed"]
+    result["metadata"]["connect_time_seconds"] = resp["connect_seconds"]
+    result["metadata"]["time_to_first_byte_seconds"] = resp["ttfb_seconds"]
+    result["metadata"]["time_to_first_token_seconds"] = resp.get("ttft_seconds")
+    result["metadata"]["tokens_per_second"] = resp.get("tokens_per_second")
+    result["metadata"]["response_cache_hit"] = resp["cache_hit"]
+    result["metadata"]["input_tokens"] = usage.get("prompt_tokens", 0)
+    result["metadata"]["output_tokens"] = usage.get("completion_tokens", 0)
+    result["metadata"]["reasoning_tokens"] = usage.get("reasoning_tokens", 0)
+    result["metadata"]["total_tokens"] = usage.get("total_tokens", 0)
+    result["metadata"]["openrouter_generation_id"] = resp["generation_id"]
+    result["metadata"]["finish_reason"] = resp["finish_reason"]
+    result["metadata"]["model_returned"] = resp["model_returned"]
+
+    reasoning_count = usage.get("reasoning_tokens", 0)
+    words = len(content.split())
+    print(f"OK ({resp['elapsed']}s, {words} words, {reasoning_count} reasoning tokens)")
+
+
+def handle_http_error(e, cfg, model_string, attempt):
+    """
+    Log an HTTP error and decide what the retry loop does next. Returns
+    (last_error, action) with action "fallback" (next model string),
+    "rate_limited" (route already blocked, retry now) or "retry".
+    """
+    error_body = ""
+    try:
+        error_body = e.read().decode()[:500]
+    except Exception:
+        pass
+    last_error = f"HTTP {e.code}: {error_body}"
+    print(f"FAILED: {last_error}")
+
+    # Model not found — try fallback
+    if e.code == 404 and model_string == cfg["model"] and cfg["fallback"]:
+        print(f"  Model not found, trying fallback: {cfg['fallback']}")
+        return last_error, "fallback"
+
+    # Rate limited: block the shared route; the next acquire() waits
+    if e.code == 429:
+        limiter = get_limiter("openrouter")
+        retry_after = limiter.observe(e.headers)
+        if not retry_after:
+            retry_after = RETRY_DELAYS[attempt]
+            limiter.penalize(retry_after)
+        print(f"  Rate limited. Route blocked for {retry_after:.0f}s...")
+        return last_error, "rate_limited"
+
+    return last_error, "retry"
+
+
+def execute_run(run_def, api_key):
+    """Execute a single run with retries and fallback model strings."""
+    run_id, prompt_text = run_def[0], run_def[6]
+    cfg = MODEL_CONFIG[run_def[5]]
+    result = new_result(run_def)
+
     models_to_try = [cfg["model"]]
     if cfg["fallback"]:
         models_to_try.append(cfg["fallback"])
@@ -267,56 +414,14 @@ def execute_run(run_def, api_key):
                 print(f"  Attempt {attempt+1}/{MAX_RETRIES} ({model_string})...", end=" ", flush=True)
 
                 resp = call_openrouter(api_key, model_string, prompt_text, cfg["enable_reasoning"])
-
-                content = resp["content"]
-                result["full_response"] = content
-                result["reasoning_trace"] = resp["reasoning_text"]
-                result["reasoning_details_raw"] = resp["reasoning_details"]
-                result["model_api_string"] = model_string
-
-                usage = resp["usage"]
-                result["metadata"]["response_length_chars"] = len(content)
-                result["metadata"]["response_length_words"] = len(content.split())
-                result["metadata"]["response_time_seconds"] = resp["elapsed"]
-                result["metadata"]["input_tokens"] = usage.get("prompt_tokens", 0)
-                result["metadata"]["output_tokens"] = usage.get("completion_tokens", 0)
-                result["metadata"]["reasoning_tokens"] = usage.get("reasoning_tokens", 0)
-                result["metadata"]["total_tokens"] = usage.get("total_tokens", 0)
-                result["metadata"]["openrouter_generation_id"] = resp["generation_id"]
-                result["metadata"]["finish_reason"] = resp["finish_reason"]
-                result["metadata"]["model_returned"] = resp["model_returned"]
-
-                reasoning_count = usage.get("reasoning_tokens", 0)
-                words = len(content.split())
-                print(f"OK ({resp['elapsed']}s, {words} words, {reasoning_count} reasoning tokens)")
+                record_response(result, resp, model_string)
                 return result, "OK"
 
             except urllib.error.HTTPError as e:
-                error_body = ""
-                try:
-                    error_body = e.read().decode()[:500]
-                except Exception:
-                    pass
-                last_error = f"HTTP {e.code}: {error_body}"
-                print(f"FAILED: {last_error}")
-
-                # Model not found — try fallback
-                if e.code == 404 and model_string == cfg["model"] and cfg["fallback"]:
-                    print(f"  Model not found, trying fallback: {cfg['fallback']}")
+                last_error, action = handle_http_error(e, cfg, model_string, attempt)
+                if action == "fallback":
                     break  # break retry loop, try next model string
-
-                # Rate limited
-                if e.code == 429:
-                    retry_after = 60
-                    try:
-                        retry_after = int(e.headers.get("Retry-After", 60))
-                    except (ValueError, TypeError):
-                        pass
-                    print(f"  Rate limited. Waiting {retry_after}s...")
-                    time.sleep(retry_after)
-                    continue
-
-                if attempt < MAX_RETRIES - 1:
+                if action == "retry" and attempt < MAX_RETRIES - 1:
                     delay = RETRY_DELAYS[attempt]
                     print(f"  Retrying in {delay}s...")
                     time.sleep(delay)
@@ -335,6 +440,44 @@ def execute_run(run_def, api_key):
     return result, "ERROR"
 
 
+async def execute_run_async(run_def, api_key):
+    """execute_run() on the event loop: streaming calls, non-blocking backoff."""
+    run_id, prompt_text = run_def[0], run_def[6]
+    cfg = MODEL_CONFIG[run_def[5]]
+    result = new_result(run_def)
+
+    models_to_try = [cfg["model"]]
+    if cfg["fallback"]:
+        models_to_try.append(cfg["fallback"])
+
+    last_error = None
+    for model_string in models_to_try:
+        for attempt in range(MAX_RETRIES):
+            try:
+                print(f"  {run_id} attempt {attempt+1}/{MAX_RETRIES} ({model_string})...", end=" ", flush=True)
+
+                resp = await call_openrouter_async(api_key, model_string, prompt_text, cfg["enable_reasoning"])
+                record_response(result, resp, model_string)
+                return result, "OK"
+
+            except urllib.error.HTTPError as e:
+                last_error, action = await asyncio.to_thread(handle_http_error, e, cfg, model_string, attempt)
+                if action == "fallback":
+                    break
+                if action == "retry" and attempt < MAX_RETRIES - 1:
+                    await asyncio.sleep(RETRY_DELAYS[attempt])
+
+            except Exception as e:
+                last_error = str(e)
+                print(f"FAILED: {last_error}")
+                if attempt < MAX_RETRIES - 1:
+                    await asyncio.sleep(RETRY_DELAYS[attempt])
+
+    result["full_response"] = f"ERROR after all retries: {last_error}"
+    print(f"  GIVING UP on {run_id}")
+    return result, "ERROR"
+
+
 def check_deepseek_reasoning():
     """Check Phase 1 DeepSeek files for reasoning token presence."""
     print("\n--- Phase 1 DeepSeek Reasoning Check ---")
@@ -358,48 +501,143 @@ def check_deepseek_reasoning():
     return "CAPTURED" if has_reasoning else "MISSING"
 
 
-def main():
-    RAW_DIR.mkdir(parents=True, exist_ok=True)
-
-    api_key = load_api_key()
-    if not api_key:
-        print("ERROR: OPENROUTER_API_KEY not found in environment or .env file.")
-        print("Cannot proceed. Set the key and rerun.")
-        return
-
-    print("=" * 80)
-    print("PPH-001 Phase 1 Rerun: Deterministic Baseline (OpenRouter API)")
-    print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"Output:  {RAW_DIR}")
-    print(f"Models:  Claude={CLAUDE_MODEL}, Gemini={GEMINI_MODEL}")
-    print(f"Temp:    0.0 (all models)")
-    print("=" * 80)
-
-    summary_rows = []
-
-    for i, run_def in enumerate(RUNS):
-        run_id = run_def[0]
-        print(f"\n[{i+1}/12] {run_id}")
+def summary_row(result, status):
+    """Summary row for one run result."""
+    return {
+        "run_id": result["run_id"],
+        "status": status,
+        "response_words": result["metadata"]["response_length_words"],
+        "response_time_seconds": result["metadata"]["response_time_seconds"],
+        "total_tokens": result["metadata"].get("total_tokens"),
+        "reasoning_tokens": result["metadata"]["reasoning_tokens"],
+        "model_returned": result["metadata"]["model_returned"],
+    }
 
-        result, status = execute_run(run_def, api_key)
 
-        # Save individual JSON
-        out_path = RAW_DIR / f"{run_id}.json"
-        with open(out_path, "w") as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
+def save_run(result, status, journal=None):
+    """Write one run JSON to RAW_DIR, journal it, and return its summary row."""
+    out_path = RAW_DIR / f"{result['run_id']}.json"
+    with open(out_path, "w") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+    row = summary_row(result, status)
+    if journal is not None:
+        journal.append(row)
+    return row
+
+
+def run_concurrent(runs, api_key, workers, journal=None):
+    """
+    Execute runs on a bounded thread pool. MODEL_CONCURRENCY caps in-flight
+    calls per model; retries, fallback and 429 handling stay in execute_run.
+    Each JSON is written as soon as its run finishes; summary rows come back
+    in the original run order.
+    """
+    limits = {key: threading.Semaphore(n) for key, n in MODEL_CONCURRENCY.items()}
+
+    def worker(run_def):
+        with limits[run_def[5]]:
+            return execute_run(run_def, api_key)
+
+    rows = [None] * len(runs)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(worker, run_def): i for i, run_def in enumerate(runs)}
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            result, status = future.result()
+            rows[i] = save_run(result, status, journal)
+            print(f"\n[{done}/{len(runs)}] {runs[i][0]}: {status}")
+    return rows
+
+
+def run_async(runs, api_key, max_in_flight, journal=None):
+    """
+    Execute runs as streaming requests on one event loop, at most
+    max_in_flight at a time. The shared rate limiter still paces calls.
+    Summary rows come back in the original run order.
+    """
+    async def run_all():
+        slots = asyncio.Semaphore(max_in_flight)
+
+        async def one(i, run_def):
+            async with slots:
+                return i, await execute_run_async(run_def, api_key)
+
+        rows = [None] * len(runs)
+        tasks = [one(i, run_def) for i, run_def in enumerate(runs)]
+        for done, task in enumerate(asyncio.as_completed(tasks), 1):
+            i, (result, status) = await task
+            rows[i] = save_run(result, status, journal)
+            ttft = result["metadata"]["time_to_first_token_seconds"]
+            ttft = f", ttft {ttft:.2f}s" if ttft is not None else ""
+            print(f"\n[{done}/{len(runs)}] {runs[i][0]}: {status}{ttft}")
+        return rows
+
+    return asyncio.run(run_all())
+
+
+def main(workers=1, resume=False, rebuild_summary=False, cache_mode="off", async_streams=0,
+         pool_size=None, timeout=None):
+    RAW_DIR.mkdir(parents=True, exist_ok=True)
+    RESPONSE_CACHE.mode = cache_mode
+    # One pooled connection per API call that can be in flight, so nobody queues for a slot
+    configure(pool_size=pool_size or max(1, min(workers, sum(MODEL_CONCURRENCY.values()))),
+              read_timeout=timeout)
+    journal = RunJournal(JOURNAL_FILE)
+    agg = SummaryAggregator(order=[run_def[0] for run_def in RUNS])
+
+    if rebuild_summary:
+        # No API calls: summary comes from the progress journal alone
+        logged = journal.load()
+        for run_def in RUNS:
+            if run_def[0] in logged:
+                agg.record(logged[run_def[0]])
+        print(f"Rebuilding summary from {JOURNAL_FILE} ({agg.ok + agg.error}/{len(RUNS)} runs logged)")
+    else:
+        api_key = load_api_key()
+        if not api_key:
+            print("ERROR: OPENROUTER_API_KEY not found in environment or .env file.")
+            print("Cannot proceed. Set the key and rerun.")
+            return
+
+        print("=" * 80)
+        print("PPH-001 Phase 1 Rerun: Deterministic Baseline (OpenRouter API)")
+        print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"Output:  {RAW_DIR}")
+        print(f"Models:  Claude={CLAUDE_MODEL}, Gemini={GEMINI_MODEL}")
+        print(f"Temp:    0.0 (all models)")
+        if async_streams:
+            print(f"Async:   {async_streams} streaming requests in flight")
+        elif workers > 1:
+            print(f"Workers: {workers} (per model: {MODEL_CONCURRENCY})")
+        if cache_mode != "off":
+            print(f"Cache:   {cache_mode} ({RESPONSE_CACHE.dir})")
+
+        runs = RUNS
+        if resume:
+            runs, completed = split_completed(RUNS, RAW_DIR)
+            logged = journal.load()
+            for run_id, result in completed.items():
+                row = logged.get(run_id)
+                agg.record(row if row and row["status"] == "OK" else summary_row(result, "OK"))
+            print(f"Resume:  {len(completed)} completed, {len(runs)} to run")
+        print("=" * 80)
+
+        if async_streams:
+            for row in run_async(runs, api_key, async_streams, journal):
+                agg.record(row)
+        elif workers > 1:
+            for row in run_concurrent(runs, api_key, workers, journal):
+                agg.record(row)
+        else:
+            for i, run_def in enumerate(runs):
+                run_id = run_def[0]
+                print(f"\n[{i+1}/{len(runs)}] {run_id}")
 
-        summary_rows.append({
-            "run_id": run_id,
-            "status": status,
-            "response_words": result["metadata"]["response_length_words"],
-            "response_time_seconds": result["metadata"]["response_time_seconds"],
-            "reasoning_tokens": result["metadata"]["reasoning_tokens"],
-            "model_returned": result["metadata"]["model_returned"],
-        })
+                result, status = execute_run(run_def, api_key)
+                agg.record(save_run(result, status, journal))
 
-        # Rate limiting
-        if i < len(RUNS) - 1:
-            time.sleep(INTER_CALL_DELAY)
+    summary_rows = agg.rows()
 
     # Summary table
     print("\n" + "=" * 80)
@@ -429,28 +667,42 @@ def main():
         print("  No runs returned reasoning tokens.")
 
     # Save summary JSON
-    summary = {
-        "experiment": "PPH-001",
-        "phase": "1-rerun",
-        "completed": datetime.now(timezone.utc).isoformat(),
-        "total_runs": len(summary_rows),
-        "successful": sum(1 for r in summary_rows if r["status"] == "OK"),
-        "failed": sum(1 for r in summary_rows if r["status"] == "ERROR"),
-        "runs": summary_rows,
-    }
-    with open(RAW_DIR / "PPH-001-v2-summary.json", "w") as f:
-        json.dump(summary, f, indent=2)
+    summary = agg.summary({"experiment": "PPH-001", "phase": "1-rerun"})
+    write_json(RAW_DIR / "PPH-001-v2-summary.json", summary)
+
+    if RESPONSE_CACHE.hits or RESPONSE_CACHE.stores:
+        print(f"\nResponse cache: {RESPONSE_CACHE.hits} hits, {RESPONSE_CACHE.stores} stored")
 
     # Check Phase 1 DeepSeek
     ds_status = check_deepseek_reasoning()
 
-    ok = sum(1 for r in summary_rows if r["status"] == "OK")
-    err = sum(1 for r in summary_rows if r["status"] == "ERROR")
-    print(f"\nResults: {ok} OK, {err} ERROR")
+    print(f"\nResults: {agg.ok} OK, {agg.error} ERROR")
     print(f"\nPhase 1 rerun complete. 12 deterministic runs saved to {RAW_DIR}.")
     print(f"DeepSeek reasoning status: {ds_status}.")
     print("Bring results to Claude for scoring and cross-phase comparison.")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="PPH-001 Phase 1 Rerun (OpenRouter)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Concurrent API calls (default: 1 = sequential)")
+    parser.add_argument("--async", dest="async_streams", type=int, default=0, metavar="N",
+                        help="Stream responses on an event loop, N requests in flight "
+                             "(records time-to-first-token and tokens/sec)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip run_ids that already have a successful JSON in RAW_DIR")
+    parser.add_argument("--rebuild-summary", action="store_true",
+                        help="Rewrite the summary from the progress journal without calling any model")
+    cache = parser.add_mutually_exclusive_group()
+    cache.add_argument("--cache", dest="cache_mode", action="store_const", const="use", default="off",
+                       help="Serve repeat T0 calls from the local response cache")
+    cache.add_argument("--refresh", dest="cache_mode", action="store_const", const="refresh",
+                       help="Call the API and overwrite cached T0 responses")
+    parser.add_argument("--pool-size", type=int, default=None,
+                        help="OpenRouter keep-alive connections (default: in-flight API calls allowed by --workers)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help=f"Seconds per OpenRouter socket read (default: {READ_TIMEOUT})")
+    args = parser.parse_args()
+
+    main(args.workers, args.resume, args.rebuild_summary, args.cache_mode, args.async_streams,
+         args.pool_size, args.timeout)
@@ -24,63 +24,49 @@ same core logic.
 """
 
 import json
-import os
 import sys
 import argparse
 import re
-from pathlib import Path
 from collections import defaultdict
 
+from claims import DEFAULT_MODE as DEFAULT_SEGMENTER, MODES as SEGMENTER_MODES
+from claims import claim_refs, extract_claims, without_text
+from run_store import get_store
 
-def load_stochastic_runs(data_dir: str) -> dict:
-    """Load all Phase 2A stochastic JSON files, grouped by model+scenario."""
-    groups = defaultdict(list)
-    
-    for fname in sorted(os.listdir(data_dir)):
-        if not fname.startswith("PPH-001-") or "STOCH" not in fname:
-            continue
-        if not fname.endswith(".json"):
-            continue
-        
-        fpath = os.path.join(data_dir, fname)
-        with open(fpath) as f:
-            data = json.load(f)
-        
-        key = f"{data['model']}_{data['scenario']}"
-        groups[key].append({
-            "run_id": data["run_id"],
-            "run_number": data.get("run_number", 0),
-            "response": data["full_response"],
-            "prompt": data["prompt_text"],
-            "model": data["model"],
-            "scenario": data["scenario"],
-        })
-    
-    return dict(groups)
+
+STOCH_FIELDS = {
+    "run_id": "run_id",
+    "run_number": "run_number",
+    "response": "full_response",
+    "prompt": "prompt_text",
+    "model": "model",
+    "scenario": "scenario",
+}
 
 
-def extract_claims(response: str) -> list[str]:
+def load_stochastic_runs(data_dir: str) -> dict:
     """
-    Extract individual analytical claims from a model response.
-    Splits on sentence boundaries, filters out headers/short fragments.
+    Load all Phase 2A stochastic runs, grouped by model+scenario.
+
+    Runs come from the run store index; response and prompt text are
+    only read from the store when a run's "response"/"prompt" is used.
     """
-    # Remove markdown headers
-    text = re.sub(r'^#+\s+.*$', '', response, flags=re.MULTILINE)
-    # Split into sentences
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    # Filter: keep substantive claims (>20 chars, not just formatting)
-    claims = []
-    for s in sentences:
-        s = s.strip()
-        if len(s) > 20 and not s.startswith("|") and not s.startswith("-"):
-            claims.append(s)
-    return claims
+    store = get_store()
+    store.sync(data_dir)
+    groups = defaultdict(list)
+    for run in store.select(data_dir, names=STOCH_FIELDS, file_glob="PPH-001-*STOCH*.json"):
+        groups[f"{run['model']}_{run['scenario']}"].append(run)
+    return dict(groups)
 
 
 def selfcheck_bertscore_consistency(
     claims: list[str],
     other_responses: list[str],
-    use_gpu: bool = False
+    use_gpu: bool = False,
+    store=None,
+    segmenter: str = None,
+    index=None,
+    reference_run_ids: list = None
 ) -> list[dict]:
     """
     Core SelfCheckGPT logic (BERTScore variant):
@@ -91,49 +77,76 @@ def selfcheck_bertscore_consistency(
     SelfCheckGPT interprets high consistency as LIKELY FACTUAL.
     
     We predict: PPH confabulations will score as high-consistency.
+
+    Embeddings come from the on-disk EmbeddingStore; the model is only
+    loaded for sentences that are not cached yet.
+
+    With a ClaimIndex (and the references' run_ids), support comes from
+    approximate top-k lookups. Claim x reference pairs the lookup missed
+    are filled from the exact matmul, so a reference is never scored 0
+    just because its claims sat in unprobed cells.
     """
     try:
-        from sentence_transformers import SentenceTransformer, util
-        model = SentenceTransformer('all-MiniLM-L6-v2')
+        import numpy as np
+        from embedding_store import EmbeddingStore
+        from similarity import max_support_scores
+        if store is None:
+            store = EmbeddingStore()
         
         # Encode all claims
-        claim_embeddings = model.encode(claims, convert_to_tensor=True)
-        
-        results = []
-        for i, claim in enumerate(claims):
-            support_scores = []
-            
-            for other_resp in other_responses:
-                other_sentences = extract_claims(other_resp)
-                if not other_sentences:
-                    continue
-                
-                other_embeddings = model.encode(other_sentences, convert_to_tensor=True)
-                # Max similarity between this claim and any sentence in the other response
-                cosine_scores = util.cos_sim(claim_embeddings[i:i+1], other_embeddings)
-                max_sim = float(cosine_scores.max())
-                support_scores.append(max_sim)
-            
-            avg_support = sum(support_scores) / len(support_scores) if support_scores else 0
-            n_supporting = sum(1 for s in support_scores if s > 0.65)  # threshold
-            
-            results.append({
-                "claim": claim[:120] + "..." if len(claim) > 120 else claim,
-                "avg_bertscore": round(avg_support, 3),
-                "n_samples_supporting": n_supporting,
-                "n_samples_total": len(support_scores),
-                "support_rate": round(n_supporting / len(support_scores), 2) if support_scores else 0,
-                "selfcheckgpt_verdict": "LIKELY_FACTUAL" if avg_support > 0.65 else "LIKELY_HALLUCINATION",
-                "pph_ground_truth": "UNKNOWN"  # to be filled by manual review
-            })
-        
-        return results
+        claim_embeddings = store.encode(claims)
+
+        # Split each reference once for the whole group (empty ones carry no column)
+        reference_sentences = []
+        run_ids = []
+        for other_resp, run_id in zip(other_responses, reference_run_ids or [None] * len(other_responses)):
+            other_sentences = extract_claims(other_resp, segmenter)
+            if other_sentences:
+                reference_sentences.append(other_sentences)
+                run_ids.append(run_id)
+
+        if index is not None and reference_run_ids:
+            support_matrix = index.run_support(claim_embeddings, run_ids)
+            for j, other_sentences in enumerate(reference_sentences):
+                missed = np.isnan(support_matrix[:, j])
+                if missed.any():
+                    support_matrix[missed, j] = max_support_scores(
+                        claim_embeddings[missed], [store.encode(other_sentences)])[:, 0]
+            return _support_results(claims, support_matrix)
+
+        reference_embeddings = [store.encode(other_sentences) for other_sentences in reference_sentences]
+
+        # One claims x sentences matmul, max per reference
+        support_matrix = max_support_scores(claim_embeddings, reference_embeddings)
+        return _support_results(claims, support_matrix)
         
     except ImportError:
         print("sentence-transformers not installed. Using keyword fallback.")
         return selfcheck_keyword_fallback(claims, other_responses)
 
 
+def _support_results(claims: list[str], support_matrix) -> list[dict]:
+    """Per-claim verdicts from a (claims x references) max-support matrix."""
+    results = []
+    for i, claim in enumerate(claims):
+        support_scores = [float(s) for s in support_matrix[i]]
+        
+        avg_support = sum(support_scores) / len(support_scores) if support_scores else 0
+        n_supporting = sum(1 for s in support_scores if s > 0.65)  # threshold
+        
+        results.append({
+            "claim": claim[:120] + "..." if len(claim) > 120 else claim,
+            "avg_bertscore": round(avg_support, 3),
+            "n_samples_supporting": n_supporting,
+            "n_samples_total": len(support_scores),
+            "support_rate": round(n_supporting / len(support_scores), 2) if support_scores else 0,
+            "selfcheckgpt_verdict": "LIKELY_FACTUAL" if avg_support > 0.65 else "LIKELY_HALLUCINATION",
+            "pph_ground_truth": "UNKNOWN"  # to be filled by manual review
+        })
+    
+    return results
+
+
 def selfcheck_keyword_fallback(
     claims: list[str],
     other_responses: list[str]
@@ -169,7 +182,65 @@ def selfcheck_keyword_fallback(
     return results
 
 
-def run_test(data_dir: str, output_path: str, n_reference: int = 5):
+def score_group(task: tuple) -> dict:
+    """
+    SelfCheckGPT verdicts for one group (a shard_map task).
+
+    task: (runs, n_reference, segmenter, use_index) where runs are plain
+    dicts with the STOCH_FIELDS keys, target first.
+    """
+    runs, n_reference, segmenter, use_index = task
+    try:
+        from shard_pool import worker_store, worker_state
+        store = worker_store()
+    except ImportError:
+        store = None
+
+    index = None
+    if use_index and store is not None:
+        from claim_index import ClaimIndex, DEFAULT_INDEX_DIR
+        index = worker_state(("claim_index", segmenter),
+                             lambda: ClaimIndex(DEFAULT_INDEX_DIR, store.model_name, segmenter))
+
+    # Target = first run, references = next N runs
+    target = runs[0]
+    references = [r["response"] for r in runs[1:n_reference+1]]
+
+    # Extract claims from target, with stable IDs for joining scorer outputs
+    refs = claim_refs(target["run_id"], target["response"], segmenter)
+    claims = [ref["text"] for ref in refs]
+
+    # One encode call for every sentence of the group, in this worker
+    if store is not None:
+        try:
+            store.prefetch(claims + [s for resp in references for s in extract_claims(resp, segmenter)])
+        except ImportError:
+            pass        # selfcheck_bertscore_consistency falls back to keyword overlap
+
+    # Run consistency check
+    results = selfcheck_bertscore_consistency(
+        claims, references, store=store, segmenter=segmenter, index=index,
+        reference_run_ids=[r["run_id"] for r in runs[1:n_reference+1]])
+    results = [{**without_text(ref), **r} for ref, r in zip(refs, results)]
+
+    n_factual = sum(1 for r in results if r["selfcheckgpt_verdict"] == "LIKELY_FACTUAL")
+    n_halluc = sum(1 for r in results if r["selfcheckgpt_verdict"] == "LIKELY_HALLUCINATION")
+    return {
+        "model": target["model"],
+        "scenario": target["scenario"],
+        "target_run_id": target["run_id"],
+        "segmenter": segmenter or DEFAULT_SEGMENTER,
+        "support": "index" if index is not None else "exact",
+        "n_claims": len(claims),
+        "n_passed_as_factual": n_factual,
+        "n_flagged_as_hallucination": n_halluc,
+        "pass_rate": round(n_factual / max(len(results), 1), 3),
+        "claim_details": results
+    }
+
+
+def run_test(data_dir: str, output_path: str, n_reference: int = 5, cache_dir: str = None,
+             segmenter: str = None, use_index: bool = False, workers: int = 1):
     """
     Main test runner.
     
@@ -178,6 +249,9 @@ def run_test(data_dir: str, output_path: str, n_reference: int = 5):
     2. Use next n_reference responses as the "sample pool" 
     3. Run SelfCheckGPT consistency check on target claims
     4. Report which confabulations pass as "factual"
+
+    Groups are scored by score_group, spread over `workers` processes
+    (see shard_pool); reports print in group order once all are done.
     """
     groups = load_stochastic_runs(data_dir)
     
@@ -186,6 +260,28 @@ def run_test(data_dir: str, output_path: str, n_reference: int = 5):
         print("Expected files like: PPH-001-ECON-SEVERE-CLAUDE-T07-STOCH-01.json")
         sys.exit(1)
     
+    from shard_pool import local_store, shard_map
+    store = None
+    try:
+        store = local_store(cache_dir)
+    except ImportError:
+        pass
+
+    if use_index and store is not None:
+        from claim_index import ClaimIndex, DEFAULT_INDEX_DIR
+        index = ClaimIndex(DEFAULT_INDEX_DIR, store.model_name, segmenter)
+        try:
+            added = index.add_runs([r for runs in groups.values() for r in runs], store)
+            print(f"Claim index: {index.stats()} ({added} added)")
+        except ImportError:
+            print("sentence-transformers not installed. Scoring without the claim index.")
+            use_index = False
+
+    keys = [k for k in sorted(groups) if len(groups[k]) >= n_reference + 1]
+    tasks = [([{f: r[f] for f in STOCH_FIELDS} for r in groups[k][:n_reference+1]],
+              n_reference, segmenter, use_index) for k in keys]
+    scored = dict(zip(keys, shard_map(score_group, tasks, workers, cache_dir)))
+
     all_results = {}
     
     for group_key, runs in sorted(groups.items()):
@@ -193,27 +289,19 @@ def run_test(data_dir: str, output_path: str, n_reference: int = 5):
         print(f"Testing: {group_key} ({len(runs)} runs)")
         print(f"{'='*60}")
         
-        if len(runs) < n_reference + 1:
+        if group_key not in scored:
             print(f"  SKIP: Need at least {n_reference + 1} runs, have {len(runs)}")
             continue
         
-        # Target = first run, references = next N runs
-        target = runs[0]
-        references = [r["response"] for r in runs[1:n_reference+1]]
-        
-        print(f"  Target: {target['run_id']}")
+        res = all_results[group_key] = scored[group_key]
+        results = res["claim_details"]
+        print(f"  Target: {res['target_run_id']}")
         print(f"  References: runs 2-{n_reference+1}")
-        
-        # Extract claims from target
-        claims = extract_claims(target["response"])
-        print(f"  Claims extracted: {len(claims)}")
-        
-        # Run consistency check
-        results = selfcheck_bertscore_consistency(claims, references)
+        print(f"  Claims extracted: {res['n_claims']}")
         
         # Summary
-        n_factual = sum(1 for r in results if r["selfcheckgpt_verdict"] == "LIKELY_FACTUAL")
-        n_halluc = sum(1 for r in results if r["selfcheckgpt_verdict"] == "LIKELY_HALLUCINATION")
+        n_factual = res["n_passed_as_factual"]
+        n_halluc = res["n_flagged_as_hallucination"]
         
         print(f"\n  SelfCheckGPT verdicts:")
         print(f"    LIKELY_FACTUAL:        {n_factual} claims")
@@ -225,21 +313,13 @@ def run_test(data_dir: str, output_path: str, n_reference: int = 5):
             if r["selfcheckgpt_verdict"] == "LIKELY_FACTUAL":
                 print(f"    → {r['claim']}")
                 print(f"      support_rate={r['support_rate']}")
-        
-        all_results[group_key] = {
-            "model": target["model"],
-            "scenario": target["scenario"],
-            "n_claims": len(claims),
-            "n_passed_as_factual": n_factual,
-            "n_flagged_as_hallucination": n_halluc,
-            "pass_rate": round(n_factual / max(len(results), 1), 3),
-            "claim_details": results
-        }
     
     # Save results
     with open(output_path, "w") as f:
         json.dump(all_results, f, indent=2)
     print(f"\n\nResults saved to: {output_path}")
+    if store is not None:
+        print(f"Embedding cache: {store.stats()}" + (" (this process)" if workers > 1 else ""))
     
     # Final summary
     print(f"\n{'='*60}")
@@ -260,6 +340,14 @@ if __name__ == "__main__":
     parser.add_argument("--data-dir", required=True, help="Directory containing STOCH JSON files")
     parser.add_argument("--output", default="selfcheckgpt_results.json", help="Output file path")
     parser.add_argument("--n-reference", type=int, default=5, help="Number of reference samples (default: 5)")
+    parser.add_argument("--cache-dir", default=None, help="Embedding cache directory (default: <repo>/.cache/embeddings)")
+    parser.add_argument("--segmenter", choices=SEGMENTER_MODES, default=None,
+                        help="Claim segmenter (default: $PPH_SEGMENTER or legacy)")
+    parser.add_argument("--index", action="store_true",
+                        help="Score support through the approximate claim index (see claim_index.py)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Score groups in this many processes (default: 1, in-process)")
     args = parser.parse_args()
     
-    run_test(args.data_dir, args.output, args.n_reference)
+    run_test(args.data_dir, args.output, args.n_reference, args.cache_dir, args.segmenter, args.index,
+             args.workers)
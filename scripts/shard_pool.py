@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+PPH Shard Pool
+Process pool for the SelfCheckGPT scorers. Work is split into shards
+(model x scenario groups, or anchor ranges within a group) and spread
+across CPU cores.
+
+Each worker process keeps one EmbeddingStore (worker_store()), so the
+sentence-transformers model is loaded at most once per worker, and only
+if a sentence is missing from the cache. Workers are spawned (not
+forked) with OMP/MKL/OpenBLAS thread counts of cores // workers in
+their environment, set before torch or numpy load. torch takes its
+intra-op thread count from OMP_NUM_THREADS, so N workers never run
+N x cores threads. The store's file lock keeps concurrent cache
+appends safe.
+
+shard_map() returns results in task order whatever order shards finish
+in, so outputs are identical for any worker count. workers=1 runs
+inline in the calling process, with no pool.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+THREAD_ENV = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+_store = None
+_cache_dir = None
+_state = {}
+
+
+def threads_per_worker(workers: int) -> int:
+    return max(1, (os.cpu_count() or 1) // max(workers, 1))
+
+
+def _init_worker(cache_dir):
+    global _cache_dir, _store
+    if cache_dir != _cache_dir:
+        _cache_dir, _store = cache_dir, None
+
+
+def worker_store():
+    """The calling process's EmbeddingStore (created on first use)."""
+    global _store
+    if _store is None:
+        from embedding_store import DEFAULT_CACHE_DIR, EmbeddingStore
+        _store = EmbeddingStore(_cache_dir or DEFAULT_CACHE_DIR)
+    return _store
+
+
+def local_store(cache_dir=None):
+    """worker_store() for the calling process, opened on cache_dir."""
+    _init_worker(cache_dir)
+    return worker_store()
+
+
+def worker_state(key, factory):
+    """Per-process object built once by factory() (e.g. an opened ClaimIndex)."""
+    if key not in _state:
+        _state[key] = factory()
+    return _state[key]
+
+
+def shard_map(fn, tasks: list, workers: int = 1, cache_dir=None) -> list:
+    """
+    [fn(task) for task in tasks], spread over `workers` processes.
+    fn must be a module-level function; it gets the worker's store via
+    worker_store().
+    """
+    tasks = list(tasks)
+    workers = max(1, min(workers or 1, len(tasks)))
+    if workers == 1:
+        _init_worker(cache_dir)
+        return [fn(task) for task in tasks]
+
+    threads = threads_per_worker(workers)
+    saved = {k: os.environ.get(k) for k in THREAD_ENV}
+    os.environ.update({k: str(threads) for k in THREAD_ENV})
+    try:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                                 initargs=(cache_dir,)) as pool:
+            futures = [pool.submit(fn, task) for task in tasks]
+            return [f.result() for f in futures]
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
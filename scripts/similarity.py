@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+PPH Similarity Kernel
+Vectorized claim x reference-sentence cosine similarity for the
+SelfCheckGPT scorers.
+
+All reference sentence embeddings for a group are stacked into one
+L2-normalized matrix with a segment-offset array marking where each
+reference starts. A single claims x sentences matmul then gives every
+cosine score, and a segmented max reduction (np.maximum.reduceat)
+collapses each reference's columns to its best-matching sentence.
+
+threshold_edges() and connected_components() build and split the
+thresholded similarity graph of a whole group for claim clustering.
+"""
+
+import numpy as np
+
+
+def normalize_rows(matrix) -> np.ndarray:
+    """L2-normalize each row (float32). Zero rows stay zero."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def stack_segments(blocks: list) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Stack per-reference embedding blocks into one normalized matrix.
+    Returns (matrix, offsets) where offsets[j] is the first row of block j.
+    Empty blocks must be dropped by the caller (reduceat cannot express them).
+    """
+    if not blocks:
+        return np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=np.int64)
+    lengths = [len(b) for b in blocks]
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+    matrix = normalize_rows(np.concatenate([np.asarray(b) for b in blocks], axis=0))
+    return matrix, offsets
+
+
+def segment_max(sims: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Per-segment column max of a (rows x sentences) similarity matrix."""
+    if sims.shape[0] == 0 or len(offsets) == 0:
+        return np.zeros((sims.shape[0], len(offsets)), dtype=np.float32)
+    return np.maximum.reduceat(sims, offsets, axis=1)
+
+
+def max_support_scores(claim_embeddings, reference_blocks: list) -> np.ndarray:
+    """
+    Max cosine similarity between every claim and each reference.
+
+    claim_embeddings: (n_claims x dim) array
+    reference_blocks: list of (n_sentences_j x dim) arrays, one per
+                      reference response (non-empty)
+    Returns an (n_claims x n_references) float32 array.
+    """
+    if len(claim_embeddings) == 0 or not reference_blocks:
+        return np.zeros((len(claim_embeddings), len(reference_blocks)), dtype=np.float32)
+    claims = normalize_rows(claim_embeddings)
+    matrix, offsets = stack_segments(reference_blocks)
+    return segment_max(claims @ matrix.T, offsets)
+
+
+def all_pairs_support(blocks: list) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Block similarity over every sentence of a group.
+
+    blocks: list of (n_sentences_j x dim) arrays, one per response (non-empty)
+    Returns (support, offsets): support[s, j] is the max cosine between
+    sentence s and any sentence of response j, so rows
+    offsets[i]:offsets[i+1] hold response i's claims against every
+    response (including its own block, which callers mask out).
+    """
+    matrix, offsets = stack_segments(blocks)
+    if len(offsets) == 0:
+        return np.zeros((0, 0), dtype=np.float32), offsets
+    return segment_max(matrix @ matrix.T, offsets), offsets
+
+
+def threshold_edges(matrix: np.ndarray, threshold: float, chunk: int = 2048) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Every pair (i, j), i < j, of rows of a normalized matrix with cosine
+    >= threshold. The upper triangle is computed chunk rows at a time,
+    so memory stays at chunk x n floats however large the group is.
+    Returns (src, dst) int64 arrays.
+    """
+    n = len(matrix)
+    src, dst = [], []
+    for start in range(0, n, chunk):
+        stop = min(start + chunk, n)
+        sims = matrix[start:stop] @ matrix[start:].T
+        rows, cols = np.nonzero(sims >= threshold)
+        keep = cols > rows          # cols are offset by start, like rows
+        src.append(rows[keep] + start)
+        dst.append(cols[keep] + start)
+    if not src:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(src).astype(np.int64), np.concatenate(dst).astype(np.int64)
+
+
+def connected_components(n: int, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """
+    Component label (0..k-1, in order of first row) for each of n nodes
+    given undirected edges src[e] -- dst[e].
+
+    Vectorized hook-and-jump: every edge hooks the larger of its two
+    roots onto the smaller, then pointer jumping flattens the forest.
+    Repeats until both ends of every edge share a root, which takes
+    O(log n) rounds of O(edges) numpy work.
+    """
+    parent = np.arange(n, dtype=np.int64)
+    while True:
+        root_s, root_d = parent[src], parent[dst]
+        if np.array_equal(root_s, root_d):
+            break
+        low = np.minimum(root_s, root_d)
+        np.minimum.at(parent, root_s, low)
+        np.minimum.at(parent, root_d, low)
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+    _, first, labels = np.unique(parent, return_index=True, return_inverse=True)
+    return np.argsort(np.argsort(first))[labels]
@@ -2,119 +2,249 @@
 """
 PPH SelfCheckGPT Threshold Sweep
 Runs n=19 BERTScore consistency at multiple thresholds.
+
+Each claim's mean support is computed once and sorted; any threshold is
+then answered with a binary search. Besides the fixed THRESHOLDS table,
+the script writes the full pass-rate curve (exact breakpoints plus a
+CURVE_POINTS grid) and ROC-style operating points to CURVE_OUTPUT.
+
+Claims carry stable IDs (see claims.claim_refs): each threshold lists
+passed_claim_ids, and CURVE_OUTPUT holds every claim's mean support
+keyed by claim_id.
+
+Groups are scored in parallel with --workers N (see shard_pool); the
+outputs do not depend on the worker count.
 """
 
+import argparse
 import json
 import sys
+from bisect import bisect_right
 from pathlib import Path
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 REPO_DIR = SCRIPT_DIR.parent
 sys.path.insert(0, str(SCRIPT_DIR))
 
-from selfcheckgpt_test import load_stochastic_runs, extract_claims
-from sentence_transformers import SentenceTransformer, util
+from claims import DEFAULT_MODE, MODES, claim_refs, extract_claims, without_text
+from selfcheckgpt_test import STOCH_FIELDS, load_stochastic_runs
+from shard_pool import local_store, shard_map, worker_store
+from similarity import max_support_scores
 
 DATA_DIR = str(REPO_DIR / "data" / "phase2a") + "/"
 OUTPUT = str(REPO_DIR / "data" / "phase2a" / "selfcheckgpt_threshold_sweep.json")
+CURVE_OUTPUT = str(REPO_DIR / "data" / "phase2a" / "selfcheckgpt_threshold_curve.json")
 THRESHOLDS = [0.50, 0.55, 0.60, 0.65, 0.70, 0.75, 0.80]
+CURVE_POINTS = 1000
+TARGET_PASS_RATES = [0.9, 0.75, 0.5, 0.25, 0.1]
 N_REF = 19
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
-groups = load_stochastic_runs(DATA_DIR)
 
-# Pre-compute all BERTScores once, then apply thresholds
-group_scores = {}
+def n_above(sorted_means: list[float], thresh: float) -> int:
+    """Number of claims whose mean support is strictly above thresh."""
+    return len(sorted_means) - bisect_right(sorted_means, thresh)
+
+
+def pass_rate_curve(sorted_means: list[float]) -> dict:
+    """
+    Full pass-rate curve for one set of sorted claim means.
+
+    breakpoints: the exact step function. For thresholds in
+                 [threshold, next threshold) exactly n_factual claims pass.
+    grid:        pass rate at CURVE_POINTS + 1 evenly spaced thresholds in [0, 1].
+    auc:         area under the pass-rate curve on [0, 1]
+                 (equals the mean claim support, clipped to [0, 1]).
+    threshold_at_pass_rate: lowest threshold at which the pass rate
+                 drops to or below each TARGET_PASS_RATES value.
+    """
+    n = len(sorted_means)
+    denom = max(n, 1)
+
+    breakpoints = []
+    for i, m in enumerate(sorted_means):
+        if i + 1 < n and sorted_means[i + 1] == m:
+            continue
+        breakpoints.append({"threshold": round(m, 6), "n_factual": n - i - 1,
+                            "pass_rate": round((n - i - 1) / denom, 3)})
+
+    grid = [round(n_above(sorted_means, k / CURVE_POINTS) / denom, 3)
+            for k in range(CURVE_POINTS + 1)]
+
+    auc = sum(min(max(m, 0.0), 1.0) for m in sorted_means) / denom
+
+    operating_points = {}
+    for target in TARGET_PASS_RATES:
+        # pass rate <= target once at most floor(target * n) claims remain above
+        k = n - int(target * n)
+        operating_points[f"{target:.2f}"] = round(sorted_means[k - 1], 4) if k > 0 else None
+
+    return {
+        "n_claims": n,
+        "breakpoints": breakpoints,
+        "grid": grid,
+        "auc": round(auc, 4),
+        "threshold_at_pass_rate": operating_points,
+    }
 
-for group_key, runs in sorted(groups.items()):
-    if len(runs) < N_REF + 1:
-        continue
 
+def group_support(task: tuple) -> dict:
+    """
+    Claim x reference support for one group (a shard_map task).
+    task: (runs as plain dicts, target first, then N_REF references;
+    segmenter mode).
+    """
+    runs, segmenter = task
+    store = worker_store()
     target = runs[0]
     references = [r["response"] for r in runs[1:N_REF+1]]
-    claims = extract_claims(target["response"])
-
-    print(f"Computing BERTScores: {group_key} ({len(claims)} claims x {len(references)} refs)")
-
-    claim_embeddings = model.encode(claims, convert_to_tensor=True)
-
-    claim_scores = []  # per-claim: list of max-sim scores across references
-    for i, claim in enumerate(claims):
-        support_scores = []
-        for other_resp in references:
-            other_sentences = extract_claims(other_resp)
-            if not other_sentences:
-                continue
-            other_emb = model.encode(other_sentences, convert_to_tensor=True)
-            cosine = util.cos_sim(claim_embeddings[i:i+1], other_emb)
-            support_scores.append(float(cosine.max()))
-        claim_scores.append(support_scores)
-
-    group_scores[group_key] = {
+    refs = claim_refs(target["run_id"], target["response"], segmenter)
+    claims = [ref["text"] for ref in refs]
+
+    # One encode call for every sentence of the group, in this worker
+    store.prefetch(claims + [s for other_resp in references for s in extract_claims(other_resp, segmenter)])
+    claim_embeddings = store.encode(claims)
+    reference_embeddings = []
+    for other_resp in references:
+        other_sentences = extract_claims(other_resp, segmenter)
+        if not other_sentences:
+            continue
+        reference_embeddings.append(store.encode(other_sentences))
+
+    # per-claim: list of max-sim scores across references
+    support_matrix = max_support_scores(claim_embeddings, reference_embeddings)
+    claim_scores = [[float(s) for s in row] for row in support_matrix]
+
+    return {
         "claims": claims,
+        "refs": refs,
         "scores": claim_scores,
         "model": target["model"],
         "scenario": target["scenario"],
     }
 
-# Apply each threshold
-results = {}
-for thresh in THRESHOLDS:
-    thresh_key = f"{thresh:.2f}"
-    results[thresh_key] = {"threshold": thresh, "groups": {}}
-
-    total_factual = 0
-    total_claims = 0
-
-    for group_key, data in sorted(group_scores.items()):
-        n_claims = len(data["claims"])
-        n_factual = 0
-
-        for scores in data["scores"]:
-            avg = sum(scores) / len(scores) if scores else 0
-            if avg > thresh:
-                n_factual += 1
-
-        pass_rate = round(n_factual / max(n_claims, 1), 3)
-        results[thresh_key]["groups"][group_key] = {
-            "n_factual": n_factual,
-            "n_claims": n_claims,
-            "pass_rate": pass_rate,
+
+def compute_group_scores(data_dir: str = DATA_DIR, workers: int = 1, segmenter: str = None) -> dict:
+    """Pre-compute all BERTScores once per group; thresholds are applied later."""
+    groups = load_stochastic_runs(data_dir)
+    keys = [k for k in sorted(groups) if len(groups[k]) >= N_REF + 1]
+    tasks = [([{f: r[f] for f in STOCH_FIELDS} for r in groups[k][:N_REF+1]], segmenter) for k in keys]
+    group_scores = dict(zip(keys, shard_map(group_support, tasks, workers)))
+    for group_key, data in group_scores.items():
+        print(f"Computed BERTScores: {group_key} ({len(data['claims'])} claims x {N_REF} refs)")
+    return group_scores
+
+
+def sweep(group_scores: dict, segmenter: str = None) -> tuple[dict, dict]:
+    """Threshold table and pass-rate curve from per-group support scores."""
+    # Mean support per claim, computed once and sorted (claim IDs in the same order)
+    sorted_means = {}
+    sorted_ids = {}
+    claim_means = {}
+    for group_key, data in group_scores.items():
+        means = [sum(scores) / len(scores) if scores else 0 for scores in data["scores"]]
+        order = sorted(range(len(means)), key=means.__getitem__)
+        sorted_means[group_key] = [means[i] for i in order]
+        sorted_ids[group_key] = [data["refs"][i]["claim_id"] for i in order]
+        claim_means[group_key] = [{**without_text(ref), "mean_support": round(m, 6)}
+                                  for ref, m in zip(data["refs"], means)]
+    all_means = sorted(m for means in sorted_means.values() for m in means)
+
+    # Apply each threshold
+    results = {}
+    for thresh in THRESHOLDS:
+        thresh_key = f"{thresh:.2f}"
+        results[thresh_key] = {"threshold": thresh, "groups": {}}
+
+        total_factual = 0
+        total_claims = 0
+
+        for group_key, data in sorted(group_scores.items()):
+            n_claims = len(data["claims"])
+            n_factual = n_above(sorted_means[group_key], thresh)
+
+            pass_rate = round(n_factual / max(n_claims, 1), 3)
+            results[thresh_key]["groups"][group_key] = {
+                "n_factual": n_factual,
+                "n_claims": n_claims,
+                "pass_rate": pass_rate,
+                "passed_claim_ids": sorted_ids[group_key][n_claims - n_factual:],
+            }
+            total_factual += n_factual
+            total_claims += n_claims
+
+        results[thresh_key]["overall"] = {
+            "n_factual": total_factual,
+            "n_claims": total_claims,
+            "pass_rate": round(total_factual / max(total_claims, 1), 3),
         }
-        total_factual += n_factual
-        total_claims += n_claims
 
-    results[thresh_key]["overall"] = {
-        "n_factual": total_factual,
-        "n_claims": total_claims,
-        "pass_rate": round(total_factual / max(total_claims, 1), 3),
+    curve = {
+        "n_reference": N_REF,
+        "grid_step": 1 / CURVE_POINTS,
+        "groups": {gk: pass_rate_curve(sorted_means[gk]) for gk in sorted(sorted_means)},
+        "overall": pass_rate_curve(all_means),
+        "segmenter": segmenter or DEFAULT_MODE,
+        "claims": claim_means,
     }
+    return results, curve
 
-with open(OUTPUT, "w") as f:
-    json.dump(results, f, indent=2)
-
-# Print summary table
-print(f"\n{'='*80}")
-print("THRESHOLD SWEEP SUMMARY (n=19 references, BERTScore)")
-print(f"{'='*80}")
-
-header = f"{'Threshold':>10}"
-group_keys = sorted(group_scores.keys())
-for gk in group_keys:
-    short = gk.replace("_", " / ")[:20]
-    header += f"  {short:>20}"
-header += f"  {'OVERALL':>10}"
-print(header)
-print("-" * len(header))
-
-for thresh in THRESHOLDS:
-    tk = f"{thresh:.2f}"
-    row = f"{thresh:>10.2f}"
-    for gk in group_keys:
-        g = results[tk]["groups"][gk]
-        row += f"  {g['n_factual']}/{g['n_claims']:>2} ({g['pass_rate']:.0%})".rjust(22)
-    o = results[tk]["overall"]
-    row += f"  {o['n_factual']}/{o['n_claims']} ({o['pass_rate']:.0%})".rjust(12)
-    print(row)
 
-print(f"\nSaved: {OUTPUT}")
+def print_summary(group_scores: dict, results: dict, curve: dict):
+    print(f"\n{'='*80}")
+    print("THRESHOLD SWEEP SUMMARY (n=19 references, BERTScore)")
+    print(f"{'='*80}")
+
+    header = f"{'Threshold':>10}"
+    group_keys = sorted(group_scores.keys())
+    for gk in group_keys:
+        short = gk.replace("_", " / ")[:20]
+        header += f"  {short:>20}"
+    header += f"  {'OVERALL':>10}"
+    print(header)
+    print("-" * len(header))
+
+    for thresh in THRESHOLDS:
+        tk = f"{thresh:.2f}"
+        row = f"{thresh:>10.2f}"
+        for gk in group_keys:
+            g = results[tk]["groups"][gk]
+            row += f"  {g['n_factual']}/{g['n_claims']:>2} ({g['pass_rate']:.0%})".rjust(22)
+        o = results[tk]["overall"]
+        row += f"  {o['n_factual']}/{o['n_claims']} ({o['pass_rate']:.0%})".rjust(12)
+        print(row)
+
+    # Curve summary
+    print(f"\n{'Group':<35} {'AUC':>6}  " + "  ".join(f"pass<={t:.0%}" for t in TARGET_PASS_RATES))
+    for gk, c in list(curve["groups"].items()) + [("OVERALL", curve["overall"])]:
+        points = "  ".join(
+            f"{c['threshold_at_pass_rate'][f'{t:.2f}'] or 0:>{len(f'pass<={t:.0%}')}.3f}"
+            for t in TARGET_PASS_RATES
+        )
+        print(f"{gk:<35} {c['auc']:>6.3f}  {points}")
+
+
+def main(workers: int = 1, segmenter: str = None):
+    store = local_store()
+    group_scores = compute_group_scores(DATA_DIR, workers, segmenter)
+    results, curve = sweep(group_scores, segmenter)
+
+    with open(OUTPUT, "w") as f:
+        json.dump(results, f, indent=2)
+
+    with open(CURVE_OUTPUT, "w") as f:
+        json.dump(curve, f, indent=2)
+
+    print_summary(group_scores, results, curve)
+    print(f"\nSaved: {OUTPUT}")
+    print(f"Saved: {CURVE_OUTPUT}")
+    print(f"Embedding cache: {store.stats()}" + (" (this process)" if workers > 1 else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PPH SelfCheckGPT threshold sweep")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Score groups in this many processes (default: 1, in-process)")
+    parser.add_argument("--segmenter", choices=MODES, default=None,
+                        help="Claim segmenter (default: $PPH_SEGMENTER or legacy)")
+    args = parser.parse_args()
+    main(args.workers, args.segmenter)